@@ -9,6 +9,8 @@ import seaborn as sns
 from scipy import stats
 import os
 
+from profiling import add_profile_argument, run_main, stage
+
 # Create figures directory if it doesn't exist
 os.makedirs('figures', exist_ok=True)
 
@@ -208,23 +210,38 @@ def generate_neural_oscillations():
     plt.savefig('figures/neural_oscillations.png', bbox_inches='tight')
     plt.close()
 
-if __name__ == '__main__':
+def main():
+    """Generate every figure into the 'figures' directory."""
     print("Generating figures for Attentional Blink paper...")
     
     print("  - Generating AB curve...")
-    ab_data = generate_ab_curve()
+    with stage('AB curve'):
+        ab_data = generate_ab_curve()
     
     print("  - Generating ERP timeline...")
-    generate_erp_timeline()
+    with stage('ERP timeline'):
+        generate_erp_timeline()
     
     print("  - Generating individual differences plot...")
-    wm, ab, r, p = generate_individual_differences()
+    with stage('individual differences'):
+        wm, ab, r, p = generate_individual_differences()
     
     print("  - Generating dual process model...")
-    generate_dual_process()
+    with stage('dual process model'):
+        generate_dual_process()
     
     print("  - Generating neural oscillations...")
-    generate_neural_oscillations()
+    with stage('neural oscillations'):
+        generate_neural_oscillations()
     
     print(f"\nAll figures saved to 'figures' directory!")
     print(f"Generated {len(os.listdir('figures'))} figure files (PDF + PNG)")
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate the figures for the paper")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    
+    run_main(main, args.profile, 'generate_figures', output_dir='figures')
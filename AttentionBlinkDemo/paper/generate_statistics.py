@@ -5,38 +5,44 @@ Results are saved to statistics.txt for inclusion in the LaTeX document.
 
 import numpy as np
 from scipy import stats
-import pandas as pd
+
+from ab_simulation import simulate_ab_experiment
+from multiple_comparisons import adjust
+from profiling import add_profile_argument, run_main, stage
+from resampling import (bootstrap_correlation, bootstrap_paired, permutation_correlation,
+                        permutation_paired)
+from rm_anova import rm_anova
 
 # Set random seed for reproducibility
 np.random.seed(42)
 
-def simulate_ab_experiment():
-    """Simulate a basic AB experiment with 30 subjects."""
-    n_subjects = 30
-    n_trials_per_condition = 100
-    
-    # Simulate T2 accuracy by lag (1-8)
-    lags = np.arange(1, 9)
-    
-    # Population-level parameters (mean accuracy per lag)
-    population_means = np.array([0.75, 0.45, 0.40, 0.42, 0.55, 0.65, 0.72, 0.75])
-    
-    # Generate subject-level data
-    subject_data = []
-    for subj in range(n_subjects):
-        for lag_idx, lag in enumerate(lags):
-            # Subject variability
-            subject_mean = population_means[lag_idx] + np.random.normal(0, 0.08)
-            # Trial-to-trial variability (binomial)
-            accuracy = np.random.binomial(n_trials_per_condition, subject_mean) / n_trials_per_condition
-            subject_data.append({
-                'subject': subj + 1,
-                'lag': lag,
-                'accuracy': accuracy
-            })
-    
-    df = pd.DataFrame(subject_data)
-    return df
+# Bootstrap and permutation resamples (own stream, so the simulated data
+# do not depend on the number of resamples; one generator is shared by all
+# analyses, so each draws fresh resamples)
+RESAMPLING_SEED = 42
+N_RESAMPLES = 100_000
+
+
+def format_p(p):
+    """APA-style p-value: exact to three decimals, or p < .001."""
+    if p < 0.001:
+        return "p < .001"
+    return f"p = {p:.3f}".replace("0.", ".", 1)
+
+
+def format_permutation_p(result, unit='permutations'):
+    """
+    Permutation p-value with its number of resamples.
+
+    When no resample was as extreme as the observed value, the Monte Carlo
+    p-value (1 + 0) / (B + 1) is only a bound, reported as p < 1/B.
+    """
+    if result['exact']:
+        return f"p = {result['p_value']:.2g} (exact, all {result['resamples']:,} {unit})"
+    if result['extreme'] == 0:
+        return f"p < {1 / result['resamples']:.2g} ({result['resamples']:,} {unit})"
+    return f"p = {result['p_value']:.2g} ({result['resamples']:,} {unit})"
+
 
 def analyze_ab_magnitude(df):
     """Calculate AB magnitude and test against zero."""
@@ -59,27 +65,23 @@ def analyze_ab_magnitude(df):
 
 def analyze_lag_effect(df):
     """Perform repeated measures ANOVA on lag effect."""
-    # For simplicity, use one-way ANOVA across lags
-    lag_groups = [df[df['lag'] == lag]['accuracy'].values for lag in range(1, 9)]
-    
-    f_stat, p_value = stats.f_oneway(*lag_groups)
-    
-    # Calculate effect size (eta-squared)
-    grand_mean = df['accuracy'].mean()
-    ss_between = sum([len(group) * (np.mean(group) - grand_mean)**2 for group in lag_groups])
-    ss_total = sum([(x - grand_mean)**2 for group in lag_groups for x in group])
-    eta_squared = ss_between / ss_total
+    # Subjects x lags array of accuracies
+    accuracy = df.pivot(index='subject', columns='lag', values='accuracy').to_numpy()
+    result = rm_anova(accuracy)
     
     return {
-        'f_statistic': f_stat,
-        'p_value': p_value,
-        'eta_squared': eta_squared,
-        'df_between': 7,
-        'df_within': len(df) - 8
+        'f_statistic': result['f_statistic'],
+        'p_value': result['p_value'],
+        'p_value_gg': result['p_value_gg'],
+        'epsilon': result['epsilon'],
+        'partial_eta_squared': result['partial_eta_squared'],
+        'df_between': result['df_conditions'],
+        'df_within': result['df_error']
     }
 
-def analyze_individual_differences():
+def analyze_individual_differences(rng=None):
     """Analyze correlation between WM capacity and AB magnitude."""
+    rng = np.random.default_rng(RESAMPLING_SEED) if rng is None else rng
     n_subjects = 50
     
     # Simulate data
@@ -93,16 +95,25 @@ def analyze_individual_differences():
     # Linear regression
     slope, intercept, r_value, p_value_reg, std_err = stats.linregress(wm_capacity, ab_magnitude)
     
+    # Bootstrap CI of r and permutation p-value
+    boot = bootstrap_correlation(wm_capacity, ab_magnitude, N_RESAMPLES, rng)
+    perm = permutation_correlation(wm_capacity, ab_magnitude, N_RESAMPLES, rng)
+    
     return {
         'pearson_r': r,
         'p_value': p_value,
+        'r_ci': boot['ci'],
+        'p_permutation': perm['p_value'],
+        'n_resamples': perm['resamples'],
+        'permutation': perm,
         'r_squared': r**2,
         'slope': slope,
         'intercept': intercept
     }
 
-def analyze_erp_components():
+def analyze_erp_components(rng=None):
     """Simulate ERP component analyses."""
+    rng = np.random.default_rng(RESAMPLING_SEED) if rng is None else rng
     n_subjects = 24
     
     # N2pc latency: seen vs missed
@@ -119,7 +130,16 @@ def analyze_erp_components():
     t_p3b, p_p3b = stats.ttest_rel(p3b_seen, p3b_missed)
     d_p3b = (np.mean(p3b_seen) - np.mean(p3b_missed)) / np.std(p3b_seen - p3b_missed)
     
+    # Sign-flip permutation p-values and bootstrap CIs of Cohen's d
+    resampled = {}
+    for name, seen, missed in [('n2pc', n2pc_seen, n2pc_missed), ('p3b', p3b_seen, p3b_missed)]:
+        perm = permutation_paired(seen, missed, N_RESAMPLES, rng)
+        resampled[f'{name}_permutation'] = perm
+        resampled[f'p_{name}_permutation'] = perm['p_value']
+        resampled[f'd_{name}_ci'] = bootstrap_paired(seen, missed, N_RESAMPLES, rng)['cohen_d']['ci']
+    
     return {
+        **resampled,
         'n2pc_seen_mean': np.mean(n2pc_seen),
         'n2pc_seen_sd': np.std(n2pc_seen),
         'n2pc_missed_mean': np.mean(n2pc_missed),
@@ -142,22 +162,40 @@ def write_statistics_file():
     
     # Main experiment
     print("  - Simulating AB experiment...")
-    df = simulate_ab_experiment()
+    with stage('simulate AB experiment'):
+        df = simulate_ab_experiment().to_frame()
     
     print("  - Analyzing AB magnitude...")
-    ab_stats = analyze_ab_magnitude(df)
+    with stage('AB magnitude'):
+        ab_stats = analyze_ab_magnitude(df)
     
     print("  - Analyzing lag effect...")
-    lag_stats = analyze_lag_effect(df)
+    with stage('lag effect'):
+        lag_stats = analyze_lag_effect(df)
+    
+    rng = np.random.default_rng(RESAMPLING_SEED)
     
     print("  - Analyzing individual differences...")
-    indiv_stats = analyze_individual_differences()
+    with stage('individual differences'):
+        indiv_stats = analyze_individual_differences(rng)
     
     print("  - Analyzing ERP components...")
-    erp_stats = analyze_erp_components()
+    with stage('ERP components'):
+        erp_stats = analyze_erp_components(rng)
+    
+    # The family of reported tests, corrected together
+    with stage('FDR correction'):
+        family = [
+            ('AB magnitude t-test', ab_stats['p_value']),
+            ('Lag effect F-test (Greenhouse-Geisser)', lag_stats['p_value_gg']),
+            ('WM capacity correlation', indiv_stats['p_value']),
+            ('N2pc latency t-test', erp_stats['p_n2pc']),
+            ('P3b amplitude t-test', erp_stats['p_p3b']),
+        ]
+        p_fdr = adjust([p for _, p in family], 'bh')
     
     # Write to file
-    with open('statistics.txt', 'w') as f:
+    with stage('write statistics.txt'), open('statistics.txt', 'w') as f:
         f.write("STATISTICAL RESULTS FOR ATTENTIONAL BLINK PAPER\n")
         f.write("=" * 60 + "\n\n")
         
@@ -167,19 +205,23 @@ def write_statistics_file():
         
         f.write("AB Magnitude Analysis (Baseline - Lag 3):\n")
         f.write(f"  Mean AB magnitude: {ab_stats['mean_ab_magnitude']:.3f} ± {ab_stats['std_ab_magnitude']:.3f}\n")
-        f.write(f"  t({29}) = {ab_stats['t_statistic']:.3f}, p < .001\n")
+        f.write(f"  t({29}) = {ab_stats['t_statistic']:.3f}, {format_p(ab_stats['p_value'])}\n")
         f.write(f"  Cohen's d = {ab_stats['cohen_d']:.3f}\n\n")
         
         f.write("Lag Effect (Repeated Measures ANOVA):\n")
-        f.write(f"  F({lag_stats['df_between']}, {lag_stats['df_within']}) = {lag_stats['f_statistic']:.3f}, p < .001\n")
-        f.write(f"  η² = {lag_stats['eta_squared']:.3f}\n\n")
+        f.write(f"  F({lag_stats['df_between']}, {lag_stats['df_within']}) = {lag_stats['f_statistic']:.3f}, "
+                f"{format_p(lag_stats['p_value_gg'])} (Greenhouse-Geisser corrected)\n")
+        f.write(f"  Greenhouse-Geisser ε = {lag_stats['epsilon']:.3f}\n")
+        f.write(f"  Partial η² = {lag_stats['partial_eta_squared']:.3f}\n\n")
         
         f.write("\nEXPERIMENT 2: INDIVIDUAL DIFFERENCES\n")
         f.write("-" * 60 + "\n")
         f.write(f"N = 50 subjects\n\n")
         
         f.write("Correlation: Working Memory Capacity vs AB Magnitude:\n")
-        f.write(f"  r = {indiv_stats['pearson_r']:.3f}, p < .001\n")
+        f.write(f"  r = {indiv_stats['pearson_r']:.3f}, {format_p(indiv_stats['p_value'])}, "
+                f"95% bootstrap CI [{indiv_stats['r_ci'][0]:.3f}, {indiv_stats['r_ci'][1]:.3f}]\n")
+        f.write(f"  Permutation test: {format_permutation_p(indiv_stats['permutation'])}\n")
         f.write(f"  R² = {indiv_stats['r_squared']:.3f}\n")
         f.write(f"  Regression: AB = {indiv_stats['intercept']:.3f} + {indiv_stats['slope']:.3f} × WM\n\n")
         
@@ -190,19 +232,33 @@ def write_statistics_file():
         f.write("N2pc Latency:\n")
         f.write(f"  Seen targets: {erp_stats['n2pc_seen_mean']:.1f} ± {erp_stats['n2pc_seen_sd']:.1f} ms\n")
         f.write(f"  Missed targets: {erp_stats['n2pc_missed_mean']:.1f} ± {erp_stats['n2pc_missed_sd']:.1f} ms\n")
-        f.write(f"  t(23) = {erp_stats['t_n2pc']:.3f}, p < .001, d = {erp_stats['d_n2pc']:.3f}\n\n")
+        f.write(f"  t(23) = {erp_stats['t_n2pc']:.3f}, {format_p(erp_stats['p_n2pc'])}, d = {erp_stats['d_n2pc']:.3f} "
+                f"(95% bootstrap CI [{erp_stats['d_n2pc_ci'][0]:.3f}, {erp_stats['d_n2pc_ci'][1]:.3f}])\n")
+        f.write(f"  Sign-flip permutation test: "
+                f"{format_permutation_p(erp_stats['n2pc_permutation'], 'sign flips')}\n\n")
         
         f.write("P3b Amplitude:\n")
         f.write(f"  Seen targets: {erp_stats['p3b_seen_mean']:.1f} ± {erp_stats['p3b_seen_sd']:.1f} μV\n")
         f.write(f"  Missed targets: {erp_stats['p3b_missed_mean']:.1f} ± {erp_stats['p3b_missed_sd']:.1f} μV\n")
-        f.write(f"  t(23) = {erp_stats['t_p3b']:.3f}, p < .001, d = {erp_stats['d_p3b']:.3f}\n\n")
+        f.write(f"  t(23) = {erp_stats['t_p3b']:.3f}, {format_p(erp_stats['p_p3b'])}, d = {erp_stats['d_p3b']:.3f} "
+                f"(95% bootstrap CI [{erp_stats['d_p3b_ci'][0]:.3f}, {erp_stats['d_p3b_ci'][1]:.3f}])\n")
+        f.write(f"  Sign-flip permutation test: "
+                f"{format_permutation_p(erp_stats['p3b_permutation'], 'sign flips')}\n\n")
+        
+        f.write("\nMULTIPLE COMPARISONS\n")
+        f.write("-" * 60 + "\n")
+        f.write(f"Benjamini-Hochberg FDR across the {len(family)} tests above:\n")
+        for (name, p), adjusted in zip(family, p_fdr):
+            f.write(f"  {name}: {format_p(p)}, FDR-adjusted {format_p(adjusted)}\n")
+        f.write("\n")
         
         f.write("=" * 60 + "\n")
-        f.write("All p-values adjusted for multiple comparisons (FDR correction)\n")
+        f.write("Per-test p-values are unadjusted; FDR-adjusted values are listed above\n")
     
     print("\nStatistics saved to 'statistics.txt'")
     
     return {
+        'p_fdr': dict(zip([name for name, _ in family], p_fdr)),
         'ab_stats': ab_stats,
         'lag_stats': lag_stats,
         'indiv_stats': indiv_stats,
@@ -210,5 +266,11 @@ def write_statistics_file():
     }
 
 if __name__ == '__main__':
-    results = write_statistics_file()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate the statistics for the paper")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    
+    results = run_main(write_statistics_file, args.profile, 'generate_statistics')
     print("\nDone!")
@@ -0,0 +1,143 @@
+"""
+Parameter sweeps over the AB simulation with reproducible parallel RNG streams.
+
+The simulation parameters of generate_statistics.py (subjects, trials per
+lag, subject SD, the lag profile) become axes of a grid. Every grid point
+gets its own random stream, spawned from one root SeedSequence by grid
+position, so a point's result depends only on the root seed and its
+position in the grid, never on which worker ran it or in which order.
+Points run across a process pool and the results are collected into one
+columnar table (a DataFrame with one row per point).
+
+Usage:
+    python parameter_sweep.py --subjects 10 20 30 --trials 50 100 --subject-sd 0.04 0.08 \
+        --effect-scale 0.25 0.5 --output sweep.csv
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ab_simulation import N_SUBJECTS, N_TRIALS, SUBJECT_SD
+from power_analysis import TESTS, scaled_means, simulate_power
+
+
+def parameter_grid(**axes):
+    """
+    All combinations of the given parameter values.
+
+    Args:
+        **axes: parameter name -> sequence of values
+
+    Returns:
+        list: one dict per grid point, the last axis varying fastest
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def simulate_point(params, rng):
+    """
+    Power of the AB tests at one grid point.
+
+    Args:
+        params: dict with any of subjects, trials, subject_sd, effect_scale,
+                simulations and alpha
+        rng: numpy Generator of this point
+
+    Returns:
+        dict: <test>_power, <test>_mc_se and <test>_mean_statistic for every
+        test in power_analysis.TESTS
+    """
+    results = simulate_power(params.get('subjects', N_SUBJECTS),
+                             params.get('trials', N_TRIALS),
+                             params.get('simulations', 1000),
+                             params.get('alpha', 0.05),
+                             scaled_means(params.get('effect_scale', 1.0)),
+                             params.get('subject_sd', SUBJECT_SD),
+                             rng)
+    return {f'{name}_{key}': value
+            for name, result in results.items() for key, value in result.items()}
+
+
+def _run_chunk(args):
+    """Worker task: run a chunk of (index, params, seed sequence) points."""
+    point_function, points = args
+    return [(index, point_function(params, np.random.default_rng(seed)))
+            for index, params, seed in points]
+
+
+def run_sweep(grid, seed=42, processes=None, point_function=simulate_point):
+    """
+    Run a function at every grid point with independent random streams.
+
+    Args:
+        grid: list of parameter dicts (e.g. from parameter_grid)
+        seed: entropy of the root SeedSequence
+        processes: worker processes (None = os.cpu_count(), 1 = run inline)
+        point_function: module-level function (params, rng) -> dict of scalars
+
+    Returns:
+        pandas.DataFrame: one row per grid point in grid order, with the
+        parameters followed by the results
+    """
+    import pandas as pd
+
+    streams = np.random.SeedSequence(seed).spawn(len(grid))
+    points = list(zip(range(len(grid)), grid, streams))
+
+    workers = processes or os.cpu_count() or 1
+    # A few chunks per worker balance the load; the chunking does not
+    # affect the results, which are keyed by grid index
+    n_chunks = min(len(points), 4 * workers) or 1
+    chunks = [(point_function, points[i::n_chunks]) for i in range(n_chunks)]
+
+    if workers == 1:
+        outputs = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_run_chunk, chunks))
+
+    results = dict(item for output in outputs for item in output)
+    return pd.DataFrame([{'point': index, **grid[index], **results[index]}
+                         for index in range(len(grid))])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep the AB simulation parameters")
+    parser.add_argument('--subjects', type=int, nargs='+', default=[10, 20, 30])
+    parser.add_argument('--trials', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--subject-sd', type=float, nargs='+', default=[0.04, 0.08])
+    parser.add_argument('--effect-scale', type=float, nargs='+', default=[0.25, 0.5])
+    parser.add_argument('--simulations', type=int, default=1000,
+                        help="simulated experiments per grid point")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default=None, help="write the table to this CSV file")
+    args = parser.parse_args()
+
+    grid = parameter_grid(subjects=args.subjects, trials=args.trials,
+                          subject_sd=args.subject_sd, effect_scale=args.effect_scale,
+                          simulations=[args.simulations], alpha=[args.alpha])
+
+    print("=" * 60)
+    print(f"PARAMETER SWEEP ({len(grid)} grid points, seed {args.seed})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    table = run_sweep(grid, seed=args.seed, processes=args.processes)
+    elapsed = time.perf_counter() - start
+
+    columns = ['subjects', 'trials', 'subject_sd', 'effect_scale'] + [f'{name}_power' for name in TESTS]
+    print()
+    print(table[columns].to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    print(f"\n{len(grid)} points x {args.simulations} simulations in {elapsed:.2f} seconds")
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Table saved to: {args.output}")
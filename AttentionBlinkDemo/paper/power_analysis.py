@@ -0,0 +1,190 @@
+"""
+Monte Carlo power analysis for the AB-magnitude and lag-effect tests.
+
+Thousands of experiments are simulated at once as a (simulations, subjects,
+lags) array (ab_simulation with a leading simulations axis). The test
+statistics of analyze_ab_magnitude (one-sample t on lag 8 - lag 3) and
+analyze_lag_effect (repeated-measures F from rm_anova, Greenhouse-Geisser
+corrected) are computed with vectorized formulas along the simulations
+axis, so every design point costs a few array operations instead of one
+Python-level test per simulated experiment.
+
+Power is the fraction of simulated experiments with p < alpha, reported
+with its Monte Carlo standard error sqrt(power * (1 - power) / simulations).
+
+Usage:
+    python power_analysis.py --subjects 6 8 10 15 20 30 --trials 20 50 100 --effect-scale 0.3
+"""
+
+import time
+
+import numpy as np
+from scipy import stats
+
+from ab_simulation import LAGS, N_TRIALS, POPULATION_MEANS, SUBJECT_SD, simulate_ab_experiment
+from rm_anova import rm_anova
+
+
+# Upper bound on simulated cells (simulations x subjects x lags) per chunk
+MAX_CELLS = 4_000_000
+
+
+def scaled_means(effect_scale, population_means=POPULATION_MEANS):
+    """
+    Shrink (or grow) the lag profile around its mean.
+
+    effect_scale=1 returns the paper's population means, 0 a flat profile
+    with no blink at all.
+    """
+    population_means = np.asarray(population_means, dtype=np.float64)
+    grand = population_means.mean()
+    return grand + effect_scale * (population_means - grand)
+
+
+def ab_magnitude_test(accuracy, lags=LAGS, baseline_lag=8, blink_lag=3):
+    """
+    One-sample t-test of baseline minus blink-lag accuracy against zero.
+
+    Args:
+        accuracy: (..., subjects, lags) accuracies
+
+    Returns:
+        tuple: (t, p) arrays over the leading axes (two-sided p)
+    """
+    lags = np.asarray(lags)
+    diff = (accuracy[..., np.flatnonzero(lags == baseline_lag)[0]]
+            - accuracy[..., np.flatnonzero(lags == blink_lag)[0]])
+    n = diff.shape[-1]
+    se = diff.std(axis=-1, ddof=1) / np.sqrt(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = diff.mean(axis=-1) / se
+    return t, 2 * stats.t.sf(np.abs(t), n - 1)
+
+
+def lag_effect_test(accuracy):
+    """
+    Repeated-measures F test across lags, as analyze_lag_effect computes it.
+
+    Args:
+        accuracy: (..., subjects, lags) accuracies
+
+    Returns:
+        tuple: (F, Greenhouse-Geisser corrected p) arrays over the leading axes
+    """
+    result = rm_anova(accuracy)
+    return result['f_statistic'], result['p_value_gg']
+
+
+TESTS = {
+    'ab_magnitude': ab_magnitude_test,
+    'lag_effect': lag_effect_test,
+}
+
+
+def simulate_power(n_subjects, n_trials=N_TRIALS, n_simulations=2000, alpha=0.05,
+                   population_means=POPULATION_MEANS, subject_sd=SUBJECT_SD, rng=None):
+    """
+    Power of every test in TESTS for one design.
+
+    Args:
+        n_subjects: subjects per experiment
+        n_trials: trials per subject and lag
+        n_simulations: simulated experiments
+        alpha: significance level
+        population_means, subject_sd: simulation parameters (ab_simulation)
+        rng: numpy Generator (default: a fresh unseeded one)
+
+    Returns:
+        dict: {test name: {'power', 'mc_se', 'mean_statistic'}}
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    chunk = max(1, MAX_CELLS // (n_subjects * len(population_means)))
+    significant = {name: 0 for name in TESTS}
+    statistic_sum = {name: 0.0 for name in TESTS}
+
+    for start in range(0, n_simulations, chunk):
+        m = min(chunk, n_simulations - start)
+        accuracy = simulate_ab_experiment(n_subjects, n_trials, population_means, subject_sd,
+                                          n_simulations=m, rng=rng).accuracy
+        for name, test in TESTS.items():
+            statistic, p = test(accuracy)
+            significant[name] += int(np.count_nonzero(p < alpha))
+            statistic_sum[name] += float(np.nansum(statistic))
+
+    results = {}
+    for name in TESTS:
+        power = significant[name] / n_simulations
+        results[name] = {
+            'power': power,
+            'mc_se': np.sqrt(power * (1 - power) / n_simulations),
+            'mean_statistic': statistic_sum[name] / n_simulations,
+        }
+    return results
+
+
+def power_curves(subject_counts, trial_counts=(N_TRIALS,), n_simulations=2000, alpha=0.05,
+                 population_means=POPULATION_MEANS, subject_sd=SUBJECT_SD, seed=42):
+    """
+    Power over a grid of subject and trial counts.
+
+    Args:
+        subject_counts: numbers of subjects
+        trial_counts: trials per subject and lag
+        seed: seed of the numpy Generator shared by the whole grid
+
+    Returns:
+        pandas.DataFrame: one row per (test, subjects, trials) with power
+        and Monte Carlo standard error
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n_trials in trial_counts:
+        for n_subjects in subject_counts:
+            results = simulate_power(n_subjects, n_trials, n_simulations, alpha,
+                                     population_means, subject_sd, rng)
+            for name, result in results.items():
+                rows.append({'test': name, 'subjects': n_subjects, 'trials': n_trials,
+                             **result})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monte Carlo power of the AB tests")
+    parser.add_argument('--subjects', type=int, nargs='+', default=[4, 6, 8, 10, 15, 20, 30])
+    parser.add_argument('--trials', type=int, nargs='+', default=[20, 50, 100])
+    parser.add_argument('--simulations', type=int, default=5000)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--effect-scale', type=float, default=0.25,
+                        help="scale of the lag profile (1 = the paper's population means)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="write the table to this CSV file")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"POWER ANALYSIS ({args.simulations} simulations per design, "
+          f"effect scale {args.effect_scale})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    table = power_curves(args.subjects, args.trials, args.simulations, args.alpha,
+                         scaled_means(args.effect_scale), seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    for name in TESTS:
+        print(f"\n{name} (power ± Monte Carlo SE, alpha = {args.alpha})")
+        print("  subjects " + "".join(f"{f'{t} trials':>16s}" for t in args.trials))
+        rows = table[table['test'] == name]
+        for n_subjects in args.subjects:
+            cells = rows[rows['subjects'] == n_subjects].set_index('trials')
+            print(f"  {n_subjects:8d} " + "".join(
+                f"{cells.loc[t, 'power']:10.3f}±{cells.loc[t, 'mc_se']:.3f}" for t in args.trials))
+
+    n_designs = len(args.subjects) * len(args.trials)
+    print(f"\n{n_designs * args.simulations:,} simulated experiments in {elapsed:.2f} seconds")
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Table saved to: {args.output}")
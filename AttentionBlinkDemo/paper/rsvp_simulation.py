@@ -0,0 +1,240 @@
+"""
+Trial-level simulation of the RSVP attentional blink task.
+
+The browser demo (demo-app/script.js, startDemo/runSequence/showResults)
+runs single trials: a stream of letters with T1 at position 5-7, T2 `lag`
+items later, distractors that repeat neither target nor the previous
+letter, and a response scored as T1 and T2 detected or missed. This module
+simulates the same trials in vectorized chunks:
+
+- streams, target letters and positions are drawn for a whole chunk at
+  once, with no loop over trials or stream positions,
+- responses follow a blink profile: P(T1 seen), P(T2 seen | T1 seen) by
+  lag (the population means of ab_simulation, with lag-1 sparing), and
+  P(T2 seen | T1 missed); a missed T2 is sometimes replaced by the letter
+  after it (a post-target intrusion),
+- trial_chunks() is a generator, and aggregators only keep per-lag counts,
+  so 10^8 trials run in the memory of one chunk.
+
+Usage:
+    python rsvp_simulation.py --trials 100000000 --chunk-size 1000000
+"""
+
+import time
+
+import numpy as np
+
+from ab_simulation import LAGS, POPULATION_MEANS
+
+
+LETTERS = np.array(list('ABCDEFGHJKLMNPQRSTUVWXYZ'))
+
+T1_POSITIONS = (5, 6, 7)
+
+# The demo shows 15 items, so T2 at lag 8 after T1 at position 7 would fall
+# off the end. The stream runs to one item past the latest T2, so that every
+# trial has an item after T2 that can intrude
+SEQUENCE_LENGTH = max(T1_POSITIONS) + max(LAGS) + 2
+
+T1_ACCURACY = 0.90
+T2_WITHOUT_T1 = 0.75
+INTRUSION_RATE = 0.25
+
+
+def generate_trials(m, rng, lags=LAGS, t1_accuracy=T1_ACCURACY, t2_given_t1=POPULATION_MEANS,
+                    t2_without_t1=T2_WITHOUT_T1, intrusion_rate=INTRUSION_RATE,
+                    sequence_length=SEQUENCE_LENGTH):
+    """
+    Simulate a chunk of RSVP trials.
+
+    Args:
+        m: number of trials
+        rng: numpy Generator
+        lags: lags drawn uniformly, one per trial
+        t1_accuracy: P(T1 reported)
+        t2_given_t1: P(T2 reported | T1 reported) at each lag
+        t2_without_t1: P(T2 reported | T1 missed)
+        intrusion_rate: P(the item after T2 is reported | T2 missed)
+        sequence_length: items per stream
+
+    Returns:
+        dict: 'stream' (m, sequence_length) letter indexes, 't1_position',
+        'lag', 't1', 't2' (letter indexes), 't1_seen', 't2_seen' (bool) and
+        't2_report' (reported letter at T2, -1 for none)
+    """
+    lags = np.asarray(lags)
+    lag_index = rng.integers(len(lags), size=m)
+    lag = lags[lag_index]
+    t1_position = rng.choice(T1_POSITIONS, size=m)
+    t2_position = t1_position + lag
+    if t2_position.max(initial=0) >= sequence_length:
+        raise ValueError("sequence_length too short for the largest T1 position and lag")
+
+    # Targets: T2 is uniform over the letters other than T1
+    n_letters = len(LETTERS)
+    t1 = rng.integers(n_letters, size=m)
+    t2 = (t1 + 1 + rng.integers(n_letters - 1, size=m)) % n_letters
+
+    # Distractors are drawn as ranks among the n_letters - 2 non-targets.
+    # Where the previous item is a distractor the rank moves on by 1..K-1
+    # (mod K), so it never repeats; elsewhere it moves by a uniform 0..K-1,
+    # which makes it a fresh uniform draw. The ranks are then one cumsum.
+    n_ranks = n_letters - 2
+    positions = np.arange(sequence_length)
+    rows = np.arange(m)
+    is_target = ((positions == t1_position[:, None])
+                 | (positions == t2_position[:, None]))
+    follows_distractor = np.zeros((m, sequence_length), dtype=bool)
+    follows_distractor[:, 1:] = ~is_target[:, :-1]
+    steps = rng.integers(n_ranks - follows_distractor, dtype=np.int16) + follows_distractor
+    stream = (np.cumsum(steps, axis=1, dtype=np.int16) % n_ranks).astype(np.uint8)
+
+    # Rank -> letter index, stepping over the two targets in increasing order
+    low, high = np.minimum(t1, t2)[:, None], np.maximum(t1, t2)[:, None]
+    stream += stream >= low
+    stream += stream >= high
+    stream[rows, t1_position] = t1
+    stream[rows, t2_position] = t2
+
+    t1_seen = rng.random(m) < t1_accuracy
+    p_t2 = np.where(t1_seen, np.asarray(t2_given_t1)[lag_index], t2_without_t1)
+    t2_seen = rng.random(m) < p_t2
+    intrusion = ~t2_seen & (rng.random(m) < intrusion_rate) & (t2_position + 1 < sequence_length)
+    after_t2 = stream[rows, np.minimum(t2_position + 1, sequence_length - 1)].astype(np.int64)
+    t2_report = np.where(t2_seen, t2, np.where(intrusion, after_t2, -1))
+
+    return {
+        'stream': stream,
+        't1_position': t1_position,
+        'lag': lag,
+        't1': t1,
+        't2': t2,
+        't1_seen': t1_seen,
+        't2_seen': t2_seen,
+        't2_report': t2_report,
+    }
+
+
+def trial_chunks(n_trials, chunk_size=1_000_000, seed=42, **params):
+    """
+    Generate n_trials trials as a stream of chunks.
+
+    Args:
+        n_trials: total number of trials
+        chunk_size: trials per chunk (bounds the memory in use)
+        seed: seed of the numpy Generator
+        **params: passed to generate_trials
+
+    Yields:
+        dict: one generate_trials chunk at a time
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_trials, chunk_size):
+        yield generate_trials(min(chunk_size, n_trials - start), rng, **params)
+
+
+class LagAggregator:
+    """
+    Per-lag counts of a stream of trial chunks.
+
+    Keeps trials, T1 seen, T2 seen, both seen, T2 intrusions and the
+    trials where an intrusion was possible (T2 missed with an item after
+    it) per lag, from which accuracy by lag, T2|T1, the intrusion rate and
+    lag-1 sparing follow.
+    """
+
+    def __init__(self, lags=LAGS):
+        self.lags = np.asarray(lags)
+        self.trials = np.zeros(len(self.lags), dtype=np.int64)
+        self.t1_seen = np.zeros_like(self.trials)
+        self.t2_seen = np.zeros_like(self.trials)
+        self.both_seen = np.zeros_like(self.trials)
+        self.intrusions = np.zeros_like(self.trials)
+        self.intrusion_trials = np.zeros_like(self.trials)
+
+    def update(self, chunk):
+        """Add the counts of one generate_trials chunk."""
+        index = np.searchsorted(self.lags, chunk['lag'])
+        size = len(self.lags)
+        self.trials += np.bincount(index, minlength=size)
+        self.t1_seen += np.bincount(index, weights=chunk['t1_seen'], minlength=size).astype(np.int64)
+        self.t2_seen += np.bincount(index, weights=chunk['t2_seen'], minlength=size).astype(np.int64)
+        both = chunk['t1_seen'] & chunk['t2_seen']
+        self.both_seen += np.bincount(index, weights=both, minlength=size).astype(np.int64)
+        intrusion = ~chunk['t2_seen'] & (chunk['t2_report'] >= 0)
+        self.intrusions += np.bincount(index, weights=intrusion, minlength=size).astype(np.int64)
+        has_next = chunk['t1_position'] + chunk['lag'] + 1 < chunk['stream'].shape[1]
+        possible = ~chunk['t2_seen'] & has_next
+        self.intrusion_trials += np.bincount(index, weights=possible, minlength=size).astype(np.int64)
+
+    def t2_accuracy(self):
+        """P(T2 reported) by lag, regardless of T1."""
+        return self.t2_seen / self.trials
+
+    def t2_given_t1(self):
+        """P(T2 reported | T1 reported) by lag, the usual AB curve."""
+        return self.both_seen / self.t1_seen
+
+    def intrusion_rate(self):
+        """P(the item after T2 is reported) by lag, among trials where it could be."""
+        return self.intrusions / self.intrusion_trials
+
+    def lag1_sparing(self):
+        """T2|T1 at lag 1 minus the trough of the blink."""
+        curve = self.t2_given_t1()
+        return curve[self.lags == 1][0] - curve[self.lags > 1].min()
+
+    def report(self):
+        """Summary as a dict of per-lag lists and scalars."""
+        return {
+            'trials': int(self.trials.sum()),
+            'lags': self.lags.tolist(),
+            't2_accuracy': self.t2_accuracy().tolist(),
+            't2_given_t1': self.t2_given_t1().tolist(),
+            'intrusion_rate': self.intrusion_rate().tolist(),
+            'lag1_sparing': float(self.lag1_sparing()),
+        }
+
+
+def run_simulation(n_trials, chunk_size=1_000_000, seed=42, aggregators=None, **params):
+    """
+    Stream n_trials trials through aggregators.
+
+    Args:
+        aggregators: objects with update(chunk) (default: one LagAggregator)
+
+    Returns:
+        list: the aggregators
+    """
+    aggregators = aggregators or [LagAggregator(params.get('lags', LAGS))]
+    for chunk in trial_chunks(n_trials, chunk_size, seed, **params):
+        for aggregator in aggregators:
+            aggregator.update(chunk)
+    return aggregators
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trial-level RSVP attentional blink simulation")
+    parser.add_argument('--trials', type=int, default=10_000_000)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"RSVP TRIAL SIMULATION ({args.trials:,} trials)")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    aggregator, = run_simulation(args.trials, args.chunk_size, args.seed)
+    elapsed = time.perf_counter() - start
+
+    report = aggregator.report()
+    print(f"\n  {'lag':>3s} {'T2':>8s} {'T2|T1':>8s} {'intrusion':>10s}")
+    for lag, t2, t2_t1, intrusion in zip(report['lags'], report['t2_accuracy'],
+                                         report['t2_given_t1'], report['intrusion_rate']):
+        print(f"  {lag:3d} {t2:8.4f} {t2_t1:8.4f} {intrusion:10.4f}")
+    print(f"\nLag-1 sparing: {report['lag1_sparing']:.4f}")
+    print(f"{report['trials']:,} trials in {elapsed:.1f} seconds "
+          f"({report['trials'] / elapsed / 1e6:.2f} M trials/s)")
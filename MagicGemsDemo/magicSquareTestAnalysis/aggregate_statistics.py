@@ -0,0 +1,388 @@
+"""
+Aggregate Cell Statistics Across a Collection of Magic Squares
+
+This script computes dataset-wide statistics of how the values at different
+cells co-vary across all 880 (or all 7040, including rotations and
+reflections) 4x4 magic squares:
+
+- the 16x16 cell-by-cell covariance matrix,
+- per-cell value frequency tables,
+- (cell pair, value pair) co-occurrence counts.
+
+Everything is computed on the stacked (N, n*n) array with np.bincount on
+packed indexes and one matrix product per chunk, so nothing loops over cells
+in Python. Chunks are merged with the pairwise (Chan et al.) update, so the
+same accumulator handles order-5 streams that never fit in memory at once.
+"""
+
+import numpy as np
+
+
+def stack_squares(squares):
+    """
+    Stack a list of n x n magic squares into a single integer array.
+
+    Args:
+        squares: list of n x n numpy arrays, or an (N, n, n) array
+
+    Returns:
+        numpy.ndarray: (N, n, n) array of dtype int64
+    """
+    stack = np.asarray(squares, dtype=np.int64)
+    if stack.ndim != 3 or stack.shape[1] != stack.shape[2]:
+        raise ValueError(f"Expected an (N, n, n) stack of squares, got shape {stack.shape}")
+    return stack
+
+
+def symmetry_orbits(stack):
+    """
+    Expand every square into its 8 rotations and reflections.
+
+    Applied to the 880 Frenicle-standard squares this yields all 7040
+    4x4 magic squares.
+
+    Args:
+        stack: (N, n, n) array of squares
+
+    Returns:
+        numpy.ndarray: (8N, n, n) array; block k holds transform k of every square
+    """
+    rotations = [np.rot90(stack, k, axes=(1, 2)) for k in range(4)]
+    reflections = [r.transpose(0, 2, 1) for r in rotations]
+    return np.concatenate(rotations + reflections, axis=0)
+
+
+def iter_chunks(stack, chunk_size=100_000):
+    """Yield successive (chunk_size, n, n) slices of a stack (or memmap)."""
+    for start in range(0, len(stack), chunk_size):
+        yield np.asarray(stack[start:start + chunk_size])
+
+
+class CellStatisticsAccumulator:
+    """
+    Streaming accumulator for cell covariance, value frequencies and
+    (cell pair, value pair) co-occurrence counts.
+
+    Feed it chunks of squares with update() and read the totals with
+    covariance(), value_frequencies() and cooccurrence().
+    """
+
+    def __init__(self, n, track_cooccurrence=True):
+        self.n = n
+        self.n_cells = n * n
+        self.n_values = n * n
+        self.track_cooccurrence = track_cooccurrence
+
+        self.count = 0
+        self.mean = np.zeros(self.n_cells)
+        self.m2 = np.zeros((self.n_cells, self.n_cells))
+        self.freq = np.zeros(self.n_cells * self.n_values, dtype=np.int64)
+        if track_cooccurrence:
+            self.cooc = np.zeros(self.n_cells ** 2 * self.n_values ** 2, dtype=np.int64)
+        else:
+            self.cooc = None
+
+        cells = np.arange(self.n_cells)
+        # Packed base index of every (cell p, cell q) pair, scaled by V*V
+        self._pair_base = ((cells[:, None] * self.n_cells + cells[None, :])
+                           * self.n_values ** 2).ravel()
+        self._cell_base = cells * self.n_values
+
+    def update(self, chunk):
+        """
+        Add a chunk of squares to the running totals.
+
+        Args:
+            chunk: (m, n, n) array of squares with values 1..n*n
+        """
+        X = np.asarray(chunk, dtype=np.int64).reshape(-1, self.n_cells)
+        m = len(X)
+        if m == 0:
+            return
+        values = X - 1
+
+        # Per-cell value frequencies: pack (cell, value) into one index
+        self.freq += np.bincount((self._cell_base + values).ravel(),
+                                 minlength=self.freq.size)
+
+        # Co-occurrence: pack (cell p, cell q, value u, value v) into one index
+        if self.track_cooccurrence:
+            value_pairs = (values[:, :, None] * self.n_values + values[:, None, :]).reshape(m, -1)
+            self.cooc += np.bincount((self._pair_base + value_pairs).ravel(),
+                                     minlength=self.cooc.size)
+
+        # Covariance: one GEMM on the centered chunk, merged pairwise
+        chunk_mean = X.mean(axis=0)
+        centered = X - chunk_mean
+        chunk_m2 = centered.T @ centered
+
+        total = self.count + m
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + np.outer(delta, delta) * (self.count * m / total)
+        self.mean += delta * (m / total)
+        self.count = total
+
+    def covariance(self, ddof=1):
+        """Return the (n*n, n*n) cell-by-cell covariance matrix."""
+        return self.m2 / (self.count - ddof)
+
+    def correlation(self):
+        """Return the (n*n, n*n) cell-by-cell correlation matrix."""
+        cov = self.covariance()
+        sd = np.sqrt(np.diag(cov))
+        return cov / np.outer(sd, sd)
+
+    def value_frequencies(self):
+        """Return an (n*n cells, n*n values) table of value counts per cell."""
+        return self.freq.reshape(self.n_cells, self.n_values)
+
+    def cooccurrence(self):
+        """
+        Return the co-occurrence tensor.
+
+        Entry [p, q, u, v] counts squares with value u+1 at cell p and
+        value v+1 at cell q.
+        """
+        if self.cooc is None:
+            raise RuntimeError("Co-occurrence tracking was disabled for this accumulator")
+        return self.cooc.reshape(self.n_cells, self.n_cells, self.n_values, self.n_values)
+
+
+class StreamingHistogram:
+    """
+    Fixed-bin histogram and summary statistics of one metric, built chunk
+    by chunk without keeping the values.
+
+    The bins are equal width. Without a fixed range they start at the range
+    of the first chunk; whenever a value falls outside, the bins are rebuilt
+    around all the values seen so far: the width is doubled until they fit,
+    and the new range starts on an old bin edge chosen to centre them, so
+    every old bin falls inside one new bin and the counts stay exact. The
+    bin count never changes, and a width is only doubled when the data
+    could not fit at the previous width on any old bin edge, so the bins end
+    up less than 2 * bins / (bins - 1) times as wide as bins fitted to the
+    final range (2.04x for 50 bins), unless the first chunk was constant.
+    """
+
+    def __init__(self, bins=50, range=None, tolerance=1e-10):
+        """
+        Args:
+            bins: number of bins
+            range: optional fixed (low, high); values outside are counted
+                   in underflow/overflow instead of widening the bins
+            tolerance: values with |x| < tolerance are counted as zero
+        """
+        if bins < 1:
+            raise ValueError(f"bins must be >= 1, got {bins}")
+        self.bins = bins
+        self.fixed = range is not None
+        self.low, self.width = (None, None) if range is None else (
+            float(range[0]), (range[1] - range[0]) / bins)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.tolerance = tolerance
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.near_zero = 0
+
+    @property
+    def high(self):
+        return self.low + self.bins * self.width
+
+    def edges(self):
+        """Return the bins + 1 bin edges."""
+        return self.low + self.width * np.arange(self.bins + 1)
+
+    def _widen(self, low, high):
+        """Re-bin so that [low, high] and every value seen so far lie inside the range."""
+        if low >= self.low and high <= self.high:
+            return
+        low, high = min(low, self.min), max(high, self.max)
+
+        # Smallest power-of-two multiple of the width at which some range
+        # starting on an old bin edge covers the data
+        width = self.width
+        while True:
+            first = np.ceil((high - self.bins * width - self.low) / self.width)
+            last = np.floor((low - self.low) / self.width)
+            if first <= last:
+                break
+            width *= 2
+
+        # The old bin edge that best centres the data
+        centred = np.round(((low + high - self.bins * width) / 2 - self.low) / self.width)
+        new_low = self.low + np.clip(centred, first, last) * self.width
+
+        centres = self.low + self.width * (np.arange(self.bins) + 0.5)
+        index = np.floor((centres - new_low) / width).astype(np.int64)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.counts = np.bincount(index, weights=self.counts,
+                                  minlength=self.bins).astype(np.int64)
+        self.low, self.width = new_low, width
+
+    def update(self, values):
+        """
+        Add a chunk of values.
+
+        Args:
+            values: array-like of metric values (NaN is not allowed)
+        """
+        x = np.asarray(values, dtype=np.float64).ravel()
+        m = len(x)
+        if m == 0:
+            return
+        lo, hi = x.min(), x.max()
+
+        if self.low is None:
+            if hi > lo:
+                self.low, self.width = lo, (hi - lo) / self.bins
+            else:
+                # Constant chunk: a unit range centred on it, as np.histogram does
+                self.low, self.width = lo - 0.5, 1.0 / self.bins
+        elif not self.fixed:
+            self._widen(lo, hi)
+
+        index = np.floor((x - self.low) / self.width).astype(np.int64)
+        # The top edge belongs to the last bin
+        index[x == self.high] = self.bins - 1
+        if self.fixed:
+            self.underflow += int(np.count_nonzero(index < 0))
+            self.overflow += int(np.count_nonzero(index >= self.bins))
+            index = index[(index >= 0) & (index < self.bins)]
+        else:
+            # Rounding at the edges of a widened range
+            np.clip(index, 0, self.bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.bins)
+
+        # Moments merged pairwise, as in CellStatisticsAccumulator
+        chunk_mean = x.mean()
+        chunk_m2 = np.sum((x - chunk_mean) ** 2)
+        total = self.count + m
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + delta * delta * (self.count * m / total)
+        self.mean += delta * (m / total)
+        self.count = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+        self.near_zero += int(np.count_nonzero(np.abs(x) < self.tolerance))
+
+    def std(self, ddof=0):
+        """Standard deviation of the values seen (np.std default ddof=0)."""
+        return np.sqrt(self.m2 / (self.count - ddof))
+
+
+class MetricHistograms:
+    """
+    A StreamingHistogram per named metric, fed with dicts of value arrays.
+    """
+
+    def __init__(self, names, bins=50, ranges=None, tolerance=1e-10):
+        ranges = ranges or {}
+        self.histograms = {name: StreamingHistogram(bins, ranges.get(name), tolerance)
+                           for name in names}
+
+    def update(self, columns):
+        """Add a chunk given as {metric name: values}; other keys are ignored."""
+        for name, histogram in self.histograms.items():
+            if name in columns:
+                histogram.update(columns[name])
+
+    def __getitem__(self, name):
+        return self.histograms[name]
+
+    def __iter__(self):
+        return iter(self.histograms)
+
+
+def compute_cell_statistics(squares, chunk_size=100_000, track_cooccurrence=True):
+    """
+    Compute aggregate cell statistics over a collection of squares.
+
+    Args:
+        squares: (N, n, n) array, list of squares, or an iterable of chunks
+        chunk_size: number of squares per chunk when slicing an array
+        track_cooccurrence: whether to build the co-occurrence tensor
+
+    Returns:
+        CellStatisticsAccumulator: accumulator holding the totals
+    """
+    if isinstance(squares, (list, np.ndarray)):
+        chunks = iter_chunks(stack_squares(squares) if isinstance(squares, list) else squares,
+                             chunk_size)
+    else:
+        chunks = iter(squares)
+
+    acc = None
+    for chunk in chunks:
+        if acc is None:
+            acc = CellStatisticsAccumulator(chunk.shape[-1], track_cooccurrence)
+        acc.update(chunk)
+
+    if acc is None:
+        raise ValueError("No squares to analyze")
+    return acc
+
+
+def print_cell_statistics(acc, label):
+    """Print a summary of the aggregate statistics."""
+    n = acc.n
+    print("\n" + "="*70)
+    print(f"AGGREGATE CELL STATISTICS: {label} ({acc.count} squares)")
+    print("="*70)
+
+    np.set_printoptions(precision=2, suppress=True, linewidth=120)
+    cov = acc.covariance()
+    print("\nCell variances (n x n grid):")
+    print(np.diag(cov).reshape(n, n))
+
+    off_diag = cov[~np.eye(acc.n_cells, dtype=bool)]
+    print("\nOff-diagonal cell covariances:")
+    print(f"  Min:  {off_diag.min():10.6f}")
+    print(f"  Max:  {off_diag.max():10.6f}")
+    print(f"  Mean: {off_diag.mean():10.6f}")
+
+    # Row sums of the covariance matrix are zero whenever the total of all
+    # cells is fixed, which is true for every magic square
+    print(f"\nMax |row sum| of covariance matrix: {np.abs(cov.sum(axis=1)).max():.2e}")
+
+    freq = acc.value_frequencies()
+    print("\nValue frequency table (rows = cells, columns = values 1..n*n):")
+    print(freq)
+
+    if acc.cooc is not None:
+        cooc = acc.cooccurrence()
+        # Pairs of distinct cells never share a value
+        shared = np.einsum('pquu->pq', cooc)
+        shared[np.diag_indices(acc.n_cells)] = 0
+        print(f"\nCo-occurrence tensor shape: {cooc.shape}")
+        print(f"Distinct cells sharing a value (must be 0): {shared.sum()}")
+
+
+if __name__ == "__main__":
+    from generation_cache import frenicle_squares
+
+    squares = stack_squares(frenicle_squares(4))
+
+    acc = compute_cell_statistics(squares)
+    print_cell_statistics(acc, "Frenicle-standard squares")
+
+    acc_all = compute_cell_statistics(symmetry_orbits(squares))
+    print_cell_statistics(acc_all, "all rotations and reflections")
+
+    # Streamed histogram of drifting normal chunks: every value counted,
+    # and bins within the documented bound of bins fitted to all the data
+    rng = np.random.default_rng(42)
+    histogram = StreamingHistogram(bins=50)
+    for shift in (0.0, -3.0, 2.0, -8.0, 5.0):
+        histogram.update(rng.normal(shift, 1.0, 10_000))
+    ratio = histogram.width / ((histogram.max - histogram.min) / histogram.bins)
+    bound = 2 * histogram.bins / (histogram.bins - 1)
+    print(f"\nStreamed histogram of {histogram.count:,} values over "
+          f"[{histogram.low:.2f}, {histogram.high:.2f}] (data [{histogram.min:.2f}, {histogram.max:.2f}]): "
+          f"bin width {ratio:.2f}x fitted, bound {bound:.2f}x")
+    assert histogram.counts.sum() == histogram.count and ratio < bound
@@ -13,13 +13,33 @@ import pickle
 import time
 from pathlib import Path
 
+from analysis_pipeline import run_pipeline, load_pipeline_output, print_pipeline_summary
+from generation_cache import SHARDED_GENERATOR, cache_squares, frenicle_squares
+from profiling import add_profile_argument, run_main, stage
+from progress_reporting import Progress, tree_coverage
+from sharded_enumeration import enumerate_prefixes
+
+
+# Search depths whose branch positions feed the progress coverage estimate
+PROGRESS_DEPTH = 2
+
 
 class MagicSquareGenerator:
     """Generator for all 880 4x4 magic squares in Frenicle standard form."""
     
-    def __init__(self):
+    def __init__(self, stats=None, progress=None):
+        """
+        Args:
+            stats: optional search_instrumentation.SearchStats that records
+                   nodes, candidates, prunes and time per depth
+            progress: optional progress_reporting.Progress (default: one
+                      created by generate_all)
+        """
         self.magic_sum = 34
         self.squares = []
+        self.stats = stats
+        self.progress = progress
+        self._path = [(0, 1)] * PROGRESS_DEPTH
         
     def generate_all(self, max_squares=880):
         """Generate all magic squares using backtracking with optimizations."""
@@ -32,9 +52,13 @@ class MagicSquareGenerator:
         
         start_time = time.time()
         
+        if self.progress is None:
+            self.progress = Progress('MagicSquareGenerator', target=max_squares)
+        
         grid = np.zeros((4, 4), dtype=int)
         used = set()
         self._backtrack(grid, used, 0, max_squares)
+        self.progress.finish()
         
         elapsed = time.time() - start_time
         print(f"\n✓ Generation complete in {elapsed:.1f} seconds!")
@@ -44,27 +68,52 @@ class MagicSquareGenerator:
     
     def _backtrack(self, grid, used, pos, max_squares):
         """Recursive backtracking with heavy pruning."""
+        if self.stats is None:
+            return self._expand(grid, used, pos, max_squares)
+        start = self.stats.enter(pos)
+        try:
+            return self._expand(grid, used, pos, max_squares)
+        finally:
+            self.stats.exit(pos, start)
+    
+    def _expand(self, grid, used, pos, max_squares):
+        """Expand one node of the search tree."""
+        stats = self.stats
         if len(self.squares) >= max_squares:
             return True
             
         if pos == 16:
             if self._verify_complete(grid) and self._is_frenicle(grid):
                 self.squares.append(grid.copy())
-                if len(self.squares) % 88 == 0:
-                    print(f"  Progress: {len(self.squares)}/{max_squares} squares found...")
+                if stats is not None:
+                    stats.solution(pos)
+                self.progress.update(items=1)
             return False
         
         row, col = pos // 4, pos % 4
         
         # Get valid candidates for this position
         candidates = self._get_candidates(grid, row, col, used)
-        
-        for num in candidates:
+        if stats is not None and not candidates:
+            # The forced value completing a row or column is unavailable;
+            # count it as one candidate tried and pruned
+            stats.tried(pos)
+            stats.prune(pos, 'row' if col == 3 else 'column')
+        
+        for k, num in enumerate(candidates):
+            if pos < PROGRESS_DEPTH:
+                self._path[pos] = (k, len(candidates))
+                self.progress.update(coverage=tree_coverage(self._path[:pos + 1]))
             grid[row, col] = num
             used.add(num)
             
             # Only continue if this placement is valid
-            if self._is_valid_placement(grid, row, col):
+            failure = self._placement_failure(grid, row, col)
+            if stats is not None:
+                stats.tried(pos)
+                if failure is not None:
+                    stats.prune(pos, failure)
+            if failure is None:
                 if self._backtrack(grid, used, pos + 1, max_squares):
                     return True
             
@@ -77,9 +126,10 @@ class MagicSquareGenerator:
         """Get candidate numbers for position with smart ordering."""
         available = [i for i in range(1, 17) if i not in used]
         
-        # Frenicle constraint: first position limited to 1-4
+        # Frenicle constraint: the top-left corner is the smallest of the
+        # four corners, which always sum to 34, so it is at most 7
         if row == 0 and col == 0:
-            return [i for i in available if i <= 4]
+            return [i for i in available if i <= 7]
         
         # If completing a row, only one choice
         if col == 3:
@@ -95,28 +145,32 @@ class MagicSquareGenerator:
     
     def _is_valid_placement(self, grid, row, col):
         """Check if current placement maintains validity."""
+        return self._placement_failure(grid, row, col) is None
+    
+    def _placement_failure(self, grid, row, col):
+        """Name the constraint the current placement breaks, or None."""
         # Check completed row
         if col == 3:
             if np.sum(grid[row, :]) != self.magic_sum:
-                return False
+                return 'row'
         
         # Check completed column
         if row == 3:
             if np.sum(grid[:, col]) != self.magic_sum:
-                return False
+                return 'column'
         
         # Check diagonals if at final position
         if row == 3 and col == 3:
             if np.sum(np.diag(grid)) != self.magic_sum:
-                return False
+                return 'diagonal'
             if np.sum(np.diag(np.fliplr(grid))) != self.magic_sum:
-                return False
+                return 'diagonal'
             
             # Frenicle check
             if not self._is_frenicle(grid):
-                return False
+                return 'frenicle'
         
-        return True
+        return None
     
     def _verify_complete(self, grid):
         """Verify a complete magic square."""
@@ -142,7 +196,8 @@ class MagicSquareGenerator:
         """Check Frenicle standard form constraints."""
         return (grid[0, 0] < grid[0, 3] and 
                 grid[0, 0] < grid[3, 0] and
-                grid[0, 0] < grid[3, 3])
+                grid[0, 0] < grid[3, 3] and
+                grid[0, 1] < grid[1, 0])
 
 
 class CovarianceAnalyzer:
@@ -215,11 +270,10 @@ class CovarianceAnalyzer:
             'cov_diag': [],
         }
         
-        for idx, square in enumerate(squares):
-            if (idx + 1) % 100 == 0:
-                print(f"  Analyzed {idx + 1}/{len(squares)} squares...")
-            
+        progress = Progress('covariance analysis', total=len(squares))
+        for square in squares:
             covs = CovarianceAnalyzer.calculate_all_covariances(square)
+            progress.update(items=1, done=1)
             
             results['cov_row_idx'].append(covs['cov_row_index_value'])
             results['cov_col_idx'].append(covs['cov_col_index_value'])
@@ -227,6 +281,8 @@ class CovarianceAnalyzer:
             results['mean_col_cov'].append(covs['mean_col_pair_cov'])
             results['cov_diag'].append(covs['cov_diagonals'])
         
+        progress.finish()
+        
         # Convert to arrays
         for key in results:
             results[key] = np.array(results[key])
@@ -330,31 +386,44 @@ class CovarianceAnalyzer:
         print("\n" + "="*70)
 
 
-def main():
-    """Main execution function."""
+def main(pipeline=False, processes=None):
+    """
+    Main execution function.
+
+    Args:
+        pipeline: regenerate the squares with generation, metric evaluation
+                  and writing overlapped (see analysis_pipeline)
+        processes: generation worker processes in pipelined mode
+    """
     print("\n" + "="*70)
     print(" REPRODUCIBLE ANALYSIS OF ALL 880 4x4 MAGIC SQUARES")
     print(" Covariance Study")
     print("="*70)
     print()
     
-    cache_file = Path("magic_squares_880.pkl")
+    squares = None
+    results = None
     
-    # Try to load cached squares
-    if cache_file.exists():
-        print("Loading cached magic squares...")
-        with open(cache_file, 'rb') as f:
-            squares = pickle.load(f)
-        print(f"✓ Loaded {len(squares)} magic squares from cache\n")
-    else:
-        # Generate all 880 squares
-        generator = MagicSquareGenerator()
-        squares = generator.generate_all(max_squares=880)
-        
-        # Save for future use
-        with open(cache_file, 'wb') as f:
-            pickle.dump(squares, f)
-        print(f"✓ Saved magic squares to {cache_file}\n")
+    if pipeline:
+        print("Pipelined mode: generating, analyzing and writing concurrently...")
+        with stage('pipeline'):
+            summary = run_pipeline("pipeline_output", processes=processes)
+        print_pipeline_summary(summary)
+        stack, columns = load_pipeline_output("pipeline_output")
+        squares = [np.array(square, dtype=np.int64) for square in stack]
+        results = {key: np.array(values) for key, values in columns.items()}
+        # The pipeline runs the sharded_enumeration search, so its verified
+        # output is cached under that generator's key
+        if not cache_squares(SHARDED_GENERATOR, squares, enumerate_prefixes):
+            print("Pipeline output failed verification; regenerating.\n")
+            squares = results = None
+    
+    if squares is None:
+        # The verified Frenicle enumeration, generated in seconds on a cache
+        # miss; MagicSquareGenerator's backtracking search takes far longer
+        with stage('load squares'):
+            squares = frenicle_squares(4)
+        print()
     
     # Verify we have enough squares
     if len(squares) < 100:
@@ -363,14 +432,17 @@ def main():
     
     # Perform covariance analysis
     analyzer = CovarianceAnalyzer()
-    results = analyzer.analyze_all_squares(squares)
+    if results is None:
+        with stage('covariance analysis'):
+            results = analyzer.analyze_all_squares(squares)
     
     # Print results
-    analyzer.print_results(results, squares)
+    with stage('report'):
+        analyzer.print_results(results, squares)
     
     # Save results
     results_file = Path("covariance_results.pkl")
-    with open(results_file, 'wb') as f:
+    with stage('save results'), open(results_file, 'wb') as f:
         pickle.dump({
             'results': results,
             'n_squares': len(squares),
@@ -383,4 +455,14 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Covariance analysis of all 880 4x4 magic squares")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="regenerate with overlapped generation, analysis and writing")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="generation worker processes in pipelined mode")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    run_main(main, args.profile, 'all_880_analysis',
+             pipeline=args.pipeline, processes=args.processes)
@@ -0,0 +1,277 @@
+"""
+Pipelined Generation, Analysis and Persistence of Magic Squares
+
+all_880_analysis.main generates every square, then analyzes them, then
+saves them, one stage after the other. Here the three stages overlap:
+
+    worker processes --> [square queue] --> metrics thread --> [write queue] --> writer thread
+    (enumerate prefix      bounded           batch_metrics        bounded          packed square store
+     chunks)                                 on batches                            + one file per metric
+
+Prefix chunks are handed to a process pool with a bounded number of tasks
+in flight and collected in submission order, so the output is in canonical
+(lexicographic) order. Full queues block the stage feeding them, which
+keeps memory bounded when one stage is slower than the others. With the
+stages overlapping, the end-to-end wall time approaches that of the
+slowest stage on its own.
+
+Output directory layout:
+    squares.u8      packed (N, n*n) uint8 squares, appended in order
+    <metric>.f8     one float64 column per metric
+    summary.json    order, count, columns and per-stage timings
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from line_covariance import batch_metrics
+from progress_reporting import Progress
+from sharded_enumeration import enumerate_prefixes, first_row_prefixes, ordered_rows
+
+
+# End-of-stream marker passed down every queue
+_DONE = object()
+
+# Row tables cached per worker process
+_TABLES = {}
+
+
+def _generate_chunk(n, prefixes):
+    """Worker task: enumerate the squares below a chunk of first-row prefixes."""
+    if n not in _TABLES:
+        _TABLES[n] = ordered_rows(n)
+    rows, masks = _TABLES[n]
+    start = time.process_time()
+    squares, _ = enumerate_prefixes(n, prefixes, rows, masks)
+    return squares, time.process_time() - start
+
+
+class _Stage:
+    """Busy time, item count and time spent blocked on a full queue for one stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.items = 0
+        self.error = None
+
+    def put(self, q, item):
+        """Put an item downstream, recording how long back-pressure held us."""
+        start = time.perf_counter()
+        q.put(item)
+        self.blocked += time.perf_counter() - start
+
+
+def _metrics_stage(n, in_q, out_q, batch_size, stage):
+    """Gather square blocks into batches and evaluate the metrics on each."""
+    pending, n_pending = [], 0
+    block = None
+    try:
+        while block is not _DONE:
+            block = in_q.get()
+            if block is not _DONE:
+                pending.append(block)
+                n_pending += len(block)
+            if n_pending and (n_pending >= batch_size or block is _DONE):
+                start = time.perf_counter()
+                batch = np.concatenate(pending)
+                metrics = batch_metrics(batch.reshape(-1, n, n).astype(np.int64))
+                stage.busy += time.perf_counter() - start
+                stage.items += len(batch)
+                stage.put(out_q, (batch, metrics))
+                pending, n_pending = [], 0
+    except Exception as exc:
+        stage.error = exc
+        # Keep draining so the producer never blocks on a dead consumer
+        while block is not _DONE:
+            block = in_q.get()
+    finally:
+        out_q.put(_DONE)
+
+
+def _writer_stage(out_dir, in_q, stage, columns):
+    """Append squares and metric columns to their files."""
+    files = {}
+    item = None
+    try:
+        with open(out_dir / "squares.u8", 'wb') as square_file:
+            while True:
+                item = in_q.get()
+                if item is _DONE:
+                    break
+                batch, metrics = item
+                start = time.perf_counter()
+                square_file.write(np.ascontiguousarray(batch, dtype=np.uint8).tobytes())
+                for key, values in metrics.items():
+                    if key not in files:
+                        files[key] = open(out_dir / f"{key}.f8", 'wb')
+                        columns.append(key)
+                    files[key].write(np.asarray(values, dtype=np.float64).tobytes())
+                stage.busy += time.perf_counter() - start
+                stage.items += len(batch)
+    except Exception as exc:
+        stage.error = exc
+        while item is not _DONE:
+            item = in_q.get()
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def run_pipeline(out_dir, n=4, processes=None, chunk_prefixes=32, batch_size=4096,
+                 queue_blocks=16, max_in_flight=None, progress=None):
+    """
+    Enumerate, analyze and store all Frenicle-standard squares of order n.
+
+    Args:
+        out_dir: output directory (created if needed)
+        n: order of the squares
+        processes: generation worker processes (None = one per CPU)
+        chunk_prefixes: first-row prefixes per generation task
+        batch_size: squares per metrics batch
+        queue_blocks: capacity of each inter-stage queue, in blocks
+        max_in_flight: generation tasks submitted but not yet collected
+                       (default: twice the number of processes)
+        progress: optional progress_reporting.Progress, updated per collected
+                  chunk (default: a new one over the first-row prefixes)
+
+    Returns:
+        dict: the run summary (also written to summary.json)
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    prefixes = first_row_prefixes(n)
+    chunks = [prefixes[i:i + chunk_prefixes] for i in range(0, len(prefixes), chunk_prefixes)]
+    if progress is None:
+        progress = Progress(f'pipeline order {n}', total=len(prefixes))
+
+    generate = _Stage('generate')
+    analyze = _Stage('metrics')
+    write = _Stage('write')
+    square_q = queue.Queue(maxsize=queue_blocks)
+    write_q = queue.Queue(maxsize=queue_blocks)
+    columns = []
+
+    wall_start = time.perf_counter()
+    threads = [
+        threading.Thread(target=_metrics_stage, args=(n, square_q, write_q, batch_size, analyze)),
+        threading.Thread(target=_writer_stage, args=(out_dir, write_q, write, columns)),
+    ]
+    started = False
+
+    try:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            limit = max_in_flight or 2 * workers
+            in_flight = deque()
+            next_chunk = 0
+            while next_chunk < len(chunks) or in_flight:
+                while next_chunk < len(chunks) and len(in_flight) < limit:
+                    in_flight.append((pool.submit(_generate_chunk, n, chunks[next_chunk]),
+                                      len(chunks[next_chunk])))
+                    next_chunk += 1
+                # The first submit forks the workers; start the stage threads
+                # only afterwards, since forking a process with running
+                # threads can leave the children deadlocked
+                if not started:
+                    for t in threads:
+                        t.start()
+                    started = True
+                future, n_prefixes = in_flight.popleft()
+                squares, cpu = future.result()
+                generate.busy += cpu
+                generate.items += len(squares)
+                progress.update(items=len(squares), done=n_prefixes)
+                if len(squares):
+                    generate.put(square_q, squares)
+    except Exception as exc:
+        generate.error = exc
+    finally:
+        square_q.put(_DONE)
+        for t in threads:
+            if not started:
+                t.start()
+            t.join()
+    wall = time.perf_counter() - wall_start
+    progress.finish()
+
+    for stage in [generate, analyze, write]:
+        if stage.error is not None:
+            raise RuntimeError(f"Pipeline stage '{stage.name}' failed") from stage.error
+
+    summary = {
+        'order': n,
+        'n_squares': write.items,
+        'columns': columns,
+        'wall_seconds': wall,
+        'stages': {stage.name: {'busy_seconds': stage.busy,
+                                'blocked_seconds': stage.blocked,
+                                'items': stage.items}
+                   for stage in [generate, analyze, write]},
+    }
+    with open(out_dir / "summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def load_pipeline_output(out_dir):
+    """
+    Open the squares and metric columns written by run_pipeline.
+
+    Returns:
+        tuple: ((N, n, n) uint8 memmap of squares, dict of (N,) float64
+        memmaps keyed by metric name)
+    """
+    out_dir = Path(out_dir)
+    with open(out_dir / "summary.json") as f:
+        summary = json.load(f)
+    n, count = summary['order'], summary['n_squares']
+    if count == 0:
+        return np.empty((0, n, n), dtype=np.uint8), {key: np.empty(0) for key in summary['columns']}
+    squares = np.memmap(out_dir / "squares.u8", dtype=np.uint8, mode='r', shape=(count, n, n))
+    columns = {key: np.memmap(out_dir / f"{key}.f8", dtype=np.float64, mode='r', shape=(count,))
+               for key in summary['columns']}
+    return squares, columns
+
+
+def print_pipeline_summary(summary):
+    """Print per-stage timings next to the end-to-end wall time."""
+    print("\n" + "-"*70)
+    print("PIPELINE SUMMARY")
+    print("-"*70)
+    print(f"\n{summary['n_squares']} squares of order {summary['order']} "
+          f"in {summary['wall_seconds']:.2f} seconds wall time")
+    print(f"\n  {'stage':10s} {'busy (s)':>10s} {'blocked (s)':>12s} {'squares':>10s}")
+    for name, stage in summary['stages'].items():
+        print(f"  {name:10s} {stage['busy_seconds']:10.2f} {stage['blocked_seconds']:12.2f} "
+              f"{stage['items']:10d}")
+    print("\n  generate busy time is worker CPU time summed over processes;"
+          "\n  blocked time is spent waiting on a full downstream queue.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pipelined enumeration and analysis")
+    parser.add_argument('out_dir', nargs='?', default="pipeline_output")
+    parser.add_argument('--order', type=int, default=4)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"PIPELINED ENUMERATION AND ANALYSIS (order {args.order})")
+    print("="*70)
+    summary = run_pipeline(args.out_dir, n=args.order, processes=args.processes,
+                           batch_size=args.batch_size)
+    print_pipeline_summary(summary)
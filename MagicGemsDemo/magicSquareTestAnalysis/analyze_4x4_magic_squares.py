@@ -8,7 +8,9 @@ and analyzes their covariance properties.
 import numpy as np
 from itertools import permutations
 import pickle
-from pathlib import Path
+
+from generation_cache import frenicle_squares
+from progress_reporting import Progress
 
 
 def verify_magic_square(square):
@@ -257,34 +259,14 @@ def is_frenicle_standard_check(square):
 
 def load_known_880_squares():
     """
-    Load all 880 squares from a hardcoded or external source.
-    For reproducibility, we'll use a deterministic generation or known list.
+    Load all 880 squares from a verified source.
+
+    generate_all_880_systematically below is incomplete (its per-value
+    search is a placeholder), so its output is never cached; the squares
+    come from the generation cache's Frenicle enumeration instead.
     """
-    # For this implementation, I'll generate them using a known algorithm
     # Reference: https://oeis.org/A006052
-    
-    import urllib.request
-    import json
-    
-    # Check if we have a cached version
-    cache_file = Path("magic_squares_880.pkl")
-    
-    if cache_file.exists():
-        print("Loading cached magic squares...")
-        with open(cache_file, 'rb') as f:
-            return pickle.load(f)
-    
-    # Generate them programmatically
-    print("Generating all 880 magic squares...")
-    print("This uses a systematic enumeration algorithm...")
-    
-    squares = generate_all_880_systematically()
-    
-    # Cache for future use
-    with open(cache_file, 'wb') as f:
-        pickle.dump(squares, f)
-    
-    return squares
+    return frenicle_squares(4)
 
 
 def generate_all_880_systematically():
@@ -418,9 +400,9 @@ def analyze_all_squares():
         'squares_with_zero_cov': []
     }
     
+    progress = Progress('covariance analysis', total=len(squares))
     for idx, square in enumerate(squares):
-        if (idx + 1) % 100 == 0:
-            print(f"  Processed {idx + 1}/{len(squares)} squares...")
+        progress.update(items=1, done=1)
         
         # Calculate covariances
         pos_cov = calculate_position_covariance(square)
@@ -446,6 +428,7 @@ def analyze_all_squares():
             abs(pos_cov['cov_y_value']) < tolerance and
             abs(pos_cov['cov_sum_value']) < tolerance):
             results['squares_with_zero_cov'].append((idx, square))
+    progress.finish()
     
     # Print results
     print("\n" + "=" * 70)
@@ -0,0 +1,315 @@
+"""
+Parallel Simulated-Annealing Search for Extreme Magic Squares
+
+For n >= 6 the magic squares cannot be enumerated, but we still want squares
+that maximize or minimize a metric such as the diagonal covariance. This
+script runs many annealing chains in lockstep as one (chains, n, n) NumPy
+array:
+
+- each step proposes one move in every chain: a random swap of two cells,
+  or a rectangle move that swaps two pairs of cells across two rows or two
+  columns (see propose_swaps),
+- row, column and diagonal sums are updated incrementally from the swaps,
+- the energy is a penalty on broken magic lines minus the (signed) metric in
+  units of its spread over random arrangements, with the penalty weight
+  growing as the chains cool,
+- proposals are accepted with the Metropolis rule on a geometric schedule.
+
+Only the line sums are updated incrementally: the metric is recomputed in
+full for every chain at every step. Each metric is O(n^2) per square, the
+same order as copying the proposed states, and at order 6 with batches of
+64 chains it takes about a third of the time of a step.
+
+Chains are split into fixed batches, each with its own SeedSequence child
+stream, and the batches are spread across a process pool, so results are
+reproducible for a given seed regardless of the number of processes.
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from line_covariance import (LINE_FAMILIES, position_weights, projection_covariance,
+                             pair_covariances, mean_off_diagonal)
+from progress_reporting import Progress
+
+
+def _diag_cov(stack):
+    return pair_covariances(stack, LINE_FAMILIES['diagonals'](stack.shape[-1]))[:, 0, 1]
+
+
+def _broken_diag_cov(stack):
+    return mean_off_diagonal(pair_covariances(stack, LINE_FAMILIES['broken_diagonals'](stack.shape[-1])))
+
+
+def _quadrant_cov(stack):
+    return mean_off_diagonal(pair_covariances(stack, LINE_FAMILIES['quadrants'](stack.shape[-1])))
+
+
+def _sum_index_cov(stack):
+    return projection_covariance(stack, position_weights(stack.shape[-1]))[:, 2]
+
+
+# Share of moves that are rectangle moves (see propose_swaps)
+RECTANGLE_FRACTION = 0.5
+
+# Random arrangements used to measure the spread of the metric
+SCALE_SAMPLES = 256
+
+# Metrics are looked up by name so they can be sent to worker processes
+METRICS = {
+    'cov_diag': _diag_cov,
+    'mean_broken_diag_cov': _broken_diag_cov,
+    'mean_quadrant_cov': _quadrant_cov,
+    'cov_sum_index': _sum_index_cov,
+}
+
+
+def magic_penalty(row_sums, col_sums, diag_sums, magic_sum):
+    """Sum of squared deviations of every line sum from the magic constant."""
+    return (((row_sums - magic_sum) ** 2).sum(axis=1)
+            + ((col_sums - magic_sum) ** 2).sum(axis=1)
+            + ((diag_sums - magic_sum) ** 2).sum(axis=1))
+
+
+def propose_swaps(rng, n, n_chains, rectangle_fraction=0.5):
+    """
+    One move per chain, as two cell swaps (p1, q1) and (p2, q2).
+
+    A plain move swaps two random cells; its second swap is a no-op (p2 =
+    q2). A rectangle move picks two rows and two columns and swaps the
+    corners across one pair of lines (down both columns, or along both
+    rows), which leaves the sums of the other pair unchanged. Near a magic
+    square the last off-by-one rows or columns usually need such a move,
+    since any single swap would break the lines that are already magic.
+
+    Returns:
+        list: [(p1, q1), (p2, q2)] cell-index arrays of length n_chains
+    """
+    n_cells = n * n
+    p1 = rng.integers(0, n_cells, n_chains)
+    q1 = rng.integers(0, n_cells - 1, n_chains)
+    q1 += q1 >= p1
+    p2 = q2 = p1
+
+    rows = rng.integers(0, n, (2, n_chains))
+    rows[1] = (rows[0] + 1 + rng.integers(0, n - 1, n_chains)) % n
+    cols = rng.integers(0, n, (2, n_chains))
+    cols[1] = (cols[0] + 1 + rng.integers(0, n - 1, n_chains)) % n
+    rectangle = rng.random(n_chains) < rectangle_fraction
+    down_columns = rng.random(n_chains) < 0.5
+    corner = rows[:, None, :] * n + cols[None, :, :]
+    p1 = np.where(rectangle, corner[0, 0], p1)
+    q1 = np.where(rectangle, np.where(down_columns, corner[1, 0], corner[0, 1]), q1)
+    p2 = np.where(rectangle, np.where(down_columns, corner[0, 1], corner[1, 0]), p2)
+    q2 = np.where(rectangle, corner[1, 1], q2)
+    return [(p1, q1), (p2, q2)]
+
+
+def anneal_batch(n, n_chains, metric='cov_diag', maximize=True, n_steps=20000,
+                 t_start=10.0, t_end=0.01, penalty_weight=1.0, penalty_growth=1.0,
+                 seed=None):
+    """
+    Run a batch of annealing chains in lockstep.
+
+    Args:
+        n: order of the squares
+        n_chains: number of chains in the batch
+        metric: name of a metric in METRICS
+        maximize: maximize the metric if True, minimize it otherwise
+        n_steps: number of move proposals per chain
+        t_start, t_end: geometric temperature schedule
+        penalty_weight: weight of the squared line-sum deviations at
+            t_start, against the metric measured in standard deviations
+            over random arrangements
+        penalty_growth: the weight at temperature T is
+            penalty_weight * (t_start / T) ** penalty_growth (0 keeps it fixed)
+        seed: int or numpy.random.SeedSequence
+
+    Returns:
+        dict: 'best_squares' (n_chains, n, n), 'best_scores' (n_chains,) with
+        -inf/+inf for chains that never reached a magic square, and
+        'found' (n_chains,) boolean mask
+    """
+    rng = np.random.default_rng(seed)
+    metric_fn = METRICS[metric]
+    sign = 1.0 if maximize else -1.0
+    n_cells = n * n
+    magic_sum = n * (n_cells + 1) // 2
+    chains = np.arange(n_chains)
+
+    X = rng.permuted(np.tile(np.arange(1, n_cells + 1), (n_chains, 1)), axis=1)
+    grid = X.reshape(n_chains, n, n)
+    row_sums = grid.sum(axis=2)
+    col_sums = grid.sum(axis=1)
+    diag_sums = np.stack([np.trace(grid, axis1=1, axis2=2),
+                          np.trace(grid[:, :, ::-1], axis1=1, axis2=2)], axis=1)
+    penalty = magic_penalty(row_sums, col_sums, diag_sums, magic_sum)
+    score = sign * metric_fn(grid)
+
+    # The metric enters the energy in units of its spread over random
+    # arrangements, so the penalty weight means the same for every metric
+    sample = rng.permuted(np.tile(np.arange(1, n_cells + 1), (SCALE_SAMPLES, 1)), axis=1)
+    scale = metric_fn(sample.reshape(SCALE_SAMPLES, n, n)).std() or 1.0
+
+    best_squares = grid.copy()
+    best_scores = np.full(n_chains, -np.inf)
+    feasible = penalty == 0
+    best_scores[feasible] = score[feasible]
+
+    temperatures = t_start * (t_end / t_start) ** (np.arange(n_steps) / max(n_steps - 1, 1))
+    # The penalty weight grows as the chains cool, so they explore freely
+    # early on and are forced onto magic squares by the end
+    weights = penalty_weight * (t_start / temperatures) ** penalty_growth
+
+    for T, weight in zip(temperatures, weights):
+        # The weight changes every step, so the current energy does too
+        energy = weight * penalty - score / scale
+
+        swaps = propose_swaps(rng, n, n_chains, RECTANGLE_FRACTION)
+
+        # Incremental line-sum update: in every swap cell p gains d and
+        # cell q loses d
+        Y = X.copy()
+        new_rows = row_sums.copy()
+        new_cols = col_sums.copy()
+        new_diags = diag_sums.copy()
+        for p, q in swaps:
+            v1 = Y[chains, p]
+            v2 = Y[chains, q]
+            Y[chains, p] = v2
+            Y[chains, q] = v1
+            d = v2 - v1
+            r1, c1 = np.divmod(p, n)
+            r2, c2 = np.divmod(q, n)
+            new_rows[chains, r1] += d
+            new_rows[chains, r2] -= d
+            new_cols[chains, c1] += d
+            new_cols[chains, c2] -= d
+            new_diags[:, 0] += d * (r1 == c1) - d * (r2 == c2)
+            new_diags[:, 1] += d * (r1 + c1 == n - 1) - d * (r2 + c2 == n - 1)
+        new_penalty = magic_penalty(new_rows, new_cols, new_diags, magic_sum)
+
+        new_score = sign * metric_fn(Y.reshape(n_chains, n, n))
+        new_energy = weight * new_penalty - new_score / scale
+
+        delta = new_energy - energy
+        accept = (delta <= 0) | (rng.random(n_chains) < np.exp(-np.maximum(delta, 0) / T))
+
+        X[accept] = Y[accept]
+        row_sums[accept] = new_rows[accept]
+        col_sums[accept] = new_cols[accept]
+        diag_sums[accept] = new_diags[accept]
+        penalty[accept] = new_penalty[accept]
+        score[accept] = new_score[accept]
+
+        improved = (penalty == 0) & (score > best_scores)
+        if improved.any():
+            best_squares[improved] = X[improved].reshape(-1, n, n)
+            best_scores[improved] = score[improved]
+
+    found = np.isfinite(best_scores)
+    return {
+        'best_squares': best_squares,
+        'best_scores': sign * best_scores,
+        'found': found,
+    }
+
+
+def _run_batch(args):
+    """Worker entry point: unpack arguments and run one batch."""
+    kwargs, seed = args
+    return anneal_batch(seed=seed, **kwargs)
+
+
+def parallel_anneal(n, metric='cov_diag', maximize=True, n_chains=256, n_batches=8,
+                    processes=None, seed=0, **kwargs):
+    """
+    Run annealing chains in batches spread across a process pool.
+
+    The chains are always split into n_batches batches, each seeded from
+    SeedSequence(seed).spawn(n_batches), so the result depends only on the
+    seed and never on the number of processes or on scheduling order.
+
+    Args:
+        n: order of the squares
+        metric: name of a metric in METRICS
+        maximize: maximize the metric if True, minimize it otherwise
+        n_chains: total number of chains
+        n_batches: number of independent batches
+        processes: worker processes (None = os.cpu_count(), 1 = run inline)
+        seed: root seed
+        **kwargs: passed to anneal_batch (n_steps, t_start, t_end, penalty_weight,
+            penalty_growth)
+
+    Returns:
+        dict: combined results of all batches, plus the overall 'best_square'
+        and 'best_score' (None if no chain reached a magic square)
+    """
+    sizes = np.diff(np.linspace(0, n_chains, n_batches + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+    jobs = [(dict(n=n, n_chains=int(size), metric=metric, maximize=maximize, **kwargs), s)
+            for size, s in zip(sizes, seeds) if size > 0]
+
+    progress = Progress('annealing', total=len(jobs), unit='chains')
+    results = []
+    if processes == 1:
+        for job in jobs:
+            results.append(_run_batch(job))
+            progress.update(items=job[0]['n_chains'], done=1)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for job, result in zip(jobs, pool.map(_run_batch, jobs)):
+                results.append(result)
+                progress.update(items=job[0]['n_chains'], done=1)
+    progress.finish()
+
+    combined = {key: np.concatenate([r[key] for r in results]) for key in results[0]}
+    found = combined['found']
+    combined['best_square'] = None
+    combined['best_score'] = None
+    if found.any():
+        scores = np.where(found, combined['best_scores'], np.nan)
+        best = np.nanargmax(scores) if maximize else np.nanargmin(scores)
+        combined['best_square'] = combined['best_squares'][best]
+        combined['best_score'] = combined['best_scores'][best]
+    return combined
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Simulated-annealing search for extreme magic squares")
+    parser.add_argument('--order', type=int, default=6, help="order n of the squares")
+    parser.add_argument('--metric', choices=sorted(METRICS), default='cov_diag')
+    parser.add_argument('--minimize', action='store_true', help="minimize instead of maximize")
+    parser.add_argument('--chains', type=int, default=256)
+    parser.add_argument('--batches', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    direction = "minimizing" if args.minimize else "maximizing"
+    print("="*70)
+    print(f"SIMULATED ANNEALING: {direction} {args.metric} for order {args.order}")
+    print("="*70)
+    print(f"\n{args.chains} chains in {args.batches} batches, {args.steps} steps, seed {args.seed}")
+
+    start = time.time()
+    result = parallel_anneal(args.order, metric=args.metric, maximize=not args.minimize,
+                             n_chains=args.chains, n_batches=args.batches,
+                             processes=args.processes, seed=args.seed, n_steps=args.steps)
+    elapsed = time.time() - start
+
+    found = result['found']
+    print(f"\nChains reaching a magic square: {found.sum()}/{len(found)}")
+    print(f"Time elapsed: {elapsed:.1f} seconds")
+    if result['best_square'] is not None:
+        print(f"\nBest {args.metric}: {result['best_score']:.6f}")
+        print(result['best_square'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+"""
+Benchmark Suite for the Generators and Covariance Kernels
+
+The folder has five ways to generate the 4x4 squares and four ways to
+compute their covariances, and nothing says which are fast or even which
+agree. This suite runs every implementation on the same input:
+
+- each case runs `repeats` times in a fresh (spawned) process, so one
+  case cannot warm up or leak memory into the next;
+- wall and CPU time are taken around the call only;
+- peak memory is the peak resident set size (resource.getrusage) of the
+  timed runs, plus the peak of Python allocations (tracemalloc) from one
+  extra, untimed run, since tracing slows pure-Python code down;
+- generator output is checked against the reference set (the cached
+  sharded enumeration), covariance output against batch_metrics;
+- every run is appended to a JSON history file, and each case is compared
+  with the last recorded run of the same configuration, so regressions
+  show up as soon as they happen.
+
+The backtracking generators take tens of minutes for all 880 squares, so
+--max-squares limits those that accept a limit (a correct lexicographic
+search must then yield the first squares of the reference, in order) and
+--timeout stops the others.
+
+Usage:
+    python benchmark_suite.py --max-squares 88 --repeats 3
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+HISTORY_FILE = "benchmark_history.json"
+
+# Metrics compared between covariance kernels (batch_metrics keys)
+METRICS = ('cov_row_idx', 'cov_col_idx', 'mean_row_cov', 'mean_col_cov', 'cov_diag')
+
+
+def _all_880_analysis(max_squares):
+    from all_880_analysis import MagicSquareGenerator
+    return MagicSquareGenerator().generate_all(max_squares=max_squares or 880)
+
+
+def _generate_880_fast(max_squares):
+    from generate_880_fast import create_880_magic_squares_fast
+    return create_880_magic_squares_fast(max_squares=max_squares or 880)
+
+
+def _generate_880_squares(max_squares):
+    from generate_880_squares import generate_880_magic_squares
+    return generate_880_magic_squares()
+
+
+def _analyze_4x4(max_squares):
+    from analyze_4x4_magic_squares import generate_using_algorithmic_enumeration
+    return generate_using_algorithmic_enumeration()
+
+
+def _sharded(max_squares):
+    from sharded_enumeration import enumerate_prefixes, first_row_prefixes
+    squares, _ = enumerate_prefixes(4, first_row_prefixes(4))
+    return squares.reshape(-1, 4, 4)
+
+
+# name -> (function of max_squares, whether it honours the limit)
+GENERATORS = {
+    'all_880_analysis.MagicSquareGenerator': (_all_880_analysis, True),
+    'generate_880_fast.create_880_magic_squares_fast': (_generate_880_fast, True),
+    'generate_880_squares.generate_880_magic_squares': (_generate_880_squares, False),
+    'analyze_4x4.generate_using_algorithmic_enumeration': (_analyze_4x4, False),
+    'sharded_enumeration.enumerate_prefixes': (_sharded, False),
+}
+
+
+def _per_square(function, keys):
+    """Run a per-square covariance function and rename its outputs to METRICS keys."""
+    def run(stack):
+        results = [function(square) for square in stack]
+        return {metric: np.array([r[key] for r in results]) for metric, key in keys.items()}
+    return run
+
+
+def _covariance_analyzer(stack):
+    from all_880_analysis import CovarianceAnalyzer
+    return CovarianceAnalyzer.analyze_all_squares(list(stack))
+
+
+def _covariance_analysis(stack):
+    from covariance_analysis import calculate_covariances
+    return _per_square(calculate_covariances, {
+        'cov_row_idx': 'cov_row_position',
+        'cov_col_idx': 'cov_col_position',
+        'mean_row_cov': 'mean_row_pair_cov',
+        'mean_col_cov': 'mean_col_pair_cov',
+    })(stack)
+
+
+def _position_covariance(stack):
+    from analyze_4x4_magic_squares import calculate_position_covariance
+    return _per_square(calculate_position_covariance, {
+        'cov_row_idx': 'cov_x_value',
+        'cov_col_idx': 'cov_y_value',
+    })(stack)
+
+
+def _batch_metrics(stack):
+    from line_covariance import batch_metrics
+    return batch_metrics(stack)
+
+
+# name -> function of an (N, 4, 4) stack returning a dict of METRICS arrays;
+# the last entry is the reference for the others
+COVARIANCE_KERNELS = {
+    'all_880_analysis.CovarianceAnalyzer': _covariance_analyzer,
+    'covariance_analysis.calculate_covariances': _covariance_analysis,
+    'analyze_4x4.calculate_position_covariance': _position_covariance,
+    'line_covariance.batch_metrics': _batch_metrics,
+}
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if platform.system() == 'Darwin' else peak / 2**10
+
+
+def _run_case(kind, name, argument, trace, conn):
+    """Child process: run one case once and send back its timings and output."""
+    try:
+        function = GENERATORS[name][0] if kind == 'generator' else COVARIANCE_KERNELS[name]
+        if trace:
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        # The generators report progress on stdout; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            output = function(argument)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        traced = None
+        if trace:
+            traced = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+        if kind == 'generator':
+            output = np.array([np.asarray(square).reshape(4, 4) for square in output],
+                              dtype=np.int64).reshape(-1, 4, 4)
+        else:
+            output = {key: np.asarray(values, dtype=np.float64) for key, values in output.items()
+                      if key in METRICS}
+        conn.send({'wall': wall, 'cpu': cpu, 'peak_rss_mb': _peak_rss_mb(),
+                   'traced_mb': traced, 'output': output})
+    except Exception as exc:
+        conn.send({'error': f"{type(exc).__name__}: {exc}"})
+    finally:
+        conn.close()
+
+
+def run_once(kind, name, argument, trace=False, timeout=None):
+    """
+    Run one case in a fresh process.
+
+    Returns:
+        dict: 'wall', 'cpu', 'peak_rss_mb', 'traced_mb' and 'output', or
+        'error' if the case raised or ran past the timeout
+    """
+    ctx = multiprocessing.get_context('spawn')
+    receive, send = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_case, args=(kind, name, argument, trace, send))
+    process.start()
+    send.close()
+    try:
+        if receive.poll(timeout):
+            return receive.recv()
+        return {'error': f"timed out after {timeout} seconds"}
+    except EOFError:
+        return {'error': f"process exited with code {process.exitcode}"}
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receive.close()
+
+
+def _timing_summary(runs):
+    wall = [run['wall'] for run in runs]
+    cpu = [run['cpu'] for run in runs]
+    rss = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    return {
+        'repeats': len(runs),
+        'wall_seconds': wall,
+        'wall_min': min(wall),
+        'wall_median': float(np.median(wall)),
+        'wall_mean': float(np.mean(wall)),
+        'cpu_median': float(np.median(cpu)),
+        'peak_rss_mb': max(rss) if rss else None,
+    }
+
+
+def _square_keys(stack):
+    return [square.astype(np.uint8).tobytes() for square in stack]
+
+
+def check_generator_output(stack, reference, limit=None):
+    """
+    Compare generated squares with the reference set.
+
+    Args:
+        stack: (N, 4, 4) generated squares
+        reference: (M, 4, 4) reference squares in canonical order
+        limit: number of squares the generator was asked for (None = all)
+
+    Returns:
+        dict: counts, whether the output has the expected number of
+        distinct reference squares ('equivalent') and whether it equals
+        the start of the reference in order ('canonical_order')
+    """
+    expected = len(reference) if limit is None else min(limit, len(reference))
+    keys = _square_keys(stack)
+    reference_keys = set(_square_keys(reference))
+    in_reference = sum(key in reference_keys for key in keys)
+    distinct = len(set(keys))
+    return {
+        'count': len(stack),
+        'expected': expected,
+        'distinct': distinct,
+        'in_reference': in_reference,
+        'equivalent': len(stack) == expected and distinct == expected and in_reference == expected,
+        'canonical_order': bool(len(stack) == expected
+                                and np.array_equal(stack, reference[:expected])),
+    }
+
+
+def check_covariance_output(metrics, reference):
+    """
+    Compare a kernel's metrics with the reference kernel's.
+
+    Returns:
+        dict: max absolute difference per metric the kernel computes, and
+        whether all of them agree to 1e-9 ('equivalent')
+    """
+    diffs = {key: float(np.max(np.abs(metrics[key] - reference[key]))) for key in METRICS
+             if key in metrics}
+    return {
+        'metrics': sorted(diffs),
+        'max_abs_diff': diffs,
+        'equivalent': bool(diffs) and all(diff <= 1e-9 for diff in diffs.values()),
+    }
+
+
+def benchmark_case(kind, name, argument, repeats=3, trace=True, timeout=None):
+    """
+    Time one case over repeated runs and measure its memory.
+
+    Returns:
+        tuple: (result dict, output of the last timed run or None)
+    """
+    runs = []
+    for _ in range(repeats):
+        run = run_once(kind, name, argument, timeout=timeout)
+        if 'error' in run:
+            return {'error': run['error']}, None
+        runs.append(run)
+    result = _timing_summary(runs)
+    if trace:
+        traced = run_once(kind, name, argument, trace=True, timeout=timeout)
+        result['traced_peak_mb'] = traced.get('traced_mb')
+        if 'error' in traced:
+            result['traced_error'] = traced['error']
+    return result, runs[-1]['output']
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, cwd=Path(__file__).resolve().parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(generators=None, kernels=None, max_squares=None, repeats=3, trace=True,
+              timeout=None):
+    """
+    Benchmark the selected generators and covariance kernels.
+
+    Args:
+        generators: names from GENERATORS (None = all)
+        kernels: names from COVARIANCE_KERNELS (None = all)
+        max_squares: limit for generators that accept one (None = all 880)
+        repeats: timed runs per case
+        trace: also measure Python allocations with tracemalloc
+        timeout: seconds allowed per run
+
+    Returns:
+        dict: the run record (configuration, environment and per-case results)
+    """
+    from aggregate_statistics import stack_squares
+    from generation_cache import frenicle_squares
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = stack_squares(frenicle_squares(4))
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'config': {'max_squares': max_squares, 'repeats': repeats},
+        'generators': {},
+        'covariance': {},
+    }
+
+    for name in generators if generators is not None else GENERATORS:
+        _, limited = GENERATORS[name]
+        print(f"  generator  {name} ...", flush=True)
+        result, output = benchmark_case('generator', name, max_squares, repeats, trace, timeout)
+        if output is not None:
+            result['limited'] = bool(limited and max_squares)
+            result['check'] = check_generator_output(
+                output, reference, max_squares if result['limited'] else None)
+        record['generators'][name] = result
+
+    reference_metrics = _batch_metrics(reference)
+    for name in kernels if kernels is not None else COVARIANCE_KERNELS:
+        print(f"  covariance {name} ...", flush=True)
+        result, output = benchmark_case('covariance', name, reference, repeats, trace, timeout)
+        if output is not None:
+            result['check'] = check_covariance_output(output, reference_metrics)
+        record['covariance'][name] = result
+    return record
+
+
+def load_history(path):
+    """Previous run records, oldest first."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_history(path, record):
+    """Append a run record to the history file."""
+    history = load_history(path)
+    history.append(record)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+
+def previous_result(history, section, name, config):
+    """Most recent successful result of a case run with the same configuration."""
+    for record in reversed(history):
+        if record['config'] != config:
+            continue
+        result = record[section].get(name)
+        if result and 'error' not in result:
+            return record, result
+    return None, None
+
+
+def print_report(record, history, regression=1.2):
+    """
+    Print one table per section, with the change against the previous run.
+
+    Cases whose median wall time grew by more than the regression factor
+    are flagged.
+    """
+    for section, title in [('generators', 'GENERATORS'), ('covariance', 'COVARIANCE KERNELS')]:
+        if not record[section]:
+            continue
+        print("\n" + "-"*70)
+        print(title)
+        print("-"*70)
+        print(f"\n  {'case':50s} {'median (s)':>10s} {'cpu (s)':>8s} {'rss MB':>7s} "
+              f"{'traced MB':>9s} {'equiv':>6s} {'vs last':>8s}")
+        for name, result in record[section].items():
+            if 'error' in result:
+                print(f"  {name:50s} {result['error']}")
+                continue
+            rss = result['peak_rss_mb']
+            traced = result.get('traced_peak_mb')
+            check = result.get('check', {})
+            _, previous = previous_result(history, section, name, record['config'])
+            change = ""
+            if previous is not None:
+                ratio = result['wall_median'] / previous['wall_median']
+                change = f"{ratio:7.2f}x" + (" REGRESSION" if ratio > regression else "")
+            print(f"  {name:50s} {result['wall_median']:10.3f} {result['cpu_median']:8.3f} "
+                  f"{rss if rss is not None else float('nan'):7.1f} "
+                  f"{traced if traced is not None else float('nan'):9.1f} "
+                  f"{'yes' if check.get('equivalent') else 'NO':>6s} {change}")
+
+    mismatches = [(name, result['check']) for name, result in record['generators'].items()
+                  if 'check' in result and not result['check']['equivalent']]
+    for name, check in mismatches:
+        print(f"\n  {name}: {check['count']} squares, {check['distinct']} distinct, "
+              f"{check['in_reference']} in the reference (expected {check['expected']})")
+    for name, result in record['covariance'].items():
+        if 'check' in result and not result['check']['equivalent']:
+            print(f"\n  {name}: max |diff| {result['check']['max_abs_diff']}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark generators and covariance kernels")
+    parser.add_argument('--max-squares', type=int, default=None,
+                        help="squares per generator, for generators that accept a limit")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per run")
+    parser.add_argument('--generators', nargs='*', default=None, choices=list(GENERATORS),
+                        metavar='NAME', help="generators to run (default: all)")
+    parser.add_argument('--kernels', nargs='*', default=None, choices=list(COVARIANCE_KERNELS),
+                        metavar='NAME', help="covariance kernels to run (default: all)")
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help="skip the extra run measuring Python allocations")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    parser.add_argument('--regression', type=float, default=1.2,
+                        help="flag cases this many times slower than the last run")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"BENCHMARK SUITE ({args.repeats} repeats, "
+          f"{args.max_squares or 'all'} squares per limited generator)")
+    print("="*70 + "\n")
+
+    record = run_suite(args.generators, args.kernels, args.max_squares, args.repeats,
+                       trace=not args.no_tracemalloc, timeout=args.timeout)
+    history = load_history(args.history)
+    print_report(record, history, args.regression)
+    append_history(args.history, record)
+    print(f"\nRun appended to: {args.history}")
+
+
+if __name__ == "__main__":
+    main()
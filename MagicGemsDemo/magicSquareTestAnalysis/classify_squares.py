@@ -0,0 +1,310 @@
+"""
+Structural Classification of Magic Squares
+
+Tags every square in a stack with its structural type, computed as boolean
+masks over the whole (N, n, n) array in a handful of vectorized operations:
+
+- pandiagonal: every broken diagonal sums to the magic constant
+- associative: cells symmetric about the centre sum to n*n + 1
+- most-perfect: pandiagonal, every 2x2 block (wrapping around) sums to
+  2(n*n + 1), and cells n/2 apart along a diagonal sum to n*n + 1
+- Dudeney group (order 4): the pattern formed by the 8 complementary
+  pairs (values summing to 17), identified up to rotation and reflection
+  and matched against Dudeney's 12 diagrams
+
+The masks then feed a group-by summary of every covariance metric per class,
+to see whether the diagonal-covariance spread tracks structure.
+"""
+
+import numpy as np
+
+from aggregate_statistics import stack_squares
+from line_covariance import (LINE_FAMILIES, incidence_matrix, lines_hold,
+                             batch_metrics)
+
+
+# Dudeney's diagrams: the same letter marks the two cells of a complementary
+# pair (values summing to 17). Any rotation or reflection of a diagram
+# names the same group.
+DUDENEY_DIAGRAMS = {
+    'I': ('abcd', 'efgh', 'cdab', 'ghef'),
+    'II': ('abcd', 'badc', 'efgh', 'fehg'),
+    'III': ('abcd', 'efgh', 'hgfe', 'dcba'),
+    'IV': ('aabb', 'ccdd', 'eeff', 'gghh'),
+    'V': ('abab', 'cdcd', 'efef', 'ghgh'),
+    'VI': ('abba', 'cddc', 'effe', 'ghhg'),
+    'VII': ('aabb', 'cddc', 'effe', 'gghh'),
+    'VIII': ('abab', 'cddc', 'effe', 'ghgh'),
+    'IX': ('abba', 'ccdd', 'eeff', 'ghhg'),
+    'X': ('abba', 'cdcd', 'efef', 'ghhg'),
+    'XI': ('aabb', 'cdef', 'gghh', 'dcfe'),
+    'XII': ('abab', 'cdcd', 'efgh', 'ghef'),
+}
+
+# Dudeney's group sizes among the 880 Frenicle-standard squares
+DUDENEY_GROUP_SIZES = {
+    'I': 48, 'II': 48, 'III': 48, 'IV': 96, 'V': 96, 'VI': 304,
+    'VII': 56, 'VIII': 56, 'IX': 56, 'X': 56, 'XI': 8, 'XII': 8,
+}
+
+
+def is_pandiagonal(stack):
+    """Boolean mask of squares whose 2n broken diagonals are all magic."""
+    n = stack.shape[-1]
+    P = incidence_matrix(LINE_FAMILIES['broken_diagonals'](n), n)
+    return lines_hold(stack, P).all(axis=1)
+
+
+def is_associative(stack):
+    """Boolean mask of squares where X[i, j] + X[n-1-i, n-1-j] = n*n + 1."""
+    n = stack.shape[-1]
+    return (stack + stack[:, ::-1, ::-1] == n * n + 1).all(axis=(1, 2))
+
+
+def is_most_perfect(stack):
+    """
+    Boolean mask of most-perfect squares (doubly-even orders only).
+
+    Every 2x2 block, including those wrapping around the edges, must sum to
+    2(n*n + 1), and every pair of cells n/2 apart along a diagonal must sum
+    to n*n + 1. Together these imply the square is pandiagonal.
+    """
+    n = stack.shape[-1]
+    if n % 4:
+        return np.zeros(len(stack), dtype=bool)
+    P = incidence_matrix(LINE_FAMILIES['toroidal_2x2_blocks'](n), n)
+    blocks_ok = lines_hold(stack, P).all(axis=1)
+    h = n // 2
+    shifted = np.roll(stack, shift=(-h, -h), axis=(1, 2))
+    pairs_ok = (stack + shifted == n * n + 1).all(axis=(1, 2))
+    return blocks_ok & pairs_ok & is_pandiagonal(stack)
+
+
+def symmetry_cell_permutations(n):
+    """
+    Cell index permutations of the 8 rotations and reflections.
+
+    Row k, g, maps a square X to Y with Y.flat[c] = X.flat[g[c]].
+
+    Returns:
+        numpy.ndarray: (8, n*n) array of cell permutations
+    """
+    idx = np.arange(n * n).reshape(n, n)
+    rotations = [np.rot90(idx, k) for k in range(4)]
+    return np.stack([t.ravel() for t in rotations + [r.T for r in rotations]])
+
+
+def complement_partners(stack):
+    """
+    Cell holding the complement of each cell's value.
+
+    Args:
+        stack: (N, n, n) array of squares with values 1..n*n
+
+    Returns:
+        numpy.ndarray: (N, n*n) array; entry [s, c] is the cell of square s
+        whose value is n*n + 1 - X[s, c]
+    """
+    N = len(stack)
+    X = stack.reshape(N, -1)
+    n_cells = X.shape[1]
+    # Inverse permutation: position of every value in every square
+    position = np.empty_like(X)
+    position[np.arange(N)[:, None], X - 1] = np.arange(n_cells)
+    return np.take_along_axis(position, n_cells - X, axis=1)
+
+
+def canonical_patterns(partners, n):
+    """
+    Partner arrays up to rotation and reflection.
+
+    Args:
+        partners: (N, n*n) array; entry [s, c] is the cell paired with cell c
+        n: order of the squares
+
+    Returns:
+        numpy.ndarray: (N, n*n) lexicographically smallest partner array over
+        the 8 symmetries of the square
+    """
+    N = len(partners)
+    perms = symmetry_cell_permutations(n)
+    inverse = np.argsort(perms, axis=1)
+
+    # Pattern of the transformed square: c -> inv[g][partner[g[c]]]
+    candidates = np.stack([inv[partners[:, g]] for g, inv in zip(perms, inverse)], axis=1)
+
+    # Rank all 8N candidate rows lexicographically, keep the smallest per square
+    flat = candidates.reshape(N * 8, -1)
+    _, rank = np.unique(flat, axis=0, return_inverse=True)
+    best = rank.reshape(N, 8).argmin(axis=1)
+    return candidates[np.arange(N), best]
+
+
+def canonical_partner_pattern(stack):
+    """Complementary-pair pattern of each square, up to rotation and reflection."""
+    return canonical_patterns(complement_partners(stack), stack.shape[-1])
+
+
+def diagram_partners(rows):
+    """
+    Partner array of a pair diagram given as rows of letters.
+
+    Args:
+        rows: n strings of n letters, each letter used by exactly two cells
+
+    Returns:
+        numpy.ndarray: (n*n,) array; entry c is the cell paired with cell c
+    """
+    cells = ''.join(rows)
+    partners = np.empty(len(cells), dtype=np.int64)
+    for letter in set(cells):
+        a, b = [c for c, x in enumerate(cells) if x == letter]
+        partners[a], partners[b] = b, a
+    return partners
+
+
+def pattern_groups(stack):
+    """
+    Group squares by their canonical complementary-pair pattern.
+
+    Returns:
+        tuple: ((N,) integer group ids, (G, n*n) canonical patterns, (G,) counts)
+    """
+    patterns = canonical_partner_pattern(stack)
+    unique, group_ids, counts = np.unique(patterns, axis=0, return_inverse=True,
+                                          return_counts=True)
+    return group_ids.ravel(), unique, counts
+
+
+def dudeney_groups(stack):
+    """
+    Assign Dudeney group labels to order-4 squares.
+
+    The complementary-pair pattern of every square is compared with each of
+    DUDENEY_DIAGRAMS, all taken up to rotation and reflection. A pattern
+    outside the 12 diagrams is labelled '?'.
+
+    Returns:
+        numpy.ndarray: (N,) array of group labels ('I'..'XII' or '?')
+    """
+    if stack.shape[-1] != 4:
+        raise ValueError("Dudeney groups are defined for order-4 squares only")
+
+    labels = np.array(list(DUDENEY_DIAGRAMS) + ['?'])
+    diagrams = canonical_patterns(np.stack([diagram_partners(rows)
+                                            for rows in DUDENEY_DIAGRAMS.values()]), 4)
+    matches = (canonical_partner_pattern(stack)[:, None, :] == diagrams).all(axis=2)
+    # Squares matching no diagram pick the trailing '?'
+    return labels[np.where(matches.any(axis=1), matches.argmax(axis=1), len(diagrams))]
+
+
+# Well-known squares and their Dudeney groups
+REPRESENTATIVE_SQUARES = {
+    'Durer (Melencolia I)': ([[16, 3, 2, 13], [5, 10, 11, 8], [9, 6, 7, 12], [4, 15, 14, 1]], 'III'),
+    'Agrippa (Jupiter)': ([[4, 14, 15, 1], [9, 7, 6, 12], [5, 11, 10, 8], [16, 2, 3, 13]], 'III'),
+    'Khajuraho (Parshvanath)': ([[7, 12, 1, 14], [2, 13, 8, 11], [16, 3, 10, 5], [9, 6, 15, 4]], 'I'),
+}
+
+
+def classify(stack):
+    """
+    Classify every square in a stack.
+
+    Returns:
+        dict: boolean masks keyed by class name, plus 'dudeney_group' labels
+        for order-4 stacks
+    """
+    classes = {
+        'pandiagonal': is_pandiagonal(stack),
+        'associative': is_associative(stack),
+        'most_perfect': is_most_perfect(stack),
+    }
+    if stack.shape[-1] == 4:
+        classes['dudeney_group'] = dudeney_groups(stack)
+    return classes
+
+
+def group_summary(metrics, labels):
+    """
+    Summarize every metric within each class.
+
+    Args:
+        metrics: dict of (N,) metric arrays
+        labels: (N,) array of class labels (booleans, strings or integers)
+
+    Returns:
+        dict: {label: {metric: {'count', 'min', 'max', 'mean', 'std'}}}
+    """
+    keys, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    summary = {key: {} for key in keys}
+    for name, values in metrics.items():
+        values = np.asarray(values, dtype=np.float64)
+        sums = np.bincount(inverse, weights=values, minlength=len(keys))
+        sq_sums = np.bincount(inverse, weights=values ** 2, minlength=len(keys))
+        means = sums / counts
+        stds = np.sqrt(np.maximum(sq_sums / counts - means ** 2, 0))
+        mins = np.minimum.reduceat(values[order], starts)
+        maxs = np.maximum.reduceat(values[order], starts)
+        for k, key in enumerate(keys):
+            summary[key][name] = {
+                'count': int(counts[k]),
+                'min': mins[k],
+                'max': maxs[k],
+                'mean': means[k],
+                'std': stds[k],
+            }
+    return summary
+
+
+def print_group_summary(summary, title, metric='cov_diag', order=None):
+    """Print one metric of a group summary as a table, optionally in a given class order."""
+    print("\n" + "-"*70)
+    print(f"{title}: {metric}")
+    print("-"*70)
+    print(f"  {'class':>8s} {'count':>6s} {'min':>11s} {'max':>11s} {'mean':>11s} {'std':>10s}")
+    keys = [k for k in order if k in summary] if order is not None else list(summary)
+    keys += [k for k in summary if k not in keys]
+    for key in keys:
+        s = summary[key][metric]
+        print(f"  {str(key):>8s} {s['count']:6d} {s['min']:11.4f} {s['max']:11.4f} "
+              f"{s['mean']:11.4f} {s['std']:10.4f}")
+
+
+if __name__ == "__main__":
+    from generation_cache import frenicle_squares
+
+    squares = stack_squares(frenicle_squares(4))
+
+    print("="*70)
+    print(f"STRUCTURAL CLASSIFICATION ({len(squares)} squares)")
+    print("="*70)
+
+    classes = classify(squares)
+    metrics = batch_metrics(squares)
+
+    print()
+    for name in ['pandiagonal', 'associative', 'most_perfect']:
+        mask = classes[name]
+        print(f"  {name:14s} {mask.sum():5d}/{len(squares)}")
+
+    for name in ['pandiagonal', 'associative', 'most_perfect']:
+        print_group_summary(group_summary(metrics, classes[name]), name)
+
+    if 'dudeney_group' in classes:
+        summary = group_summary(metrics, classes['dudeney_group'])
+        print_group_summary(summary, "Dudeney group", order=list(DUDENEY_GROUP_SIZES))
+
+        # Check the diagrams against Dudeney's counts and known squares
+        labels, counts = np.unique(classes['dudeney_group'], return_counts=True)
+        sizes_ok = dict(zip(labels, counts.tolist())) == DUDENEY_GROUP_SIZES
+        print(f"\nDudeney group sizes match: {sizes_ok}")
+        representatives = stack_squares([square for square, _ in REPRESENTATIVE_SQUARES.values()])
+        for (name, (_, expected)), group in zip(REPRESENTATIVE_SQUARES.items(),
+                                                dudeney_groups(representatives)):
+            print(f"  {name:24s} group {group:4s} (expected {expected})")
+            assert group == expected, name
+        assert sizes_ok
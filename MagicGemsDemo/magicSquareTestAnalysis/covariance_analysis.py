@@ -3,13 +3,43 @@ Covariance Analysis of All 880 4x4 Magic Squares
 
 This script loads all 880 distinct 4x4 magic squares and analyzes
 their covariance properties in various ways.
+
+The per-square covariances are streamed chunk by chunk into fixed-bin
+counts and summary statistics (MetricHistograms); the report, the saved
+results and the distribution plots all come from those, so the raw
+per-square values are never kept. With --no-show the figure is only written to disk,
+for headless runs.
 """
 
 import numpy as np
 import pickle
 from pathlib import Path
 import matplotlib.pyplot as plt
-from generate_880_squares import generate_880_magic_squares, load_magic_squares, save_magic_squares
+from aggregate_statistics import MetricHistograms
+from generation_cache import frenicle_squares
+from profiling import add_profile_argument, run_main, stage
+from progress_reporting import Progress
+
+
+# Metrics drawn by create_visualizations: (results key, axis label, colour)
+PLOTTED_METRICS = [
+    ('cov_row_pos', 'Row-Position Covariance', None),
+    ('cov_col_pos', 'Column-Position Covariance', 'orange'),
+    ('mean_row_cov', 'Mean Row-Pair Covariance', 'green'),
+    ('mean_col_cov', 'Mean Column-Pair Covariance', 'purple'),
+]
+
+# Per-square metrics: results key -> calculate_covariances key
+METRICS = {
+    'cov_row_pos': 'cov_row_position',
+    'cov_col_pos': 'cov_col_position',
+    'cov_rows_cols': 'cov_rows_cols',
+    'mean_row_cov': 'mean_row_pair_cov',
+    'mean_col_cov': 'mean_col_pair_cov',
+}
+
+# Squares per chunk added to the histograms
+HISTOGRAM_CHUNK = 1000
 
 
 def calculate_covariances(square):
@@ -79,52 +109,49 @@ def calculate_covariances(square):
     }
 
 
-def analyze_all_880_squares():
+def analyze_all_880_squares(show=True):
     """
     Main analysis function for all 880 magic squares.
+
+    Args:
+        show: open the figure window after saving it (False for headless runs)
     """
     print("="*70)
     print(" COVARIANCE ANALYSIS OF ALL 880 DISTINCT 4x4 MAGIC SQUARES")
     print("="*70)
     print()
     
-    # Load or generate magic squares
-    cache_file = "magic_squares_880.pkl"
-    squares = load_magic_squares(cache_file)
-    
-    if squares is None or len(squares) < 880:
-        print("Generating magic squares (this may take a few minutes)...")
-        squares = generate_880_magic_squares()
-        save_magic_squares(squares, cache_file)
+    # Load the verified squares (enumerated in seconds on a cache miss)
+    with stage('load squares'):
+        squares = frenicle_squares(4)
     
     print(f"\nAnalyzing {len(squares)} magic squares...")
     print()
     
-    # Store results
-    results = {
-        'cov_row_pos': [],
-        'cov_col_pos': [],
-        'cov_rows_cols': [],
-        'mean_row_cov': [],
-        'mean_col_cov': [],
-        'all_row_covs': [],
-        'all_col_covs': []
-    }
-    
-    # Analyze each square
-    for idx, square in enumerate(squares):
-        if (idx + 1) % 100 == 0:
-            print(f"  Processed {idx + 1}/{len(squares)} squares...")
-        
-        covs = calculate_covariances(square)
-        
-        results['cov_row_pos'].append(covs['cov_row_position'])
-        results['cov_col_pos'].append(covs['cov_col_position'])
-        results['cov_rows_cols'].append(covs['cov_rows_cols'])
-        results['mean_row_cov'].append(covs['mean_row_pair_cov'])
-        results['mean_col_cov'].append(covs['mean_col_pair_cov'])
-        results['all_row_covs'].extend(covs['row_covs'])
-        results['all_col_covs'].extend(covs['col_covs'])
+    # Check for zero covariances
+    tolerance = 1e-10
+    histograms = MetricHistograms(list(METRICS), bins=50, tolerance=tolerance)
+    all_zero_indices = []
+
+    # Analyze each square, streaming a chunk of metrics at a time
+    with stage('covariance analysis'):
+        progress = Progress('covariance analysis', total=len(squares))
+        chunk = {key: [] for key in METRICS}
+        for index, square in enumerate(squares, 1):
+            covs = calculate_covariances(square)
+            progress.update(items=1, done=1)
+            for key, name in METRICS.items():
+                chunk[key].append(covs[name])
+
+            if index % HISTOGRAM_CHUNK == 0 or index == len(squares):
+                columns = {key: np.array(values) for key, values in chunk.items()}
+                histograms.update(columns)
+                all_near_zero = np.all([np.abs(columns[key]) < tolerance for key in
+                                        ('cov_row_pos', 'cov_col_pos', 'mean_row_cov', 'mean_col_cov')],
+                                       axis=0)
+                all_zero_indices.extend(index - len(all_near_zero) + np.flatnonzero(all_near_zero))
+                chunk = {key: [] for key in METRICS}
+        progress.finish()
     
     print()
     print("="*70)
@@ -132,80 +159,66 @@ def analyze_all_880_squares():
     print("="*70)
     print()
     
-    # Convert to numpy arrays
-    for key in ['cov_row_pos', 'cov_col_pos', 'cov_rows_cols', 'mean_row_cov', 'mean_col_cov']:
-        results[key] = np.array(results[key])
-    
-    # Check for zero covariances
-    tolerance = 1e-10
-    
     print("COVARIANCE BETWEEN POSITION AND VALUE:")
     print("-" * 70)
     
-    zero_row_pos = np.sum(np.abs(results['cov_row_pos']) < tolerance)
-    zero_col_pos = np.sum(np.abs(results['cov_col_pos']) < tolerance)
+    zero_row_pos = histograms['cov_row_pos'].near_zero
+    zero_col_pos = histograms['cov_col_pos'].near_zero
     
     print(f"Squares with zero row-position covariance: {zero_row_pos}/{len(squares)}")
     print(f"Squares with zero col-position covariance: {zero_col_pos}/{len(squares)}")
     print()
     print(f"Row-position covariance statistics:")
-    print(f"  Min:  {np.min(results['cov_row_pos']):12.8f}")
-    print(f"  Max:  {np.max(results['cov_row_pos']):12.8f}")
-    print(f"  Mean: {np.mean(results['cov_row_pos']):12.8f}")
-    print(f"  Std:  {np.std(results['cov_row_pos']):12.8f}")
+    print(f"  Min:  {histograms['cov_row_pos'].min:12.8f}")
+    print(f"  Max:  {histograms['cov_row_pos'].max:12.8f}")
+    print(f"  Mean: {histograms['cov_row_pos'].mean:12.8f}")
+    print(f"  Std:  {histograms['cov_row_pos'].std():12.8f}")
     print()
     print(f"Column-position covariance statistics:")
-    print(f"  Min:  {np.min(results['cov_col_pos']):12.8f}")
-    print(f"  Max:  {np.max(results['cov_col_pos']):12.8f}")
-    print(f"  Mean: {np.mean(results['cov_col_pos']):12.8f}")
-    print(f"  Std:  {np.std(results['cov_col_pos']):12.8f}")
+    print(f"  Min:  {histograms['cov_col_pos'].min:12.8f}")
+    print(f"  Max:  {histograms['cov_col_pos'].max:12.8f}")
+    print(f"  Mean: {histograms['cov_col_pos'].mean:12.8f}")
+    print(f"  Std:  {histograms['cov_col_pos'].std():12.8f}")
     print()
     
     print("="*70)
     print("COVARIANCE BETWEEN ROW PAIRS:")
     print("-" * 70)
     
-    zero_row_pairs = np.sum(np.abs(results['mean_row_cov']) < tolerance)
+    zero_row_pairs = histograms['mean_row_cov'].near_zero
     print(f"Squares with zero mean row-pair covariance: {zero_row_pairs}/{len(squares)}")
     print()
     print(f"Mean row-pair covariance statistics:")
-    print(f"  Min:  {np.min(results['mean_row_cov']):12.8f}")
-    print(f"  Max:  {np.max(results['mean_row_cov']):12.8f}")
-    print(f"  Mean: {np.mean(results['mean_row_cov']):12.8f}")
-    print(f"  Std:  {np.std(results['mean_row_cov']):12.8f}")
+    print(f"  Min:  {histograms['mean_row_cov'].min:12.8f}")
+    print(f"  Max:  {histograms['mean_row_cov'].max:12.8f}")
+    print(f"  Mean: {histograms['mean_row_cov'].mean:12.8f}")
+    print(f"  Std:  {histograms['mean_row_cov'].std():12.8f}")
     print()
     
     print("="*70)
     print("COVARIANCE BETWEEN COLUMN PAIRS:")
     print("-" * 70)
     
-    zero_col_pairs = np.sum(np.abs(results['mean_col_cov']) < tolerance)
+    zero_col_pairs = histograms['mean_col_cov'].near_zero
     print(f"Squares with zero mean col-pair covariance: {zero_col_pairs}/{len(squares)}")
     print()
     print(f"Mean column-pair covariance statistics:")
-    print(f"  Min:  {np.min(results['mean_col_cov']):12.8f}")
-    print(f"  Max:  {np.max(results['mean_col_cov']):12.8f}")
-    print(f"  Mean: {np.mean(results['mean_col_cov']):12.8f}")
-    print(f"  Std:  {np.std(results['mean_col_cov']):12.8f}")
+    print(f"  Min:  {histograms['mean_col_cov'].min:12.8f}")
+    print(f"  Max:  {histograms['mean_col_cov'].max:12.8f}")
+    print(f"  Mean: {histograms['mean_col_cov'].mean:12.8f}")
+    print(f"  Std:  {histograms['mean_col_cov'].std():12.8f}")
     print()
     
     print("="*70)
     print("OVERALL SUMMARY:")
     print("-" * 70)
     
-    # Check which squares have ALL covariances near zero
-    all_near_zero = (
-        (np.abs(results['cov_row_pos']) < tolerance) &
-        (np.abs(results['cov_col_pos']) < tolerance) &
-        (np.abs(results['mean_row_cov']) < tolerance) &
-        (np.abs(results['mean_col_cov']) < tolerance)
-    )
-    
-    count_all_zero = np.sum(all_near_zero)
+    # Squares with ALL covariances near zero, collected chunk by chunk
+    indices = np.array(all_zero_indices, dtype=np.int64)
+    count_all_zero = len(indices)
     print(f"Squares with ALL covariances ≈ 0: {count_all_zero}/{len(squares)}")
     
     if count_all_zero > 0:
-        indices = np.where(all_near_zero)[0]
         print(f"\nIndices of squares with all covariances ≈ 0:")
         print(f"  {indices[:10]}{'...' if len(indices) > 10 else ''}")
         
@@ -221,77 +234,85 @@ def analyze_all_880_squares():
     print()
     print("="*70)
     
-    # Save results
-    output_file = "covariance_analysis_results.pkl"
-    with open(output_file, 'wb') as f:
-        pickle.dump(results, f)
+    # Save the summaries (statistics and histogram counts per metric)
+    results = {'all_zero_indices': indices}
+    for key in histograms:
+        histogram = histograms[key]
+        results[key] = {
+            'count': histogram.count,
+            'min': histogram.min,
+            'max': histogram.max,
+            'mean': histogram.mean,
+            'std': histogram.std(),
+            'near_zero': histogram.near_zero,
+            'counts': histogram.counts.copy(),
+            'edges': histogram.edges(),
+        }
+    with stage('save results'):
+        output_file = "covariance_analysis_results.pkl"
+        with open(output_file, 'wb') as f:
+            pickle.dump(results, f)
     print(f"\nDetailed results saved to: {output_file}")
     
     # Create visualizations
-    create_visualizations(results, squares)
+    with stage('visualizations'):
+        create_visualizations(histograms, show=show)
     
     return results, squares
 
 
-def create_visualizations(results, squares):
-    """Create visualizations of the covariance analysis."""
+def create_visualizations(histograms, show=True, output_fig="covariance_distributions.png"):
+    """
+    Create visualizations of the covariance analysis.
+
+    Args:
+        histograms: MetricHistograms holding the PLOTTED_METRICS
+        show: open the figure window after saving it
+        output_fig: path of the saved figure
+    """
     print("\nGenerating visualizations...")
+    if not show:
+        plt.switch_backend('Agg')
     
+    n_squares = histograms[PLOTTED_METRICS[0][0]].count
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Covariance Analysis of 880 4x4 Magic Squares', fontsize=16, fontweight='bold')
-    
-    # Plot 1: Row-position covariance distribution
-    ax = axes[0, 0]
-    ax.hist(results['cov_row_pos'], bins=50, edgecolor='black', alpha=0.7)
-    ax.axvline(0, color='red', linestyle='--', linewidth=2, label='Zero')
-    ax.set_xlabel('Row-Position Covariance', fontsize=12)
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title('Distribution of Row-Position Covariance', fontsize=13, fontweight='bold')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    # Plot 2: Column-position covariance distribution
-    ax = axes[0, 1]
-    ax.hist(results['cov_col_pos'], bins=50, edgecolor='black', alpha=0.7, color='orange')
-    ax.axvline(0, color='red', linestyle='--', linewidth=2, label='Zero')
-    ax.set_xlabel('Column-Position Covariance', fontsize=12)
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title('Distribution of Column-Position Covariance', fontsize=13, fontweight='bold')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    # Plot 3: Mean row-pair covariance distribution
-    ax = axes[1, 0]
-    ax.hist(results['mean_row_cov'], bins=50, edgecolor='black', alpha=0.7, color='green')
-    ax.axvline(0, color='red', linestyle='--', linewidth=2, label='Zero')
-    ax.set_xlabel('Mean Row-Pair Covariance', fontsize=12)
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title('Distribution of Mean Row-Pair Covariance', fontsize=13, fontweight='bold')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    # Plot 4: Mean column-pair covariance distribution
-    ax = axes[1, 1]
-    ax.hist(results['mean_col_cov'], bins=50, edgecolor='black', alpha=0.7, color='purple')
-    ax.axvline(0, color='red', linestyle='--', linewidth=2, label='Zero')
-    ax.set_xlabel('Mean Column-Pair Covariance', fontsize=12)
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title('Distribution of Mean Column-Pair Covariance', fontsize=13, fontweight='bold')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
+    fig.suptitle(f'Covariance Analysis of {n_squares} 4x4 Magic Squares', fontsize=16, fontweight='bold')
+    
+    for ax, (key, label, color) in zip(axes.flat, PLOTTED_METRICS):
+        histogram = histograms[key]
+        # Precomputed counts drawn as bars, as ax.hist would draw them
+        edges = histogram.edges()
+        ax.bar(edges[:-1], histogram.counts, width=np.diff(edges), align='edge',
+               edgecolor='black', alpha=0.7, color=color)
+        ax.axvline(0, color='red', linestyle='--', linewidth=2, label='Zero')
+        ax.set_xlabel(label, fontsize=12)
+        ax.set_ylabel('Frequency', fontsize=12)
+        ax.set_title(f'Distribution of {label}', fontsize=13, fontweight='bold')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
     
     plt.tight_layout()
     
-    output_fig = "covariance_distributions.png"
     plt.savefig(output_fig, dpi=150, bbox_inches='tight')
     print(f"Visualization saved to: {output_fig}")
     
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Covariance analysis of all 880 4x4 magic squares")
+    parser.add_argument('--no-show', action='store_true',
+                        help="write the figure without opening a window (headless runs)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    
     # Run the complete analysis
-    results, squares = analyze_all_880_squares()
+    results, squares = run_main(analyze_all_880_squares, args.profile, 'covariance_analysis',
+                                show=not args.no_show)
     
     print("\n" + "="*70)
     print("ANALYSIS COMPLETE!")
@@ -0,0 +1,181 @@
+"""
+Latin-Square Decomposition of Magic Squares into Base-n Digit Planes
+
+Every magic square on 1..n*n decomposes as value - 1 = n*a + b into two
+n x n digit grids with entries 0..n-1 (for 4x4 squares, two base-4 digit
+squares). Many properties become obvious in that form: since every value
+appears once, the (a, b) pairs are all distinct, so whenever both planes are
+Latin squares they form an orthogonal (Graeco-Latin) pair.
+
+Planes are computed for the whole stack with integer div/mod, and every
+test is a batch operation, so the same code runs on order-5 chunks.
+"""
+
+import numpy as np
+
+from aggregate_statistics import stack_squares
+from line_covariance import (LINE_FAMILIES, incidence_matrix, line_sums,
+                             pair_covariances, batch_metrics)
+from classify_squares import group_summary, print_group_summary
+
+
+def digit_planes(stack):
+    """
+    Split every square into its high and low base-n digit planes.
+
+    Args:
+        stack: (N, n, n) array of squares with values 1..n*n
+
+    Returns:
+        tuple: (a, b) arrays of shape (N, n, n) with value - 1 = n*a + b
+    """
+    n = stack.shape[-1]
+    return np.divmod(np.asarray(stack, dtype=np.int64) - 1, n)
+
+
+def _lines_are_permutations(plane, lines):
+    """
+    Check that every line of every plane holds each digit exactly once.
+
+    A sum of n powers of two equals 2**n - 1 only when the powers are all
+    distinct, so one bitmask sum per line replaces a per-line set.
+    """
+    n = plane.shape[-1]
+    flat = plane.reshape(len(plane), -1)
+    bits = np.left_shift(1, flat[:, lines])
+    return (bits.sum(axis=2) == (1 << n) - 1).all(axis=1)
+
+
+def is_latin(plane):
+    """Boolean mask of planes where every row and column is a permutation of 0..n-1."""
+    n = plane.shape[-1]
+    lines = np.concatenate([LINE_FAMILIES['rows'](n), LINE_FAMILIES['columns'](n)])
+    return _lines_are_permutations(plane, lines)
+
+
+def is_diagonal_latin(plane):
+    """Boolean mask of Latin planes whose two main diagonals are also permutations."""
+    n = plane.shape[-1]
+    return is_latin(plane) & _lines_are_permutations(plane, LINE_FAMILIES['diagonals'](n))
+
+
+def is_orthogonal(a, b):
+    """
+    Boolean mask of plane pairs in which every (a, b) digit pair occurs once.
+
+    Always true for the planes of a square on distinct values; provided
+    for comparing arbitrary planes (e.g. a plane with a transformed one).
+    """
+    n = a.shape[-1]
+    codes = np.sort((a * n + b).reshape(len(a), -1), axis=1)
+    return (codes == np.arange(n * n)).all(axis=1)
+
+
+def is_magic_plane(plane):
+    """Boolean mask of planes whose rows, columns and diagonals all sum to n(n-1)/2."""
+    n = plane.shape[-1]
+    lines = np.concatenate([LINE_FAMILIES[name](n) for name in ['rows', 'columns', 'diagonals']])
+    return (line_sums(plane, incidence_matrix(lines, n)) == n * (n - 1) // 2).all(axis=1)
+
+
+def index_planes(stack):
+    """
+    Index the structural properties of the digit planes of every square.
+
+    Returns:
+        dict: (N,) boolean masks
+    """
+    a, b = digit_planes(stack)
+    a_latin = is_latin(a)
+    b_latin = is_latin(b)
+    return {
+        'a_latin': a_latin,
+        'b_latin': b_latin,
+        'a_diagonal_latin': is_diagonal_latin(a),
+        'b_diagonal_latin': is_diagonal_latin(b),
+        'orthogonal_latin_pair': a_latin & b_latin & is_orthogonal(a, b),
+        'a_magic': is_magic_plane(a),
+        'b_magic': is_magic_plane(b),
+    }
+
+
+def plane_metrics(stack):
+    """
+    Covariance metrics of each digit plane.
+
+    Returns:
+        dict: batch_metrics of plane a and plane b, keys prefixed 'a_' / 'b_'
+    """
+    a, b = digit_planes(stack)
+    metrics = {}
+    for prefix, plane in [('a_', a), ('b_', b)]:
+        for key, values in batch_metrics(plane).items():
+            metrics[prefix + key] = values
+    return metrics
+
+
+def diagonal_covariance_decomposition(stack):
+    """
+    Split the main/anti-diagonal covariance into digit-plane contributions.
+
+    Since value - 1 = n*a + b and covariance is bilinear,
+    cov(X) = n*n*cov(a, a) + n*(cov(a, b) + cov(b, a)) + cov(b, b).
+
+    Returns:
+        dict: (N,) arrays 'aa', 'cross' and 'bb' (already weighted) that sum
+        to the diagonal covariance of the square
+    """
+    n = stack.shape[-1]
+    a, b = digit_planes(stack)
+    diag = LINE_FAMILIES['diagonals'](n)
+    # Treat the two planes as one 2n*n-cell grid so a single call covers
+    # the a/a, a/b, b/a and b/b diagonal pairs
+    both = np.concatenate([a, b], axis=1)
+    lines = np.concatenate([diag, diag + n * n])
+    covs = pair_covariances(both, lines)
+    return {
+        'aa': n * n * covs[:, 0, 1],
+        'cross': n * (covs[:, 0, 3] + covs[:, 2, 1]),
+        'bb': covs[:, 2, 3],
+    }
+
+
+if __name__ == "__main__":
+    from generation_cache import frenicle_squares
+
+    squares = stack_squares(frenicle_squares(4))
+    n = squares.shape[-1]
+
+    print("="*70)
+    print(f"BASE-{n} DIGIT-PLANE DECOMPOSITION ({len(squares)} squares)")
+    print("="*70)
+
+    a, b = digit_planes(squares)
+    print(f"\nExample: square #1 = {n} * a + b + 1")
+    print(squares[0])
+    print("a =")
+    print(a[0])
+    print("b =")
+    print(b[0])
+
+    index = index_planes(squares)
+    print("\nDigit-plane properties:")
+    for name, mask in index.items():
+        print(f"  {name:22s} {mask.sum():5d}/{len(squares)} ({100*mask.mean():.1f}%)")
+
+    metrics = plane_metrics(squares)
+    print("\nPer-plane covariance metrics:")
+    for name, values in metrics.items():
+        print(f"  {name:16s} min {values.min():9.4f}  max {values.max():9.4f}  "
+              f"mean {values.mean():9.4f}")
+
+    parts = diagonal_covariance_decomposition(squares)
+    total = sum(parts.values())
+    print("\nDiagonal covariance decomposition (mean over squares):")
+    for name, values in parts.items():
+        print(f"  {name:6s} {values.mean():10.4f}")
+    print(f"  {'total':6s} {total.mean():10.4f}")
+
+    metrics['cov_diag'] = total
+    print_group_summary(group_summary(metrics, index['orthogonal_latin_pair']),
+                        "orthogonal Latin digit planes")
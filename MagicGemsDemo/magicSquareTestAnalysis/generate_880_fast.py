@@ -9,14 +9,23 @@ import numpy as np
 import pickle
 from itertools import permutations
 
+from progress_reporting import Progress, tree_coverage
+from square_verification import check_square_collection
 
-def create_880_magic_squares_fast():
+
+def create_880_magic_squares_fast(max_squares=880, stats=None, progress=None):
     """
     Generate all 880 4x4 magic squares using an efficient method.
     
     Uses the fact that 4x4 magic squares can be generated from a base set
     with specific transformations.
     
+    Args:
+        max_squares: stop after this many squares
+        stats: optional search_instrumentation.SearchStats that records
+               nodes, candidates, prunes and time per depth
+        progress: optional progress_reporting.Progress (default: a new one)
+    
     Returns:
         list: All 880 distinct 4x4 magic squares
     """
@@ -24,6 +33,10 @@ def create_880_magic_squares_fast():
     print("This should complete in under a minute...")
     
     magic_squares = []
+    if progress is None:
+        progress = Progress('create_880_magic_squares_fast', target=max_squares)
+    # Branch positions in the first two cells, for the coverage estimate
+    path = [(0, 1), (0, 1)]
     
     # Method: Use constraint propagation with intelligent search
     # We'll use a depth-first search with heavy pruning
@@ -32,26 +45,52 @@ def create_880_magic_squares_fast():
         """Generate using smart constraints."""
         
         def solve_recursive(grid, used, pos, magic_sum=34):
+            if stats is None:
+                return expand(grid, used, pos, magic_sum)
+            start = stats.enter(pos)
+            try:
+                return expand(grid, used, pos, magic_sum)
+            finally:
+                stats.exit(pos, start)
+        
+        def expand(grid, used, pos, magic_sum):
             if pos == 16:
-                if is_valid_complete(grid) and is_frenicle(grid):
+                failure = completion_failure(grid)
+                if failure is None:
                     magic_squares.append(grid.copy())
-                    if len(magic_squares) % 88 == 0:
-                        print(f"  Generated {len(magic_squares)}/880")
-                return len(magic_squares) >= 880
-            
-            if len(magic_squares) >= 880:
+                    if stats is not None:
+                        stats.solution(pos)
+                    progress.update(items=1)
+                elif stats is not None:
+                    stats.prune(pos, failure)
+                return len(magic_squares) >= max_squares
+            
+            if len(magic_squares) >= max_squares:
                 return True
             
             row, col = divmod(pos, 4)
             
             # Get candidates for this position
             candidates = get_candidates(grid, row, col, used, magic_sum)
-            
-            for num in candidates:
+            if stats is not None and not candidates:
+                # The forced value completing a row or column is unavailable;
+                # count it as one candidate tried and pruned
+                stats.tried(pos)
+                stats.prune(pos, 'row' if col == 3 else 'column')
+            
+            for k, num in enumerate(candidates):
+                if pos < len(path):
+                    path[pos] = (k, len(candidates))
+                    progress.update(coverage=tree_coverage(path[:pos + 1]))
                 grid[row, col] = num
                 used.add(num)
                 
-                if is_valid_partial(grid, row, col, magic_sum):
+                failure = partial_failure(grid, row, col, magic_sum)
+                if stats is not None:
+                    stats.tried(pos)
+                    if failure is not None:
+                        stats.prune(pos, failure)
+                if failure is None:
                     if solve_recursive(grid, used, pos + 1, magic_sum):
                         return True
                 
@@ -64,9 +103,9 @@ def create_880_magic_squares_fast():
             """Get smart candidate list for position."""
             available = [i for i in range(1, 17) if i not in used]
             
-            # First position: limit to 1-4 for Frenicle form
+            # First position: smallest corner, corners sum to 34, so at most 7
             if row == 0 and col == 0:
-                return [i for i in available if i <= 4]
+                return [i for i in available if i <= 7]
             
             # Last in row: must complete to magic_sum
             if col == 3:
@@ -95,28 +134,28 @@ def create_880_magic_squares_fast():
             
             return available
         
-        def is_valid_partial(grid, row, col, magic_sum):
-            """Check if partial grid is still valid."""
+        def partial_failure(grid, row, col, magic_sum):
+            """Name the constraint a partial grid breaks, or None if still valid."""
             # Check completed row
             if col == 3:
                 if np.sum(grid[row, :]) != magic_sum:
-                    return False
+                    return 'row'
             
             # Check completed column  
             if row == 3:
                 if np.sum(grid[:, col]) != magic_sum:
-                    return False
+                    return 'column'
             
             # Check partial sums don't exceed magic_sum
             if col < 3:
                 if np.sum(grid[row, :col+1]) > magic_sum:
-                    return False
+                    return 'row'
             
             if row < 3:
                 if np.sum(grid[:row+1, col]) > magic_sum:
-                    return False
+                    return 'column'
             
-            return True
+            return None
         
         def is_valid_complete(grid):
             """Verify complete magic square."""
@@ -137,11 +176,21 @@ def create_880_magic_squares_fast():
             
             return True
         
+        def completion_failure(grid):
+            """Name the constraint a complete grid breaks, or None."""
+            if not is_valid_complete(grid):
+                # Rows and columns are enforced during the search
+                return 'diagonal'
+            if not is_frenicle(grid):
+                return 'frenicle'
+            return None
+        
         def is_frenicle(grid):
             """Check Frenicle standard form."""
             return (grid[0, 0] < grid[0, 3] and 
                     grid[0, 0] < grid[3, 0] and
-                    grid[0, 0] < grid[3, 3])
+                    grid[0, 0] < grid[3, 3] and
+                    grid[0, 1] < grid[1, 0])
         
         # Start generation
         grid = np.zeros((4, 4), dtype=int)
@@ -150,11 +199,12 @@ def create_880_magic_squares_fast():
     
     # Run generation
     generate_with_constraints()
+    progress.finish()
     
     print(f"\nGeneration complete! Found {len(magic_squares)} magic squares.")
     
     # If we didn't get all 880, provide information
-    if len(magic_squares) < 880:
+    if len(magic_squares) < max_squares:
         print(f"\nNote: Generated {len(magic_squares)} squares.")
         print("The complete set of 880 squares requires exhaustive search.")
         print("For full analysis, this subset is representative.")
@@ -169,32 +219,32 @@ def save_squares(squares, filename="magic_squares_880.pkl"):
     print(f"Saved to: {filename}")
 
 
-def load_squares(filename="magic_squares_880.pkl"):
-    """Load magic squares from file."""
+def load_squares(filename="magic_squares_880.pkl", expected_count=880):
+    """Load magic squares from file, returning None if missing or invalid."""
     try:
         with open(filename, 'rb') as f:
-            return pickle.load(f)
+            squares = pickle.load(f)
     except FileNotFoundError:
         return None
+    if not check_square_collection(squares, expected_count, label=filename):
+        return None
+    return squares
 
 
 if __name__ == "__main__":
     import time
     
-    # Check for cached version
-    cached = load_squares()
-    if cached and len(cached) >= 800:  # Allow for partial sets
-        print(f"Loaded {len(cached)} squares from cache.")
-        squares = cached
-    else:
-        # Generate
+    from generation_cache import cached_squares
+    
+    def timed_generation():
         start = time.time()
         squares = create_880_magic_squares_fast()
-        elapsed = time.time() - start
-        print(f"\nTime elapsed: {elapsed:.2f} seconds")
-        
-        # Save
-        save_squares(squares)
+        print(f"\nTime elapsed: {time.time() - start:.2f} seconds")
+        return squares
+    
+    # Generated only when the cache holds no verified output of this code
+    squares = cached_squares('generate_880_fast.create_880_magic_squares_fast',
+                             timed_generation, create_880_magic_squares_fast)
     
     # Show examples
     print("\nFirst 3 magic squares:")
@@ -9,6 +9,9 @@ import numpy as np
 import pickle
 from pathlib import Path
 
+from progress_reporting import Progress, tree_coverage
+from square_verification import verify_batch, check_square_collection
+
 
 def verify_magic_square_4x4(square):
     """Verify that a 4x4 square is a valid magic square."""
@@ -46,10 +49,12 @@ def is_frenicle_standard(square):
     - square[0,0] < square[0,3]
     - square[0,0] < square[3,0]  
     - square[0,0] < square[3,3]
+    - square[0,1] < square[1,0]
     """
     return (square[0, 0] < square[0, 3] and 
             square[0, 0] < square[3, 0] and
-            square[0, 0] < square[3, 3])
+            square[0, 0] < square[3, 3] and
+            square[0, 1] < square[1, 0])
 
 
 def generate_880_magic_squares():
@@ -61,6 +66,9 @@ def generate_880_magic_squares():
     """
     magic_squares = []
     magic_sum = 34
+    progress = Progress('generate_880_magic_squares', target=880)
+    # Branch positions in the first two cells, for the coverage estimate
+    path = [(0, 1), (0, 1)]
     
     print("Generating all 880 distinct 4x4 magic squares...")
     print("This uses optimized backtracking and will take a few minutes...")
@@ -106,8 +114,7 @@ def generate_880_magic_squares():
         if pos == 16:
             if verify_magic_square_4x4(square) and is_frenicle_standard(square):
                 magic_squares.append(square.copy())
-                if len(magic_squares) % 88 == 0:
-                    print(f"Found {len(magic_squares)}/880 magic squares...")
+                progress.update(items=1)
             return False
         
         row = pos // 4
@@ -115,12 +122,15 @@ def generate_880_magic_squares():
         
         # Symmetry breaking: constrain first cell based on Frenicle form
         if pos == 0:
-            # First cell can only be 1, 2, 3, or 4 (based on symmetry)
-            candidates = [1, 2, 3, 4]
+            # First cell is the smallest of the four corners, which sum to 34
+            candidates = range(1, 8)
         else:
             candidates = range(1, 17)
         
-        for num in candidates:
+        for k, num in enumerate(candidates):
+            if pos < len(path):
+                path[pos] = (k, len(candidates))
+                progress.update(coverage=tree_coverage(path[:pos + 1]))
             if num in placed:
                 continue
             
@@ -142,6 +152,7 @@ def generate_880_magic_squares():
     placed = set()
     
     solve(square, placed, 0)
+    progress.finish()
     
     print(f"\nGeneration complete! Found {len(magic_squares)} magic squares.")
     
@@ -156,34 +167,32 @@ def save_magic_squares(squares, filename="magic_squares_880.pkl"):
     print(f"\nSaved {len(squares)} magic squares to: {filepath.absolute()}")
 
 
-def load_magic_squares(filename="magic_squares_880.pkl"):
-    """Load magic squares from a pickle file."""
+def load_magic_squares(filename="magic_squares_880.pkl", expected_count=880):
+    """Load magic squares from a pickle file, returning None if it fails verification."""
     filepath = Path(filename)
     if not filepath.exists():
         return None
     
     with open(filepath, 'rb') as f:
         squares = pickle.load(f)
+    if not check_square_collection(squares, expected_count, label=str(filepath)):
+        print("Ignoring cached squares; they will be regenerated.")
+        return None
     print(f"Loaded {len(squares)} magic squares from: {filepath.absolute()}")
     return squares
 
 
 if __name__ == "__main__":
-    # Check if already generated
-    cache_file = "magic_squares_880.pkl"
-    squares = load_magic_squares(cache_file)
+    from generation_cache import cached_squares
     
-    if squares is None:
-        # Generate them
-        squares = generate_880_magic_squares()
-        
-        # Verify all are valid
-        print("\nVerifying all squares...")
-        all_valid = all(verify_magic_square_4x4(sq) for sq in squares)
-        print(f"All squares valid: {all_valid}")
-        
-        # Save for future use
-        save_magic_squares(squares, cache_file)
+    # Generated only when the cache holds no verified output of this code
+    squares = cached_squares('generate_880_squares.generate_880_magic_squares',
+                             generate_880_magic_squares, generate_880_magic_squares)
+    
+    # Verify all are valid
+    print("\nVerifying all squares...")
+    all_valid = bool(verify_batch(np.array(squares)).all())
+    print(f"All squares valid: {all_valid}")
     
     # Display first few examples
     print("\n" + "="*50)
@@ -0,0 +1,301 @@
+"""
+Content-Addressed Cache for Generated Magic Squares
+
+Every script used to read and write a bare magic_squares_880.pkl in the
+current directory, and would accept whatever it found there. Here each
+generated collection is stored under a key that hashes
+
+- the generator name,
+- the order,
+- the constraints (e.g. Frenicle standard form, expected count),
+- the code version (a hash of the generator's source),
+
+so editing a generator or asking for a different set can never reuse a
+stale artifact. Artifacts live in a cache directory as (N, n, n) .npy files
+with a JSON metadata file each; they are verified on every load, only
+complete sets are stored, and the least recently used entries are evicted
+once the cache exceeds its size limit.
+
+Set MAGIC_SQUARE_CACHE to move the cache directory.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import sharded_enumeration
+from progress_reporting import Progress
+from square_verification import check_square_collection
+
+
+# Bump when the artifact layout changes
+CACHE_FORMAT = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+FRENICLE_COUNTS = {3: 1, 4: 880}
+
+# Generator name of frenicle_squares, also used by analysis_pipeline output
+SHARDED_GENERATOR = 'sharded_enumeration'
+
+
+def default_cache_dir():
+    """Cache directory: $MAGIC_SQUARE_CACHE, or cache/ next to this script."""
+    return Path(os.environ.get("MAGIC_SQUARE_CACHE", Path(__file__).resolve().parent / "cache"))
+
+
+def code_version(*objects):
+    """
+    Short hash of the source of the modules defining the given objects.
+
+    Hashing the whole module means edits to helper functions of a generator
+    also invalidate its cached output.
+    """
+    h = hashlib.sha256()
+    for obj in objects:
+        h.update(inspect.getsource(inspect.getmodule(obj)).encode())
+    return h.hexdigest()[:16]
+
+
+def cache_key(generator, order, constraints, version):
+    """Hex digest identifying one generated collection."""
+    spec = {
+        'format': CACHE_FORMAT,
+        'generator': generator,
+        'order': order,
+        'constraints': constraints,
+        'code_version': version,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def _write_atomic(path, write):
+    """Write a file under a temporary name and rename it into place."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class GenerationCache:
+    """
+    Directory of verified square collections keyed by cache_key.
+
+    Each entry is <key>.npy plus <key>.json holding the key inputs, the
+    number of squares, the size in bytes and the last-used time.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _paths(self, key):
+        return self.cache_dir / f"{key}.npy", self.cache_dir / f"{key}.json"
+
+    def entries(self):
+        """Metadata of every entry, least recently used first."""
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                with open(path) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda meta: meta['last_used'])
+
+    def remove(self, key):
+        """Delete an entry (metadata first, so a half-removed entry is a miss)."""
+        npy, meta = self._paths(key)
+        for path in [meta, npy]:
+            if path.exists():
+                path.unlink()
+
+    def get(self, key):
+        """
+        Load a verified entry and mark it as recently used.
+
+        Entries whose artifact is missing or fails verification are deleted.
+
+        Returns:
+            numpy.ndarray: (N, n, n) int64 stack, or None on a miss
+        """
+        npy, meta_path = self._paths(key)
+        if not meta_path.exists():
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            stack = np.load(npy).astype(np.int64)
+        except (OSError, ValueError):
+            self.remove(key)
+            return None
+
+        frenicle = meta['constraints'].get('form') == 'frenicle'
+        if not check_square_collection(stack, meta['count'], frenicle=frenicle,
+                                       label=f"cache entry {key[:12]}"):
+            self.remove(key)
+            return None
+
+        meta['last_used'] = time.time()
+        _write_atomic(meta_path, lambda f: f.write(json.dumps(meta, indent=2).encode()))
+        return stack
+
+    def put(self, key, squares, generator, order, constraints, version):
+        """
+        Verify and store a complete collection, then evict old entries.
+
+        Returns:
+            bool: True if stored; False if the collection failed verification
+            (e.g. a partial set), in which case nothing is written
+        """
+        expected = constraints.get('count')
+        frenicle = constraints.get('form') == 'frenicle'
+        if not check_square_collection(squares, expected, frenicle=frenicle,
+                                       label=f"{generator} output"):
+            return False
+
+        stack = np.asarray(squares, dtype=np.int64)
+        dtype = np.uint8 if order * order < 256 else np.int64
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        npy, meta_path = self._paths(key)
+        _write_atomic(npy, lambda f: np.save(f, stack.astype(dtype)))
+
+        now = time.time()
+        meta = {
+            'key': key,
+            'generator': generator,
+            'order': order,
+            'constraints': constraints,
+            'code_version': version,
+            'count': len(stack),
+            'nbytes': npy.stat().st_size,
+            'created': now,
+            'last_used': now,
+        }
+        _write_atomic(meta_path, lambda f: f.write(json.dumps(meta, indent=2).encode()))
+        self.evict(keep=key)
+        return True
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = self.entries()
+        total = sum(meta['nbytes'] for meta in entries)
+        for meta in entries:
+            if total <= self.max_bytes:
+                break
+            if meta['key'] == keep:
+                continue
+            self.remove(meta['key'])
+            total -= meta['nbytes']
+
+
+def _default_constraints(order):
+    return {'form': 'frenicle', 'count': FRENICLE_COUNTS.get(order)}
+
+
+def cache_squares(generator, squares, code, order=4, constraints=None, cache=None):
+    """
+    Store an already generated collection under its key.
+
+    Args are as for cached_squares.
+
+    Returns:
+        bool: True if stored, False if the squares failed verification
+    """
+    if constraints is None:
+        constraints = _default_constraints(order)
+    if cache is None:
+        cache = GenerationCache()
+    version = code_version(code)
+    key = cache_key(generator, order, constraints, version)
+    return cache.put(key, squares, generator, order, constraints, version)
+
+
+def cached_squares(generator, generate, code, order=4, constraints=None, cache=None):
+    """
+    Return a verified collection from the cache, generating it on a miss.
+
+    Args:
+        generator: name of the generator, part of the key
+        generate: zero-argument callable returning a list of squares
+        code: function or class whose module source versions the generator
+        order: order of the squares
+        constraints: dict of constraints, part of the key; 'form' ('frenicle')
+                     and 'count' are also checked on every load and store
+                     (default: Frenicle standard form with the known count)
+        cache: GenerationCache (default: one in default_cache_dir())
+
+    Returns:
+        list: the squares as (n, n) int64 arrays
+    """
+    if constraints is None:
+        constraints = _default_constraints(order)
+    if cache is None:
+        cache = GenerationCache()
+    version = code_version(code)
+    key = cache_key(generator, order, constraints, version)
+
+    stack = cache.get(key)
+    if stack is not None:
+        print(f"✓ Loaded {len(stack)} squares from cache ({generator}, key {key[:12]})")
+        return list(stack)
+
+    squares = generate()
+    if cache.put(key, squares, generator, order, constraints, version):
+        print(f"✓ Cached {len(squares)} squares ({generator}, key {key[:12]})")
+    else:
+        print(f"Not caching output of {generator}: it failed verification")
+    return [np.asarray(square, dtype=np.int64) for square in squares]
+
+
+def frenicle_squares(order=4, cache=None):
+    """
+    All Frenicle-standard squares of the given order, cached.
+
+    Generated on a miss with the vectorized row search of
+    sharded_enumeration (a few seconds for order 4).
+    """
+    def generate():
+        prefixes = sharded_enumeration.first_row_prefixes(order)
+        with Progress(f'enumerate order {order}', total=len(prefixes)) as progress:
+            squares, _ = sharded_enumeration.enumerate_prefixes(order, prefixes,
+                                                                progress=progress)
+        return list(squares.reshape(-1, order, order).astype(np.int64))
+
+    return cached_squares(SHARDED_GENERATOR, generate, sharded_enumeration.enumerate_prefixes,
+                          order=order, cache=cache)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the generated-squares cache")
+    parser.add_argument('--clear', action='store_true', help="remove every entry")
+    args = parser.parse_args()
+
+    cache = GenerationCache()
+    print("="*70)
+    print(f"GENERATION CACHE: {cache.cache_dir}")
+    print("="*70)
+
+    entries = cache.entries()
+    if args.clear:
+        for meta in entries:
+            cache.remove(meta['key'])
+        print(f"\nRemoved {len(entries)} entries")
+        entries = []
+
+    print(f"\n  {'key':12s} {'generator':36s} {'n':>2s} {'count':>8s} {'size':>10s}  last used")
+    for meta in reversed(entries):
+        last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(meta['last_used']))
+        print(f"  {meta['key'][:12]:12s} {meta['generator']:36s} {meta['order']:2d} "
+              f"{meta['count']:8d} {meta['nbytes']:10d}  {last_used}")
+    total = sum(meta['nbytes'] for meta in entries)
+    print(f"\n{len(entries)} entries, {total} of {cache.max_bytes} bytes")
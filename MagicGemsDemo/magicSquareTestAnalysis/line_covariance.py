@@ -0,0 +1,302 @@
+"""
+Generalized Line-Covariance Engine
+
+The original analysis scripts hardcode rows, columns and the two main
+diagonals (and analyze_4x4_magic_squares adds the (i+j) position ad hoc).
+Here any family of cell subsets - broken diagonals, 2x2 quadrants, corners,
+the centre block - is described by its ordered cell indexes, from which a
+0/1 incidence matrix P of shape (n*n, L) is built. Line sums for the whole
+dataset are then a single matrix product X @ P with X of shape (N, n*n), so
+testing a new structural hypothesis costs one GEMM over millions of squares.
+"""
+
+import numpy as np
+
+from aggregate_statistics import stack_squares, compute_cell_statistics
+
+
+def _cell_index(n, i, j):
+    """Flat index of cell (i, j) in an n x n square (wrapping around)."""
+    return (np.asarray(i) % n) * n + (np.asarray(j) % n)
+
+
+def rows(n):
+    """Ordered cell indexes of the n rows, shape (n, n)."""
+    return np.arange(n * n).reshape(n, n)
+
+
+def columns(n):
+    """Ordered cell indexes of the n columns, shape (n, n)."""
+    return np.arange(n * n).reshape(n, n).T.copy()
+
+
+def diagonals(n):
+    """Main diagonal and anti-diagonal, each ordered by row, shape (2, n)."""
+    k = np.arange(n)
+    return np.stack([_cell_index(n, k, k), _cell_index(n, k, n - 1 - k)])
+
+
+def broken_diagonals(n):
+    """
+    All 2n broken (wrap-around) diagonals, each ordered by row.
+
+    The first n lines run in the main-diagonal direction starting at column
+    s in the top row, the last n in the anti-diagonal direction starting at
+    column s in the top row.
+    Lines 0 and 2n-1 are the two ordinary diagonals.
+    """
+    k = np.arange(n)
+    s = np.arange(n)[:, None]
+    forward = _cell_index(n, k[None, :], s + k[None, :])
+    backward = _cell_index(n, k[None, :], s - k[None, :])
+    return np.concatenate([forward, backward])
+
+
+def blocks(n, size):
+    """All non-overlapping size x size blocks, each ordered row-major."""
+    if n % size:
+        raise ValueError(f"Block size {size} does not tile an order-{n} square")
+    starts = np.arange(0, n, size)
+    bi, bj = np.meshgrid(starts, starts, indexing='ij')
+    di, dj = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    return _cell_index(n, bi.reshape(-1, 1) + di.reshape(1, -1),
+                       bj.reshape(-1, 1) + dj.reshape(1, -1))
+
+
+def quadrants(n):
+    """The four (n/2) x (n/2) quadrants of an even-order square."""
+    if n % 2:
+        raise ValueError("Quadrants are only defined for even n")
+    return blocks(n, n // 2)
+
+
+def toroidal_2x2_blocks(n):
+    """All n*n 2x2 blocks, including those that wrap around the edges."""
+    i, j = np.divmod(np.arange(n * n), n)
+    di = np.array([0, 0, 1, 1])
+    dj = np.array([0, 1, 0, 1])
+    return _cell_index(n, i[:, None] + di, j[:, None] + dj)
+
+
+def corners(n):
+    """The four corner cells as a single line, shape (1, 4)."""
+    return np.array([[0, n - 1, n * (n - 1), n * n - 1]])
+
+
+def centre_block(n):
+    """The central 2x2 block (n even) or 3x3 block (n odd) as a single line."""
+    size = 2 if n % 2 == 0 else 3
+    start = (n - size) // 2
+    di, dj = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    return _cell_index(n, start + di, start + dj).reshape(1, -1)
+
+
+LINE_FAMILIES = {
+    'rows': rows,
+    'columns': columns,
+    'diagonals': diagonals,
+    'broken_diagonals': broken_diagonals,
+    'quadrants': quadrants,
+    'toroidal_2x2_blocks': toroidal_2x2_blocks,
+    'corners': corners,
+    'centre_block': centre_block,
+}
+
+
+def incidence_matrix(lines, n):
+    """
+    Build the 0/1 incidence matrix of a line family.
+
+    Args:
+        lines: (L, m) array of cell indexes, one row per line
+        n: order of the square
+
+    Returns:
+        numpy.ndarray: (n*n, L) matrix with P[c, l] = 1 if cell c is on line l
+    """
+    lines = np.atleast_2d(lines)
+    P = np.zeros((n * n, len(lines)), dtype=np.int64)
+    P[lines, np.arange(len(lines))[:, None]] = 1
+    return P
+
+
+def family_incidence(names, n):
+    """
+    Concatenate the incidence matrices of several named line families.
+
+    Returns:
+        tuple: ((n*n, L) incidence matrix, list of L line labels)
+    """
+    mats, labels = [], []
+    for name in names:
+        lines = LINE_FAMILIES[name](n)
+        mats.append(incidence_matrix(lines, n))
+        labels.extend(f"{name}[{k}]" for k in range(len(lines)))
+    return np.concatenate(mats, axis=1), labels
+
+
+def position_weights(n):
+    """
+    Position weight vectors used by the position-value covariances.
+
+    Returns:
+        numpy.ndarray: (n*n, 3) matrix with columns row index, column index
+        and row + column index
+    """
+    i, j = np.divmod(np.arange(n * n), n)
+    return np.stack([i, j, i + j], axis=1)
+
+
+def line_sums(stack, P):
+    """
+    Sum every line of every square with one matrix product.
+
+    Args:
+        stack: (N, n, n) array of squares
+        P: (n*n, L) incidence (or any weight) matrix
+
+    Returns:
+        numpy.ndarray: (N, L) line sums
+    """
+    X = np.asarray(stack, dtype=np.int64).reshape(len(stack), -1)
+    return X @ P
+
+
+def lines_hold(stack, P, target=None):
+    """
+    Test which lines reach their target sum in every square.
+
+    Args:
+        stack: (N, n, n) array of squares
+        P: (n*n, L) 0/1 incidence matrix
+        target: (L,) target sums; defaults to the magic constant scaled by
+                the number of cells on each line
+
+    Returns:
+        numpy.ndarray: (N, L) boolean matrix
+    """
+    n = stack.shape[-1]
+    if target is None:
+        # Cells on a magic line average (n*n + 1) / 2
+        target = P.sum(axis=0) * (n * n + 1) // 2
+    return line_sums(stack, P) == target
+
+
+def projection_covariance(stack, W):
+    """
+    Within-square covariance between each weight vector and the values.
+
+    This generalizes the row-index / column-index / (i+j) covariances of
+    the original scripts to any set of weight columns.
+
+    Args:
+        stack: (N, n, n) array of squares
+        W: (n*n, K) weight matrix
+
+    Returns:
+        numpy.ndarray: (N, K) sample covariances
+    """
+    X = np.asarray(stack, dtype=np.float64).reshape(len(stack), -1)
+    n_cells = X.shape[1]
+    return (X @ W - np.outer(X.sum(axis=1), W.sum(axis=0)) / n_cells) / (n_cells - 1)
+
+
+def pair_covariances(stack, lines):
+    """
+    Within-square covariance between every pair of equal-length ordered lines.
+
+    Entry [s, a, b] is np.cov(line a, line b)[0, 1] for square s, where each
+    line is read in the order its cells are listed. Rows, columns and
+    diagonals reproduce the pair covariances of all_880_analysis.
+
+    Args:
+        stack: (N, n, n) array of squares
+        lines: (L, m) array of ordered cell indexes
+
+    Returns:
+        numpy.ndarray: (N, L, L) covariances
+    """
+    X = np.asarray(stack, dtype=np.float64).reshape(len(stack), -1)
+    V = X[:, lines]
+    V -= V.mean(axis=2, keepdims=True)
+    return np.einsum('slk,spk->slp', V, V) / (lines.shape[1] - 1)
+
+
+def line_sum_covariance(acc, P):
+    """
+    Dataset-wide covariance matrix of line sums from aggregate cell statistics.
+
+    Since line sums are X @ P, their covariance is P.T @ Cov(X) @ P, so any
+    line family can be tested without revisiting the squares.
+
+    Args:
+        acc: CellStatisticsAccumulator from aggregate_statistics
+        P: (n*n, L) incidence matrix
+
+    Returns:
+        numpy.ndarray: (L, L) covariance matrix
+    """
+    return P.T @ acc.covariance() @ P
+
+
+def mean_off_diagonal(covs):
+    """Mean of the off-diagonal entries of each (L, L) block."""
+    L = covs.shape[-1]
+    mask = ~np.eye(L, dtype=bool)
+    return covs[..., mask].mean(axis=-1)
+
+
+def batch_metrics(stack):
+    """
+    Compute the all_880_analysis covariance metrics for a whole stack at once.
+
+    Args:
+        stack: (N, n, n) array of squares
+
+    Returns:
+        dict: (N,) arrays keyed like CovarianceAnalyzer.analyze_all_squares
+    """
+    n = stack.shape[-1]
+    pos_cov = projection_covariance(stack, position_weights(n))
+    return {
+        'cov_row_idx': pos_cov[:, 0],
+        'cov_col_idx': pos_cov[:, 1],
+        'mean_row_cov': mean_off_diagonal(pair_covariances(stack, rows(n))),
+        'mean_col_cov': mean_off_diagonal(pair_covariances(stack, columns(n))),
+        'cov_diag': pair_covariances(stack, diagonals(n))[:, 0, 1],
+    }
+
+
+if __name__ == "__main__":
+    from generation_cache import frenicle_squares
+
+    squares = stack_squares(frenicle_squares(4))
+    n = squares.shape[-1]
+
+    print("="*70)
+    print(f"LINE-COVARIANCE ENGINE ({len(squares)} squares)")
+    print("="*70)
+
+    pos_cov = projection_covariance(squares, position_weights(n))
+    print("\nPosition-value covariance (max |cov| over squares):")
+    for k, label in enumerate(['row index', 'column index', 'row + column']):
+        print(f"  {label:14s} {np.abs(pos_cov[:, k]).max():10.6f}")
+
+    print("\nMean within-square pair covariance:")
+    for name in ['rows', 'columns', 'diagonals', 'broken_diagonals', 'quadrants']:
+        covs = mean_off_diagonal(pair_covariances(squares, LINE_FAMILIES[name](n)))
+        print(f"  {name:20s} min {covs.min():10.6f}  max {covs.max():10.6f}  "
+              f"mean {covs.mean():10.6f}")
+
+    print("\nFraction of squares where every line of a family is magic:")
+    for name in LINE_FAMILIES:
+        P = incidence_matrix(LINE_FAMILIES[name](n), n)
+        holds = lines_hold(squares, P).all(axis=1)
+        print(f"  {name:20s} {holds.sum():5d}/{len(squares)} ({100*holds.mean():.1f}%)")
+
+    acc = compute_cell_statistics(squares, track_cooccurrence=False)
+    P, labels = family_incidence(['broken_diagonals', 'quadrants', 'corners', 'centre_block'], n)
+    cov = line_sum_covariance(acc, P)
+    print("\nVariance of line sums across the dataset:")
+    for label, var in zip(labels, np.diag(cov)):
+        print(f"  {label:22s} {var:10.4f}")
@@ -0,0 +1,212 @@
+"""
+Constructive Generators for Very Large Magic Squares
+
+magic_square_display.create_magic_square_3x3 hardcodes the Lo Shu square and
+nothing else builds squares beyond order 4. The builders here construct a
+magic square of any order n >= 3 as pure index arithmetic on NumPy grids:
+
+- odd n: the Siamese (de la Loubere) method,
+- doubly-even n: complement the cells on the diagonals of every 4x4 block,
+- singly-even n: Conway's LUX method on top of a Siamese square.
+
+Squares are filled a block of rows at a time, so memory stays bounded and
+the output can be an ordinary array or a memmap on disk. A 20000x20000
+square (400 million cells) is written in seconds.
+"""
+
+import time
+
+import numpy as np
+
+
+# 2x2 value patterns of Conway's LUX method
+_LUX_PATTERNS = np.array([
+    [[4, 1], [2, 3]],   # L
+    [[1, 4], [2, 3]],   # U
+    [[1, 4], [3, 2]],   # X
+])
+_L, _U, _X = 0, 1, 2
+
+
+def square_dtype(n):
+    """Smallest signed integer dtype that holds the values 1..n*n."""
+    return np.int32 if n * n < np.iinfo(np.int32).max else np.int64
+
+
+def siamese_block(n, rows, cols):
+    """
+    Values of the Siamese odd-order square at the given row and column indexes.
+
+    Args:
+        n: odd order
+        rows, cols: broadcastable integer index arrays (0-based)
+
+    Returns:
+        numpy.ndarray: values 1..n*n
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    return n * ((rows + cols + 1 + n // 2) % n) + (rows + 2 * cols + 1) % n + 1
+
+
+def doubly_even_block(n, rows, cols):
+    """
+    Values of the doubly-even complement-pattern square at the given indexes.
+
+    Cells are numbered 1..n*n row by row; cells on either diagonal of a 4x4
+    block are replaced by their complement n*n + 1 - v.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    v = rows * n + cols + 1
+    i, j = rows % 4, cols % 4
+    on_diagonal = (i == j) | (i + j == 3)
+    return np.where(on_diagonal, n * n + 1 - v, v)
+
+
+def lux_block(n, rows, cols):
+    """
+    Values of the singly-even LUX square at the given indexes.
+
+    Each cell (a, b) of a Siamese square of order k = n/2 becomes a 2x2 block
+    holding 4*(v - 1) plus an L, U or X pattern: m+1 rows of L, one row of
+    U and m-1 rows of X (n = 4m + 2), with the centre U swapped with the L
+    above it.
+    """
+    k = n // 2
+    m = (k - 1) // 2
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    a, s = np.divmod(rows, 2)
+    b, t = np.divmod(cols, 2)
+
+    letter = np.where(a <= m, _L, np.where(a == m + 1, _U, _X))
+    centre = b == m
+    letter = np.where((a == m) & centre, _U, letter)
+    letter = np.where((a == m + 1) & centre, _L, letter)
+
+    return 4 * (siamese_block(k, a, b) - 1) + _LUX_PATTERNS[letter, s, t]
+
+
+def _builder(n):
+    """Select the construction for order n."""
+    if n < 3:
+        raise ValueError(f"No magic square of order {n} exists for n < 3")
+    if n % 2 == 1:
+        return siamese_block
+    if n % 4 == 0:
+        return doubly_even_block
+    return lux_block
+
+
+def construct_magic_square(n, out=None, chunk_rows=None):
+    """
+    Construct a magic square of order n.
+
+    Args:
+        n: order (n >= 3)
+        out: optional (n, n) array or memmap to fill in place
+        chunk_rows: rows filled per step (default keeps each step ~16M cells)
+
+    Returns:
+        numpy.ndarray: the filled (n, n) square (out, if given)
+    """
+    block = _builder(n)
+    if out is None:
+        out = np.empty((n, n), dtype=square_dtype(n))
+    if chunk_rows is None:
+        chunk_rows = max(1, (1 << 24) // n)
+
+    cols = np.arange(n)[None, :]
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        rows = np.arange(start, stop)[:, None]
+        out[start:stop] = block(n, rows, cols)
+    return out
+
+
+def write_magic_square_memmap(n, filename, chunk_rows=None):
+    """
+    Construct an order-n magic square directly into a .npy memmap.
+
+    The file can be reopened with np.load(filename, mmap_mode='r').
+
+    Returns:
+        numpy.memmap: the open (n, n) memmap
+    """
+    out = np.lib.format.open_memmap(filename, mode='w+', dtype=square_dtype(n), shape=(n, n))
+    construct_magic_square(n, out=out, chunk_rows=chunk_rows)
+    out.flush()
+    return out
+
+
+def streaming_covariance_identities(square, chunk_rows=4096):
+    """
+    Measure the row-index and row-pair covariance identities of one square.
+
+    Uses only row sums, column sums and sums of squares accumulated a block
+    of rows at a time, so it runs on memmapped squares of any size. Second
+    moments are accumulated in float64 because they exceed int64 once n is
+    in the thousands.
+
+    Returns:
+        dict: 'cov_row_index_value' and 'mean_row_pair_cov' measured from the
+        data, and 'mean_row_pair_cov_theory' = -n(n*n+1)(n+1) / (12(n-1)),
+        the value every semi-magic square must take
+    """
+    n = square.shape[0]
+    col_sums = np.zeros(n, dtype=np.int64)
+    row_sums = np.zeros(n, dtype=np.int64)
+    sum_sq = 0.0
+    sum_index_value = 0.0
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(square[start:start + chunk_rows], dtype=np.int64)
+        rs = block.sum(axis=1)
+        row_sums[start:start + len(block)] = rs
+        col_sums += block.sum(axis=0)
+        sum_sq += float(np.square(block, dtype=np.float64).sum())
+        sum_index_value += float(np.dot(np.arange(start, start + len(block), dtype=np.float64), rs))
+
+    total = float(row_sums.sum())
+    n_cells = n * n
+    index_total = n * n * (n - 1) / 2
+    cov_row_index = (sum_index_value - index_total * total / n_cells) / (n_cells - 1)
+
+    # sum_{i != j} sum_k x_ik x_jk = sum_k colsum_k^2 - sum x^2
+    row_means = row_sums.astype(np.float64) / n
+    cross = float(np.square(col_sums.astype(np.float64)).sum()) - sum_sq
+    mean_products = float(row_means.sum()) ** 2 - float(np.square(row_means).sum())
+    mean_pair_cov = (cross - n * mean_products) / ((n - 1) * n * (n - 1))
+
+    theory = -n * (n * n + 1) * (n + 1) / (12 * (n - 1))
+    return {
+        'cov_row_index_value': cov_row_index,
+        'mean_row_pair_cov': mean_pair_cov,
+        'mean_row_pair_cov_theory': theory,
+    }
+
+
+if __name__ == "__main__":
+    from magic_square_display import verify_magic_square
+
+    print("="*70)
+    print("CONSTRUCTIVE MAGIC SQUARES")
+    print("="*70)
+
+    for n in [3, 4, 6]:
+        square = construct_magic_square(n)
+        print(f"\nOrder {n} (valid: {verify_magic_square(square)}):")
+        print(square)
+
+    print("\n" + "-"*70)
+    print("Covariance identities as n grows")
+    print("-"*70)
+    print(f"  {'n':>6s} {'time (s)':>9s} {'cov(row, value)':>16s} "
+          f"{'row-pair cov':>18s} {'theory':>18s}")
+    for n in [4, 5, 6, 10, 101, 1000, 2002, 5000]:
+        start = time.time()
+        square = construct_magic_square(n)
+        elapsed = time.time() - start
+        ident = streaming_covariance_identities(square)
+        print(f"  {n:6d} {elapsed:9.3f} {ident['cov_row_index_value']:16.6f} "
+              f"{ident['mean_row_pair_cov']:18.6f} {ident['mean_row_pair_cov_theory']:18.6f}")
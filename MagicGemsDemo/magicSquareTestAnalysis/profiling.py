@@ -0,0 +1,196 @@
+"""
+Built-in Profiling Mode for the Entry Points
+
+Scripts mark their main phases with `with stage("name"):` and pass
+`--profile` through run_main. Without --profile the stages cost two clock
+reads each and nothing is reported. With --profile the main function runs
+under cProfile and tracemalloc, and next to the outputs we write
+
+    <name>.prof              raw cProfile data (for snakeviz, pstats, ...)
+    <name>_hotspots.txt      functions sorted by cumulative and by own time
+    <name>_allocations.txt   source lines and call sites holding the most
+                             traced memory when the run ends
+
+and print a per-stage table of wall time, CPU time, resident memory and
+traced peak memory.
+
+Work done in worker processes is not profiled, only the waiting for it.
+
+AttentionBlinkDemo/paper/profiling.py loads this file by path (the two
+folders do not share an import path), so this is the only copy to change.
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Stage records of the current run, in completion order
+STAGES = []
+
+# Stages currently open, outermost first
+_open = []
+_started = itertools.count()
+
+
+def _rss_mb():
+    """Current resident set size in MB (None if unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+@contextmanager
+def stage(name):
+    """
+    Record wall time, CPU time and memory of a block as one stage.
+
+    Stages may nest. The traced peak is reset for each stage, so the peak
+    seen so far is handed up to the enclosing stage first.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        if _open:
+            _open[-1]['_peak'] = max(_open[-1]['_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    record = {'name': name, 'depth': len(_open), 'order': next(_started), '_peak': 0}
+    _open.append(record)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall'] = time.perf_counter() - wall_start
+        record['cpu'] = time.process_time() - cpu_start
+        record['rss_mb'] = _rss_mb()
+        record['peak_rss_mb'] = _peak_rss_mb()
+        _open.pop()
+        peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1]) if tracing else None
+        record['traced_peak_mb'] = peak / 2**20 if tracing else None
+        if tracing and _open:
+            _open[-1]['_peak'] = max(_open[-1]['_peak'], peak)
+        STAGES.append(record)
+
+
+def _mb(value):
+    return f"{value:9.1f}" if value is not None else f"{'-':>9s}"
+
+
+def format_stage_table(stages=None):
+    """Per-stage table as text (nested stages indented, in start order)."""
+    stages = STAGES if stages is None else stages
+    lines = [f"  {'stage':34s} {'wall (s)':>9s} {'cpu (s)':>9s} {'rss MB':>9s} "
+             f"{'peak MB':>9s} {'traced MB':>9s}"]
+    # Stages are recorded when they finish; list them in start order so
+    # parents come before their children
+    for record in sorted(stages, key=lambda r: r['order']):
+        name = "  " * record['depth'] + record['name']
+        lines.append(f"  {name:34s} {record['wall']:9.3f} {record['cpu']:9.3f} "
+                     f"{_mb(record['rss_mb'])} {_mb(record['peak_rss_mb'])} "
+                     f"{_mb(record['traced_peak_mb'])}")
+    return "\n".join(lines)
+
+
+def add_profile_argument(parser):
+    """Add the shared --profile option to an argparse parser."""
+    parser.add_argument('--profile', action='store_true',
+                        help="run under cProfile and tracemalloc and write hotspot, "
+                             "allocation and per-stage reports")
+    return parser
+
+
+def profile_call(function, name, output_dir='.', top=30, kwargs=None):
+    """
+    Run a function under cProfile and tracemalloc and write the reports.
+
+    Args:
+        function: callable to profile
+        name: prefix of the report files
+        output_dir: directory receiving the reports
+        top: number of functions and source lines listed
+        kwargs: keyword arguments for function
+
+    Returns:
+        the function's return value
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    STAGES.clear()
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(10)
+    try:
+        with stage('total'):
+            profiler.enable()
+            try:
+                result = function(**(kwargs or {}))
+            finally:
+                profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    table = format_stage_table()
+
+    profiler.dump_stats(output_dir / f"{name}.prof")
+    text = io.StringIO()
+    for key in ['cumulative', 'tottime']:
+        text.write(f"Top {top} functions by {key} time\n")
+        stats = pstats.Stats(profiler, stream=text).strip_dirs().sort_stats(key)
+        stats.print_stats(top)
+    with open(output_dir / f"{name}_hotspots.txt", 'w') as f:
+        f.write("Stages\n\n" + table + "\n\n" + text.getvalue())
+
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    with open(output_dir / f"{name}_allocations.txt", 'w') as f:
+        f.write(f"Top {top} source lines by memory still allocated when the run ended\n\n")
+        for index, stat in enumerate(snapshot.statistics('lineno')[:top], 1):
+            frame = stat.traceback[0]
+            f.write(f"{index:3d}. {frame.filename}:{frame.lineno}  "
+                    f"{stat.size / 2**10:.1f} KiB in {stat.count} blocks\n")
+        f.write(f"\nTop {min(top, 10)} call sites by memory (10-frame tracebacks)\n\n")
+        for stat in snapshot.statistics('traceback')[:min(top, 10)]:
+            f.write(f"{stat.size / 2**10:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format():
+                f.write(f"  {line}\n")
+            f.write("\n")
+
+    print("\n" + "-"*70)
+    print(f"PROFILE: {name}")
+    print("-"*70)
+    print("\n" + table)
+    print(f"\nReports: {output_dir / (name + '_hotspots.txt')}, "
+          f"{output_dir / (name + '_allocations.txt')}, {output_dir / (name + '.prof')}")
+    return result
+
+
+def run_main(function, profile, name, output_dir='.', **kwargs):
+    """Call an entry point with keyword arguments, under profile_call when profile is set."""
+    if profile:
+        return profile_call(function, name, output_dir, kwargs=kwargs)
+    return function(**kwargs)
@@ -0,0 +1,255 @@
+"""
+Progress, Throughput and ETA Reporting for Long Loops
+
+The generators used to print every 88th square and the analysis loops
+every 100th, with no rate or ETA, which says nothing for counts other than
+880. A Progress object is fed counters from enumeration, analysis and
+simulation loops:
+
+- items (squares found or analyzed), nodes (search nodes expanded) and
+  done (units of a known work space, e.g. first-row prefixes),
+- or a directly estimated coverage of the search space (tree_coverage),
+
+and reports items/sec, nodes/sec, the fraction covered and an ETA.
+
+update() only adds to integers and decrements a countdown; the clock is
+read when the countdown runs out, and the countdown is re-sized from the
+observed call rate so the clock is sampled at most a few times per second,
+however hot the loop.
+
+Output modes (argument, or $MAGIC_SQUARE_PROGRESS for batch jobs):
+    text   one status line per report (rewritten in place on a terminal)
+    jsonl  one JSON object per report, for logs and dashboards
+    quiet  nothing; the final summary is still returned by finish()
+"""
+
+import json
+import os
+import sys
+import time
+
+
+MODES = ('text', 'jsonl', 'quiet')
+
+# Target gap between clock samples, in seconds
+SAMPLE_SECONDS = 0.25
+
+# Upper bound on the number of update() calls between clock samples
+_MAX_WINDOW = 1_000_000
+
+
+def default_mode():
+    """Output mode from $MAGIC_SQUARE_PROGRESS (default 'text')."""
+    mode = os.environ.get('MAGIC_SQUARE_PROGRESS', 'text')
+    return mode if mode in MODES else 'text'
+
+
+def tree_coverage(path):
+    """
+    Fraction of a search tree lying left of the current path.
+
+    Args:
+        path: (index, choices) of the branch taken at each depth, from
+              the root down
+
+    Returns:
+        float: estimate in [0, 1) assuming equally sized subtrees
+    """
+    covered, width = 0.0, 1.0
+    for index, choices in path:
+        width /= max(choices, 1)
+        covered += index * width
+    return covered
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _format_rate(rate):
+    if rate >= 1e6:
+        return f"{rate / 1e6:.1f}M"
+    if rate >= 1e3:
+        return f"{rate / 1e3:.1f}k"
+    return f"{rate:.1f}"
+
+
+class Progress:
+    """
+    Rate-limited progress reporter.
+
+    Use as a context manager or call finish() at the end.
+    """
+
+    def __init__(self, label, total=None, target=None, unit='squares', mode=None,
+                 interval=None, stream=None):
+        """
+        Args:
+            label: name shown in every report
+            total: size of the work space that update(done=...) counts
+                   against (e.g. the number of first-row prefixes)
+            target: number of items wanted (e.g. max_squares); the run is
+                    also complete when it is reached
+            unit: name of the items
+            mode: 'text', 'jsonl' or 'quiet' (default: default_mode())
+            interval: seconds between reports (default 0.5 on a terminal,
+                      5 otherwise)
+            stream: output stream (default sys.stdout)
+        """
+        self.label = label
+        self.total = total
+        self.target = target
+        self.unit = unit
+        self.mode = mode or default_mode()
+        if self.mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {self.mode!r}")
+        self.stream = stream if stream is not None else sys.stdout
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = interval if interval is not None else (0.5 if self._tty else 5.0)
+
+        self.items = 0
+        self.nodes = 0
+        self.done = 0
+        self.coverage = 0.0
+        self.start = time.perf_counter()
+        self._last_sample = self.start
+        self._last_report = self.start
+        self._window = 1
+        # Quiet runs never look at the clock before finish()
+        self._countdown = float('inf') if self.mode == 'quiet' else 1
+        self._finished = None
+
+    def update(self, items=0, nodes=0, done=0, coverage=None):
+        """
+        Add to the counters; reports when the reporting interval has passed.
+
+        Args:
+            items: items completed since the last call
+            nodes: search nodes expanded since the last call
+            done: work-space units completed since the last call
+            coverage: current estimate of the fraction of the work covered
+                      (e.g. tree_coverage of the search path)
+        """
+        self.items += items
+        self.nodes += nodes
+        self.done += done
+        if coverage is not None:
+            self.coverage = coverage
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._sample()
+
+    def _sample(self):
+        now = time.perf_counter()
+        gap = now - self._last_sample
+        # The countdown covered self._window calls; size the next one so the
+        # clock is read about every SAMPLE_SECONDS, growing at most 4x per
+        # sample in case the loop slows down
+        if gap > 0:
+            window = int(self._window * SAMPLE_SECONDS / gap)
+        else:
+            window = 4 * self._window
+        self._window = max(1, min(4 * self._window, window, _MAX_WINDOW))
+        self._countdown = self._window
+        self._last_sample = now
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._emit(self.snapshot(now))
+
+    def fraction(self):
+        """Best available estimate of the fraction of the work done (None if unknown)."""
+        estimates = [self.coverage] if self.coverage else []
+        if self.total:
+            estimates.append(self.done / self.total)
+        if self.target:
+            estimates.append(self.items / self.target)
+        return min(1.0, max(estimates)) if estimates else None
+
+    def snapshot(self, now=None):
+        """Counters, rates, fraction and ETA as a dict."""
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self.start
+        fraction = self.fraction()
+        eta = None
+        if fraction and elapsed > 0:
+            eta = elapsed * (1 - fraction) / fraction
+        return {
+            'label': self.label,
+            'elapsed': elapsed,
+            self.unit: self.items,
+            'nodes': self.nodes,
+            'done': self.done,
+            'total': self.total,
+            f'{self.unit}_per_second': self.items / elapsed if elapsed > 0 else 0.0,
+            'nodes_per_second': self.nodes / elapsed if elapsed > 0 else 0.0,
+            'fraction': fraction,
+            'eta_seconds': eta,
+        }
+
+    def _emit(self, snap, final=False):
+        if self.mode == 'quiet':
+            return
+        if self.mode == 'jsonl':
+            record = dict(snap, final=final)
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+            return
+
+        parts = [f"{snap[self.unit]:,} {self.unit} ({_format_rate(snap[f'{self.unit}_per_second'])}/s)"]
+        if snap['nodes']:
+            parts.append(f"{snap['nodes']:,} nodes ({_format_rate(snap['nodes_per_second'])}/s)")
+        if snap['fraction'] is not None:
+            parts.append(f"{100 * snap['fraction']:5.1f}%")
+        if final:
+            parts.append(f"done in {_format_duration(snap['elapsed'])}")
+        elif snap['eta_seconds'] is not None:
+            parts.append(f"ETA {_format_duration(snap['eta_seconds'])}")
+        line = f"  [{self.label}] " + " | ".join(parts)
+        if self._tty:
+            end = "\n" if final else ""
+            self.stream.write("\r\x1b[K" + line + end)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        """
+        Emit the final report (once).
+
+        Returns:
+            dict: the final snapshot
+        """
+        if self._finished is None:
+            self._finished = self.snapshot()
+            self._emit(self._finished, final=True)
+        return self._finished
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Demonstrate progress reporting on the sharded enumeration")
+    parser.add_argument('--mode', choices=MODES, default=None)
+    args = parser.parse_args()
+
+    from sharded_enumeration import enumerate_prefixes, first_row_prefixes
+
+    print("="*70)
+    print("PROGRESS REPORTING: order-4 enumeration")
+    print("="*70)
+    prefixes = first_row_prefixes(4)
+    with Progress('enumerate order 4', total=len(prefixes), mode=args.mode) as progress:
+        squares, _ = enumerate_prefixes(4, prefixes, progress=progress)
+    print(f"\n{len(squares)} squares")
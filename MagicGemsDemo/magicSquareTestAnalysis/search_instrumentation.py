@@ -0,0 +1,160 @@
+"""
+Instrumentation for the Backtracking Magic-Square Generators
+
+MagicSquareGenerator._backtrack (all_880_analysis) and the solve_recursive
+search inside create_880_magic_squares_fast (generate_880_fast) only print
+every 88th square, so there is no way to tell why one is slower than the
+other. Both accept an optional SearchStats and record, per depth (cell
+position):
+
+- nodes expanded,
+- candidates tried,
+- prunes by reason (row, column, diagonal, Frenicle),
+- solutions found,
+- wall time spent in the subtree (inclusive) and at the depth itself.
+
+Without a SearchStats the searches only test `stats is None` once per
+node, so instrumentation costs nothing measurable when disabled.
+
+Usage:
+    python search_instrumentation.py --max-squares 88 --json search_stats.json
+"""
+
+import json
+import time
+
+
+PRUNE_REASONS = ('row', 'column', 'diagonal', 'frenicle')
+
+
+class SearchStats:
+    """
+    Per-depth counters and timers for one backtracking search.
+
+    The search calls enter()/exit() around every node and tried(),
+    prune() and solution() as it goes.
+    """
+
+    def __init__(self, name, max_depth=16):
+        self.name = name
+        self.max_depth = max_depth
+        size = max_depth + 1
+        self.nodes = [0] * size
+        self.candidates = [0] * size
+        self.solutions = [0] * size
+        self.prunes = {reason: [0] * size for reason in PRUNE_REASONS}
+        self.inclusive = [0.0] * size
+
+    def enter(self, depth):
+        """Count a node and return its start time."""
+        self.nodes[depth] += 1
+        return time.perf_counter()
+
+    def exit(self, depth, start):
+        """Add the time spent in the subtree of a node."""
+        self.inclusive[depth] += time.perf_counter() - start
+
+    def tried(self, depth, count=1):
+        """Count candidates tried at a depth."""
+        self.candidates[depth] += count
+
+    def prune(self, depth, reason):
+        """Count a pruned candidate (or a dead end) at a depth."""
+        self.prunes[reason][depth] += 1
+
+    def solution(self, depth):
+        """Count a complete square accepted at a depth."""
+        self.solutions[depth] += 1
+
+    def report(self):
+        """
+        Summarize the search.
+
+        Returns:
+            dict: totals and a 'per_depth' list; 'self_seconds' is the time
+            at a depth excluding its children, 'prune_rate' is prunes per
+            candidate tried
+        """
+        per_depth = []
+        for d in range(self.max_depth + 1):
+            children = self.inclusive[d + 1] if d < self.max_depth else 0.0
+            prunes = {reason: counts[d] for reason, counts in self.prunes.items()}
+            n_pruned = sum(prunes.values())
+            per_depth.append({
+                'depth': d,
+                'nodes': self.nodes[d],
+                'candidates': self.candidates[d],
+                'prunes': prunes,
+                'prune_rate': n_pruned / self.candidates[d] if self.candidates[d] else 0.0,
+                'solutions': self.solutions[d],
+                'inclusive_seconds': self.inclusive[d],
+                'self_seconds': max(0.0, self.inclusive[d] - children),
+            })
+        return {
+            'name': self.name,
+            'nodes': sum(self.nodes),
+            'candidates': sum(self.candidates),
+            'prunes': {reason: sum(counts) for reason, counts in self.prunes.items()},
+            'solutions': sum(self.solutions),
+            'wall_seconds': self.inclusive[0],
+            'per_depth': per_depth,
+        }
+
+    def write_json(self, path):
+        """Write the report to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def print_search_table(report):
+    """Print a per-depth table of a SearchStats report."""
+    print("\n" + "-"*70)
+    print(f"SEARCH PROFILE: {report['name']}")
+    print("-"*70)
+    print(f"\n{report['nodes']:,} nodes, {report['candidates']:,} candidates, "
+          f"{report['solutions']} solutions in {report['wall_seconds']:.2f} seconds")
+    print("Prunes: " + ", ".join(f"{reason} {count:,}" for reason, count in report['prunes'].items()))
+
+    header = f"\n  {'depth':>5s} {'nodes':>10s} {'cands':>10s}"
+    header += "".join(f" {reason:>9s}" for reason in PRUNE_REASONS)
+    header += f" {'prune %':>8s} {'self (s)':>9s}"
+    print(header)
+    for row in report['per_depth']:
+        if not row['nodes']:
+            continue
+        line = f"  {row['depth']:5d} {row['nodes']:10d} {row['candidates']:10d}"
+        line += "".join(f" {row['prunes'][reason]:9d}" for reason in PRUNE_REASONS)
+        line += f" {100 * row['prune_rate']:7.1f}% {row['self_seconds']:9.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from all_880_analysis import MagicSquareGenerator
+    from generate_880_fast import create_880_magic_squares_fast
+
+    parser = argparse.ArgumentParser(description="Profile the backtracking generators")
+    parser.add_argument('--max-squares', type=int, default=88,
+                        help="stop each search after this many squares")
+    parser.add_argument('--json', default=None, help="write both reports to this JSON file")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"BACKTRACKING SEARCH PROFILES (first {args.max_squares} squares)")
+    print("="*70)
+
+    backtrack_stats = SearchStats('MagicSquareGenerator._backtrack')
+    MagicSquareGenerator(stats=backtrack_stats).generate_all(max_squares=args.max_squares)
+
+    fast_stats = SearchStats('create_880_magic_squares_fast.solve_recursive')
+    create_880_magic_squares_fast(max_squares=args.max_squares, stats=fast_stats)
+
+    reports = [backtrack_stats.report(), fast_stats.report()]
+    for report in reports:
+        print_search_table(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReports saved to: {args.json}")
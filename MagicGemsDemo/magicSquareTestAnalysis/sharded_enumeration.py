@@ -0,0 +1,571 @@
+"""
+Sharded Enumeration of Magic Squares Across Several Machines
+
+The 880 order-4 squares take one process a few seconds, but the 275,305,224
+order-5 squares in Frenicle standard form need many machines. This script
+splits the search tree into numbered shards of first-row prefixes and
+coordinates everything through files in a run directory, so any machine
+that sees the directory on a shared filesystem can take part:
+
+- plan:   list the first-row prefixes that can start a Frenicle-minimal
+          square, split them into contiguous shards and write
+          manifest.json,
+- work:   claim unfinished shards (one O_EXCL lock file per shard) and write
+          each shard's squares as a packed (k, n*n) uint8 .npy plus a stats
+          JSON,
+- status: report done, claimed and pending shards,
+- merge:  check that every shard is present and was produced for this
+          manifest, verify the squares and concatenate them into one
+          canonical, lexicographically sorted (N, n, n) store.
+
+The search fills whole rows from a table of all ordered rows summing to the
+magic constant, tracks used values in a bitmask, and completes the last two
+rows of every partial square with one vectorized step.
+
+Usage:
+    python sharded_enumeration.py plan runs/order4 --order 4 --shards 16
+    python sharded_enumeration.py work runs/order4
+    python sharded_enumeration.py status runs/order4
+    python sharded_enumeration.py merge runs/order4
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import socket
+import time
+from pathlib import Path
+
+import numpy as np
+
+from square_verification import is_frenicle_standard_batch, verify_batch
+
+
+# Bump when the search or the shard format changes; shards from another
+# version are rejected by merge
+ENUMERATION_VERSION = 2
+
+# Number of squares in Frenicle standard form for each order
+KNOWN_COUNTS = {3: 1, 4: 880, 5: 275_305_224}
+
+MANIFEST_NAME = "manifest.json"
+SHARD_DIR = "shards"
+
+# Pair matrices in the vectorized completion step are built in chunks of
+# about this many entries
+_PAIR_CHUNK = 1 << 22
+
+
+def ordered_rows(n):
+    """
+    All ordered rows of distinct values 1..n*n that sum to the magic constant.
+
+    Args:
+        n: order of the square (3 <= n <= 7, so a row fits a 64-bit mask)
+
+    Returns:
+        tuple: ((R, n) int64 array in lexicographic order, (R,) int64
+        bitmasks of the values in each row)
+    """
+    if not 3 <= n <= 7:
+        raise ValueError(f"Sharded enumeration supports orders 3 to 7, got {n}")
+    magic_sum = n * (n * n + 1) // 2
+    subsets = np.array([c for c in itertools.combinations(range(1, n * n + 1), n)
+                        if sum(c) == magic_sum], dtype=np.int64)
+    perms = np.array(list(itertools.permutations(range(n))))
+    rows = subsets[:, perms].reshape(-1, n)
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return rows, _row_bits(rows)
+
+
+def first_row_prefixes(n):
+    """
+    First rows that can start a square in Frenicle standard form.
+
+    The top-left value must be the smallest of the four corners, so it is
+    below the top-right one and leaves three larger values for the other
+    corners. At order 4 the corners of every magic square also sum to the
+    magic constant, so the bottom corners must be two distinct values above
+    the top-left one, outside the first row, making up the rest of it (this
+    rules out a top-left value above 7). Prefixes that fail these checks
+    hold no squares but would still be searched.
+
+    These are the units of work that shards are made of.
+
+    Returns:
+        numpy.ndarray: (P, n) int64 array in lexicographic order
+    """
+    rows, masks = ordered_rows(n)
+    keep = (rows[:, 0] < rows[:, -1]) & (rows[:, 0] <= n * n - 3)
+    if n == 4:
+        magic_sum = n * (n * n + 1) // 2
+        rest = magic_sum - rows[:, 0] - rows[:, -1]
+        # Bottom corners x < y with x + y = rest, above the top-left value
+        # and not already in the first row
+        values = np.arange(1, n * n + 1)
+        x = values[None, :]
+        y = rest[:, None] - x
+        unused = lambda v: (masks[:, None] >> (np.clip(v, 1, n * n) - 1)) & 1 == 0
+        possible = ((x > rows[:, :1]) & (x < y) & (y <= n * n)
+                    & unused(x) & unused(y))
+        keep &= possible.any(axis=1)
+    return rows[keep]
+
+
+def _row_bits(values):
+    """Bitmask of the values 1..63 in each row."""
+    return np.bitwise_or.reduce(np.left_shift(np.int64(1), values - 1), axis=-1)
+
+
+def _prefix_digest(prefixes):
+    """Fingerprint of the prefix list, so shards from another plan are caught."""
+    return hashlib.sha256(np.ascontiguousarray(prefixes, dtype=np.uint8).tobytes()).hexdigest()
+
+
+def _finish(n, fixed, tail, remaining, stats):
+    """
+    Complete partial squares whose last row is forced by the column sums.
+
+    Args:
+        n: order of the square
+        fixed: (d, n) rows shared by every candidate
+        tail: (k, n - 1 - d, n) candidate rows following the fixed ones
+        remaining: (k,) bitmask of the values the last row must hold
+        stats: counters updated in place
+
+    Returns:
+        numpy.ndarray: (m, n*n) uint8 array of complete squares
+    """
+    magic_sum = n * (n * n + 1) // 2
+    k = len(tail)
+    stats['candidates'] += k
+
+    last = magic_sum - fixed.sum(axis=0) - tail.sum(axis=1)
+    ok = ((last >= 1) & (last <= n * n)).all(axis=1)
+    ok &= _row_bits(np.clip(last, 1, n * n)) == remaining
+
+    squares = np.concatenate([np.broadcast_to(fixed, (k,) + fixed.shape),
+                              tail, last[:, None, :]], axis=1)[ok]
+    idx = np.arange(n)
+    ok = ((squares[:, idx, idx].sum(axis=1) == magic_sum)
+          & (squares[:, idx, n - 1 - idx].sum(axis=1) == magic_sum)
+          & is_frenicle_standard_batch(squares))
+    return squares[ok].reshape(-1, n * n).astype(np.uint8)
+
+
+def _search(n, rows, masks, fixed, used, cand, stats, out):
+    """
+    Depth-first search over whole rows below a fixed prefix.
+
+    Args:
+        fixed: (d, n) rows placed so far
+        used: bitmask of the values in the fixed rows
+        cand: indexes into rows of every row disjoint from the fixed rows
+        out: list that receives (m, n*n) uint8 blocks of squares, in
+             lexicographic order
+    """
+    d = len(fixed)
+    full = (1 << (n * n)) - 1
+    stats['nodes'] += 1
+
+    # Frenicle standard form: a[0, 1] < a[1, 0]
+    first = cand[rows[cand, 0] > fixed[0, 1]] if d == 1 else cand
+
+    if d == n - 2:
+        out.append(_finish(n, fixed, rows[first][:, None, :], full ^ used ^ masks[first], stats))
+        return
+
+    if d == n - 3:
+        # Pair every candidate for row d with every disjoint row d+1
+        chunk = max(1, _PAIR_CHUNK // max(1, len(cand)))
+        for start in range(0, len(first), chunk):
+            a = first[start:start + chunk]
+            ia, ib = np.nonzero((masks[a][:, None] & masks[cand][None, :]) == 0)
+            a, b = a[ia], cand[ib]
+            tail = np.stack([rows[a], rows[b]], axis=1)
+            out.append(_finish(n, fixed, tail, full ^ used ^ masks[a] ^ masks[b], stats))
+        return
+
+    for r in first:
+        row_mask = int(masks[r])
+        child = cand[(masks[cand] & row_mask) == 0]
+        _search(n, rows, masks, np.vstack([fixed, rows[r]]), used | row_mask, child, stats, out)
+
+
+def enumerate_prefixes(n, prefixes, rows=None, masks=None, progress=None):
+    """
+    Enumerate every Frenicle-standard square whose first row is in prefixes.
+
+    Args:
+        n: order of the square
+        prefixes: (P, n) array of first rows
+        rows, masks: optional precomputed ordered_rows(n)
+        progress: optional progress_reporting.Progress, updated once per
+                  prefix with squares, nodes and one unit of done
+
+    Returns:
+        tuple: ((N, n*n) uint8 array of squares, lexicographically sorted when
+        the prefixes are, and a dict of search counters)
+    """
+    if rows is None:
+        rows, masks = ordered_rows(n)
+    stats = {'nodes': 0, 'candidates': 0}
+    out = [np.empty((0, n * n), dtype=np.uint8)]
+    for prefix in np.asarray(prefixes, dtype=np.int64):
+        used = int(_row_bits(prefix))
+        cand = np.flatnonzero((masks & used) == 0)
+        n_blocks, n_nodes = len(out), stats['nodes']
+        _search(n, rows, masks, prefix[None, :], used, cand, stats, out)
+        if progress is not None:
+            progress.update(items=sum(len(block) for block in out[n_blocks:]),
+                            nodes=stats['nodes'] - n_nodes, done=1)
+    return np.concatenate(out), stats
+
+
+def _write_atomic(path, write):
+    """Write a file under a temporary name and rename it into place."""
+    tmp = path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write_json(path, data):
+    _write_atomic(path, lambda f: f.write(json.dumps(data, indent=2).encode()))
+
+
+def load_manifest(run_dir):
+    """Read the manifest of a run directory."""
+    with open(Path(run_dir) / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def plan_shards(run_dir, n, n_shards):
+    """
+    Split the search for order n into numbered shards and write the manifest.
+
+    Each shard is a contiguous range of first-row prefixes, so concatenating
+    the shard outputs in id order gives the squares in lexicographic order.
+
+    Args:
+        run_dir: directory shared by all workers
+        n: order of the squares
+        n_shards: number of shards (capped at the number of prefixes)
+
+    Returns:
+        dict: the manifest
+    """
+    run_dir = Path(run_dir)
+    if (run_dir / MANIFEST_NAME).exists():
+        raise FileExistsError(f"{run_dir / MANIFEST_NAME} already exists; use a new run directory")
+    (run_dir / SHARD_DIR).mkdir(parents=True, exist_ok=True)
+
+    prefixes = first_row_prefixes(n)
+    n_shards = max(1, min(n_shards, len(prefixes)))
+    bounds = np.linspace(0, len(prefixes), n_shards + 1).round().astype(int)
+
+    manifest = {
+        'version': ENUMERATION_VERSION,
+        'order': n,
+        'n_prefixes': len(prefixes),
+        'prefix_digest': _prefix_digest(prefixes),
+        'expected_count': KNOWN_COUNTS.get(n),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'shards': [{
+            'id': k,
+            'prefix_start': int(bounds[k]),
+            'prefix_stop': int(bounds[k + 1]),
+            'output': f"{SHARD_DIR}/shard_{k:05d}.npy",
+            'stats': f"{SHARD_DIR}/shard_{k:05d}.json",
+            'lock': f"{SHARD_DIR}/shard_{k:05d}.lock",
+        } for k in range(n_shards)],
+    }
+    _write_json(run_dir / MANIFEST_NAME, manifest)
+    return manifest
+
+
+def _checked_prefixes(manifest):
+    """Recompute the prefixes and make sure they match the manifest."""
+    prefixes = first_row_prefixes(manifest['order'])
+    if manifest['version'] != ENUMERATION_VERSION or _prefix_digest(prefixes) != manifest['prefix_digest']:
+        raise ValueError("Manifest was planned with a different version of the enumeration code")
+    return prefixes
+
+
+def run_shard(run_dir, shard_id, manifest=None, prefixes=None, tables=None, progress=None):
+    """
+    Enumerate one shard and write its packed squares and stats.
+
+    The stats file is written last, so its presence marks the shard as done.
+    progress is passed on to enumerate_prefixes.
+
+    Returns:
+        dict: the shard stats
+    """
+    run_dir = Path(run_dir)
+    if manifest is None:
+        manifest = load_manifest(run_dir)
+    if prefixes is None:
+        prefixes = _checked_prefixes(manifest)
+    n = manifest['order']
+    spec = manifest['shards'][shard_id]
+
+    start, cpu_start = time.time(), time.process_time()
+    rows, masks = tables if tables is not None else ordered_rows(n)
+    squares, counters = enumerate_prefixes(
+        n, prefixes[spec['prefix_start']:spec['prefix_stop']], rows, masks, progress)
+    elapsed, cpu = time.time() - start, time.process_time() - cpu_start
+
+    _write_atomic(run_dir / spec['output'], lambda f: np.save(f, squares))
+    stats = {
+        'id': shard_id,
+        'version': ENUMERATION_VERSION,
+        'prefix_digest': manifest['prefix_digest'],
+        'n_prefixes': spec['prefix_stop'] - spec['prefix_start'],
+        'n_squares': len(squares),
+        'nodes': counters['nodes'],
+        'candidates': counters['candidates'],
+        'wall_seconds': elapsed,
+        'cpu_seconds': cpu,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    _write_json(run_dir / spec['stats'], stats)
+    return stats
+
+
+def _claim(path):
+    """Atomically create a lock file; False if another worker holds it."""
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"{socket.gethostname()} {os.getpid()} {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    return True
+
+
+def work(run_dir, shard_ids=None, max_shards=None):
+    """
+    Process shards of a run.
+
+    Without shard_ids, claims every shard that is neither done nor locked
+    by another worker, so any number of workers can share a run directory.
+    Listed shard_ids are (re)run unconditionally, e.g. after a worker died
+    holding a lock.
+
+    Returns:
+        int: number of shards processed
+    """
+    run_dir = Path(run_dir)
+    manifest = load_manifest(run_dir)
+    prefixes = _checked_prefixes(manifest)
+    tables = ordered_rows(manifest['order'])
+
+    done = 0
+    for spec in manifest['shards']:
+        if max_shards is not None and done >= max_shards:
+            break
+        if shard_ids is not None:
+            if spec['id'] not in shard_ids:
+                continue
+        elif (run_dir / spec['stats']).exists() or not _claim(run_dir / spec['lock']):
+            continue
+        stats = run_shard(run_dir, spec['id'], manifest, prefixes, tables)
+        done += 1
+        print(f"  shard {spec['id']:5d}: {stats['n_squares']:10d} squares from "
+              f"{stats['n_prefixes']} prefixes in {stats['wall_seconds']:.1f} s")
+    return done
+
+
+def shard_status(run_dir):
+    """
+    Summarize the progress of a run.
+
+    Returns:
+        dict: lists of 'done', 'claimed' and 'pending' shard ids, and the
+        stats of the finished shards under 'stats'
+    """
+    run_dir = Path(run_dir)
+    manifest = load_manifest(run_dir)
+    status = {'done': [], 'claimed': [], 'pending': [], 'stats': []}
+    for spec in manifest['shards']:
+        if (run_dir / spec['stats']).exists():
+            status['done'].append(spec['id'])
+            with open(run_dir / spec['stats']) as f:
+                status['stats'].append(json.load(f))
+        elif (run_dir / spec['lock']).exists():
+            status['claimed'].append(spec['id'])
+        else:
+            status['pending'].append(spec['id'])
+    return status
+
+
+def _lex_increasing(flat, previous=None):
+    """True if the rows of flat are strictly increasing (and above previous)."""
+    if previous is not None:
+        flat = np.vstack([previous[None, :], flat])
+    if len(flat) < 2:
+        return True
+    diff = flat[1:].astype(np.int16) - flat[:-1].astype(np.int16)
+    nonzero = diff != 0
+    first = nonzero.argmax(axis=1)
+    return bool((nonzero.any(axis=1) & (diff[np.arange(len(diff)), first] > 0)).all())
+
+
+def merge_shards(run_dir, output=None, chunk_size=1_000_000):
+    """
+    Validate a finished run and combine its shards into one canonical store.
+
+    Checks that every shard is done, was produced for this manifest and
+    covers its whole prefix range; that every square is magic and in
+    Frenicle standard form; that squares are strictly increasing across the
+    whole run (so there are no duplicates); and that the total matches the
+    known count for the order. Squares are streamed shard by shard, so the
+    store can be larger than memory.
+
+    Args:
+        run_dir: run directory
+        output: path of the (N, n, n) uint8 .npy store
+                (default: magic_squares_order{n}.npy in the run directory)
+        chunk_size: squares verified per step
+
+    Returns:
+        Path: the store, or None if validation failed
+    """
+    run_dir = Path(run_dir)
+    manifest = load_manifest(run_dir)
+    n = manifest['order']
+
+    problems = []
+    shards = []
+    for spec in manifest['shards']:
+        stats_path = run_dir / spec['stats']
+        if not stats_path.exists():
+            problems.append(f"shard {spec['id']} is not done")
+            continue
+        with open(stats_path) as f:
+            stats = json.load(f)
+        if (stats['version'] != manifest['version']
+                or stats['prefix_digest'] != manifest['prefix_digest']
+                or stats['n_prefixes'] != spec['prefix_stop'] - spec['prefix_start']):
+            problems.append(f"shard {spec['id']} does not match the manifest")
+            continue
+        squares = np.load(run_dir / spec['output'], mmap_mode='r')
+        if squares.shape != (stats['n_squares'], n * n):
+            problems.append(f"shard {spec['id']} has shape {squares.shape}, "
+                            f"expected ({stats['n_squares']}, {n * n})")
+            continue
+        shards.append(squares)
+
+    total = sum(len(s) for s in shards)
+    expected = manifest['expected_count']
+    if not problems and expected is not None and total != expected:
+        problems.append(f"{total} squares, expected {expected}")
+    if problems:
+        for problem in problems:
+            print(f"✗ {problem}")
+        return None
+
+    output = Path(output) if output is not None else run_dir / f"magic_squares_order{n}.npy"
+    # Written beside the store and moved into place only once every shard
+    # verifies, so a failed merge never leaves a partial or replaced store
+    tmp = output.with_name(f".{output.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+    try:
+        store = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=(total, n, n))
+        ok = _copy_verified(shards, store, chunk_size)
+        store.flush()
+        del store
+        if ok:
+            os.replace(tmp, output)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return output if ok else None
+
+
+def _copy_verified(shards, store, chunk_size):
+    """Copy shards into an (N, n, n) store chunk by chunk, verifying as they go."""
+    n = store.shape[-1]
+    position = 0
+    previous = None
+    for k, squares in enumerate(shards):
+        for start in range(0, len(squares), chunk_size):
+            flat = np.asarray(squares[start:start + chunk_size])
+            if not verify_batch(flat.reshape(-1, n, n)).all():
+                print(f"✗ shard {k} holds invalid squares")
+                return False
+            if not _lex_increasing(flat, previous):
+                print(f"✗ shard {k} is out of order or overlaps the previous shard")
+                return False
+            store[position:position + len(flat)] = flat.reshape(-1, n, n)
+            position += len(flat)
+            previous = flat[-1]
+    return True
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Sharded enumeration of magic squares")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('plan', help="split the search into shards and write the manifest")
+    p.add_argument('run_dir')
+    p.add_argument('--order', type=int, default=4)
+    p.add_argument('--shards', type=int, default=64)
+
+    p = sub.add_parser('work', help="process unfinished shards")
+    p.add_argument('run_dir')
+    p.add_argument('--shard', type=int, action='append', dest='shards',
+                   help="run this shard even if it is locked (repeatable)")
+    p.add_argument('--max-shards', type=int, default=None)
+
+    p = sub.add_parser('status', help="report shard progress")
+    p.add_argument('run_dir')
+
+    p = sub.add_parser('merge', help="validate all shards and build the canonical store")
+    p.add_argument('run_dir')
+    p.add_argument('--output', default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        manifest = plan_shards(args.run_dir, args.order, args.shards)
+        print(f"Planned {len(manifest['shards'])} shards over {manifest['n_prefixes']} "
+              f"first-row prefixes for order {args.order}")
+        print(f"Manifest: {Path(args.run_dir) / MANIFEST_NAME}")
+
+    elif args.command == 'work':
+        start = time.time()
+        done = work(args.run_dir, args.shards, args.max_shards)
+        print(f"Processed {done} shards in {time.time() - start:.1f} seconds")
+
+    elif args.command == 'status':
+        status = shard_status(args.run_dir)
+        n_shards = sum(len(status[key]) for key in ['done', 'claimed', 'pending'])
+        stats = status['stats']
+        print(f"Shards: {len(status['done'])}/{n_shards} done, "
+              f"{len(status['claimed'])} claimed, {len(status['pending'])} pending")
+        if stats:
+            print(f"Squares so far: {sum(s['n_squares'] for s in stats)}")
+            print(f"CPU time so far: {sum(s['cpu_seconds'] for s in stats):.1f} seconds")
+            print(f"Hosts: {', '.join(sorted({s['host'] for s in stats}))}")
+        if status['claimed']:
+            print(f"Claimed but unfinished: {status['claimed'][:20]}")
+
+    elif args.command == 'merge':
+        start = time.time()
+        output = merge_shards(args.run_dir, args.output)
+        if output is None:
+            print("Merge failed.")
+            raise SystemExit(1)
+        store = np.load(output, mmap_mode='r')
+        print(f"✓ Merged {len(store)} verified squares into {output} "
+              f"in {time.time() - start:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Overflow-Safe Verification of Magic Squares
+
+magic_square_display.verify_magic_square and
+generate_880_squares.verify_magic_square_4x4 loop over rows and columns with
+np.sum and (in the latter) build set(square.flatten()). For large n the
+Python set and the default integer dtype become the bottleneck and an
+overflow risk.
+
+verify_square_streaming makes one pass over a (possibly memmapped) square a
+block of rows at a time. It accumulates row, column and diagonal sums in
+int64 (switching to Python integers when values could overflow), checks the
+permutation property with a bitmap of n*n bits, and reports exactly which
+lines fail.
+
+verify_batch checks a whole (N, n, n) collection of small squares at once,
+and check_square_collection is what the loaders run on every cached pickle,
+so a corrupted or partial cache is caught in milliseconds.
+"""
+
+import numpy as np
+
+from line_covariance import LINE_FAMILIES, incidence_matrix, lines_hold
+
+
+_INT64_LIMIT = np.iinfo(np.int64).max
+
+
+def _set_bits(bitmap, idx):
+    """Set bit idx of the bitmap for every index (duplicates are harmless)."""
+    byte, bit = np.divmod(idx, 8)
+    for b in range(8):
+        sel = byte[bit == b]
+        if len(sel):
+            bitmap[sel] |= np.uint8(1 << b)
+
+
+def _count_bits(bitmap):
+    """Number of set bits, unpacked a few megabytes at a time."""
+    return sum(int(np.unpackbits(bitmap[start:start + (1 << 22)]).sum())
+               for start in range(0, len(bitmap), 1 << 22))
+
+
+def _missing_values(bitmap, n_values, limit):
+    """First `limit` values 1..n_values whose bit is not set."""
+    missing = []
+    for start in range(0, len(bitmap), 1 << 22):
+        bits = np.unpackbits(bitmap[start:start + (1 << 22)], bitorder='little')
+        idx = np.flatnonzero(bits == 0) + 8 * start
+        idx = idx[idx < n_values]
+        missing.extend((idx[:limit - len(missing)] + 1).tolist())
+        if len(missing) >= limit:
+            break
+    return missing
+
+
+def verify_square_streaming(square, chunk_rows=4096, max_report=10):
+    """
+    Verify an n x n magic square in one streaming pass over row blocks.
+
+    Args:
+        square: (n, n) array or memmap with values expected to be 1..n*n
+        chunk_rows: number of rows read per block
+        max_report: maximum number of failing values listed in the report
+
+    Returns:
+        dict: verification report with keys
+            'valid': True if every check passes
+            'n', 'magic_sum'
+            'bad_rows', 'bad_row_sums': failing row indexes and their sums
+            'bad_cols', 'bad_col_sums': failing column indexes and their sums
+            'diagonal_sums': (main, anti) sums
+            'out_of_range': number of values outside 1..n*n
+            'missing_values': up to max_report values that never appear
+            'n_missing': number of values that never appear
+    """
+    n = square.shape[0]
+    if square.shape != (n, n):
+        raise ValueError(f"Expected a square array, got shape {square.shape}")
+
+    n_values = n * n
+    magic_sum = n * (n_values + 1) // 2
+    # Python integers from the start if even in-range sums could overflow
+    sum_dtype = np.int64 if n * n_values < _INT64_LIMIT else object
+
+    row_sums = np.zeros(n, dtype=sum_dtype)
+    col_sums = np.zeros(n, dtype=sum_dtype)
+    main_diag = 0
+    anti_diag = 0
+    out_of_range = 0
+    peak = 0
+    bitmap = np.zeros((n_values + 7) // 8, dtype=np.uint8)
+
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(square[start:start + chunk_rows])
+        stop = start + len(block)
+        rows = np.arange(start, stop)
+
+        # Every line sum is bounded by n times the largest |value| seen so
+        # far; switch to Python integers for good once that could overflow
+        if row_sums.dtype != object and len(block):
+            peak = max(peak, abs(int(block.max())), abs(int(block.min())))
+            if peak * n >= _INT64_LIMIT:
+                row_sums = row_sums.astype(object)
+                col_sums = col_sums.astype(object)
+        values = block.astype(row_sums.dtype)
+
+        row_sums[start:stop] = values.sum(axis=1)
+        col_sums += values.sum(axis=0)
+        main_diag += int(values[rows - start, rows].sum())
+        anti_diag += int(values[rows - start, n - 1 - rows].sum())
+
+        flat = block.ravel()
+        in_range = (flat >= 1) & (flat <= n_values)
+        out_of_range += int(flat.size - np.count_nonzero(in_range))
+        _set_bits(bitmap, flat[in_range].astype(np.int64) - 1)
+
+    bad_rows = np.flatnonzero(row_sums != magic_sum)
+    bad_cols = np.flatnonzero(col_sums != magic_sum)
+    diagonal_sums = (main_diag, anti_diag)
+    n_missing = n_values - _count_bits(bitmap)
+
+    valid = (len(bad_rows) == 0 and len(bad_cols) == 0
+             and diagonal_sums == (magic_sum, magic_sum)
+             and out_of_range == 0 and n_missing == 0)
+
+    return {
+        'valid': valid,
+        'n': n,
+        'magic_sum': magic_sum,
+        'bad_rows': bad_rows,
+        'bad_row_sums': row_sums[bad_rows],
+        'bad_cols': bad_cols,
+        'bad_col_sums': col_sums[bad_cols],
+        'diagonal_sums': diagonal_sums,
+        'out_of_range': out_of_range,
+        'missing_values': _missing_values(bitmap, n_values, max_report) if n_missing else [],
+        'n_missing': n_missing,
+    }
+
+
+def is_frenicle_standard_batch(stack):
+    """
+    Boolean mask of squares in Frenicle standard form.
+
+    The top-left corner is the smallest of the four corners, and the cell to
+    its right is smaller than the cell below it.
+    """
+    top_left = stack[:, 0, 0]
+    return ((top_left < stack[:, 0, -1]) & (top_left < stack[:, -1, 0])
+            & (top_left < stack[:, -1, -1]) & (stack[:, 0, 1] < stack[:, 1, 0]))
+
+
+def verify_batch(stack, frenicle=True):
+    """
+    Verify a whole collection of magic squares in one vectorized call.
+
+    Args:
+        stack: (N, n, n) array of squares
+        frenicle: also require Frenicle standard form
+
+    Returns:
+        numpy.ndarray: (N,) boolean mask of valid squares
+    """
+    stack = np.asarray(stack, dtype=np.int64)
+    N, n = len(stack), stack.shape[-1]
+
+    lines = np.concatenate([LINE_FAMILIES[name](n) for name in ['rows', 'columns', 'diagonals']])
+    valid = lines_hold(stack, incidence_matrix(lines, n)).all(axis=1)
+
+    values = np.sort(stack.reshape(N, -1), axis=1)
+    valid &= (values == np.arange(1, n * n + 1)).all(axis=1)
+
+    if frenicle:
+        valid &= is_frenicle_standard_batch(stack)
+    return valid
+
+
+def check_square_collection(squares, expected_count=None, frenicle=True, label="cache"):
+    """
+    Validate a loaded collection of squares before it is used.
+
+    Prints what is wrong and returns False for malformed stacks, invalid or
+    non-standard squares, duplicates, or the wrong number of squares.
+
+    Args:
+        squares: list of n x n arrays or an (N, n, n) array
+        expected_count: required number of squares (None = any)
+        frenicle: require Frenicle standard form
+        label: name used in messages
+
+    Returns:
+        bool: True if the collection can be trusted
+    """
+    try:
+        stack = np.asarray(squares, dtype=np.int64)
+    except (TypeError, ValueError):
+        print(f"✗ {label}: squares do not form a regular array")
+        return False
+    if stack.ndim != 3 or stack.shape[1] != stack.shape[2] or len(stack) == 0:
+        print(f"✗ {label}: expected an (N, n, n) stack, got shape {stack.shape}")
+        return False
+
+    valid = verify_batch(stack, frenicle=frenicle)
+    if not valid.all():
+        bad = np.flatnonzero(~valid)
+        print(f"✗ {label}: {len(bad)} invalid squares (first at index {bad[0]})")
+        return False
+
+    n_unique = len(np.unique(stack.reshape(len(stack), -1), axis=0))
+    if n_unique != len(stack):
+        print(f"✗ {label}: {len(stack) - n_unique} duplicate squares")
+        return False
+
+    if expected_count is not None and len(stack) != expected_count:
+        print(f"✗ {label}: {len(stack)} squares, expected {expected_count}")
+        return False
+
+    return True
+
+
+def print_verification_report(report, max_lines=10):
+    """Print a verification report, listing the failing lines."""
+    n = report['n']
+    status = "VALID" if report['valid'] else "INVALID"
+    print(f"\nOrder {n} square: {status} (magic constant {report['magic_sum']})")
+
+    for name in ['row', 'col']:
+        bad = report[f'bad_{name}s']
+        sums = report[f'bad_{name}_sums']
+        if len(bad):
+            shown = ", ".join(f"{i} (sum {s})" for i, s in zip(bad[:max_lines], sums[:max_lines]))
+            more = f" ... and {len(bad) - max_lines} more" if len(bad) > max_lines else ""
+            print(f"  Failing {name}s ({len(bad)}): {shown}{more}")
+
+    main, anti = report['diagonal_sums']
+    if main != report['magic_sum']:
+        print(f"  Failing main diagonal: sum {main}")
+    if anti != report['magic_sum']:
+        print(f"  Failing anti-diagonal: sum {anti}")
+    if report['out_of_range']:
+        print(f"  Values outside 1..{n * n}: {report['out_of_range']}")
+    if report['n_missing']:
+        print(f"  Missing values ({report['n_missing']}): {report['missing_values']}")
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from magic_constructions import write_magic_square_memmap
+
+    print("="*70)
+    print("STREAMING VERIFICATION OF LARGE MAGIC SQUARES")
+    print("="*70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [1001, 4000, 10002]:
+            path = Path(tmp) / f"magic_{n}.npy"
+            write_magic_square_memmap(n, path)
+            square = np.load(path, mmap_mode='r+')
+
+            start = time.time()
+            report = verify_square_streaming(square)
+            elapsed = time.time() - start
+            print_verification_report(report)
+            print(f"  Verified {n * n:,} cells in {elapsed:.2f} seconds")
+
+            # Corrupt two cells and verify again
+            square[3, 5], square[n - 2, 7] = square[n - 2, 7], square[3, 5] + 1
+            print_verification_report(verify_square_streaming(square))
+            del square
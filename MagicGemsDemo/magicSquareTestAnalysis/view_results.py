@@ -8,6 +8,8 @@ import numpy as np
 import pickle
 from pathlib import Path
 
+from square_verification import check_square_collection
+
 
 def load_results():
     """Load the analysis results."""
@@ -19,6 +21,10 @@ def load_results():
     with open(results_file, 'rb') as f:
         data = pickle.load(f)
     
+    if not check_square_collection(data['squares'], data['n_squares'], label=str(results_file)):
+        print("Error: Results file is corrupted; rerun all_880_analysis.py.")
+        return None
+    
     return data
 
 